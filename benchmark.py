@@ -0,0 +1,406 @@
+#This file contains the benchmarks for the ScoreDiff tool.  Run it with
+#python benchmark.py [benchmark name ...] to run some or all of them
+
+from scorediff import *
+from os.path import abspath
+from sys import argv
+import timeit
+import multiprocessing
+import tempfile
+import shutil
+
+path = abspath('scorediff/test_cases')
+music21.environment.set('localCorpusPath', path)
+
+LARGE_SCORES = ['beethoven_appassionata.mxl', 'scriabin_opus_8_no9.mxl',
+                'scriabin_opus_8_no3.mxl', 'movement1.mxl']
+
+
+def best_of(function, repeat=5):
+    """Returns the fastest of several runs of function, in seconds
+
+
+    """
+
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def three_pass_build(score):
+    """Builds the index the way Tables.build did before it was made
+    single pass: one traversal of every part per context
+
+
+    """
+
+    index = {}
+
+    for context, attribute in [('clef', 'clef'), ('time', 'timeSignature'), ('key', 'keySignature')]:
+
+        index[context] = []
+
+        for part in score.parts:
+
+            recent = None
+            temp = []
+
+            for measure in part.getElementsByClass('Measure'):
+
+                if(getattr(measure, attribute) is not None):
+
+                    recent = getattr(measure, attribute)
+
+                temp.append(recent)
+
+            index[context].append(temp)
+
+    return index
+
+
+def benchmark_index_build():
+    """Compares the three pass index build with Tables.build on the large test cases
+
+
+    """
+
+    print '%-30s %12s %12s %8s' % ('score', 'three pass', 'single pass', 'speedup')
+
+    for name in LARGE_SCORES:
+
+        score = base.parse(name)
+        old = best_of(lambda: three_pass_build(score))
+        new = best_of(lambda: Tables(score).build())
+        assert three_pass_build(score) == Tables(score).build()
+        print '%-30s %11.4fs %11.4fs %7.2fx' % (name, old, new, old / new)
+
+
+def benchmark_diff():
+    """Times ScoreDiff.diff on pairs of the large test cases, once while the
+    notes are lowered into NoteTables and once more after that
+
+
+    """
+
+    print '%-55s %12s %12s %8s' % ('scores', 'first diff', 'next diff', 'found')
+
+    for name1, name2 in zip(LARGE_SCORES, LARGE_SCORES[1:]):
+
+        diff = ScoreDiff(name1, name2, path)
+        first = best_of(diff.diff, repeat=1)
+        second = best_of(diff.diff)
+        print '%-55s %11.4fs %11.4fs %8d' % (name1 + ' ' + name2, first, second, len(diff.diff()))
+
+
+def benchmark_first_difference():
+    """Times finding the first difference between pairs of the large test cases
+    with iter_differences and every difference with diff, each time with notes
+    that have not been lowered yet
+
+
+    """
+
+    print '%-55s %12s %12s' % ('scores', 'first', 'all')
+
+    for name1, name2 in zip(LARGE_SCORES, LARGE_SCORES[1:]):
+
+        diff = ScoreDiff(name1, name2, path, use_cache=False)
+
+        def fresh():
+
+            diff.update(1, ScoreEntry.build(diff.score1))
+            diff.update(2, ScoreEntry.build(diff.score2))
+
+        def first():
+
+            fresh()
+            list(diff.iter_differences(max_results=1))
+
+        def every():
+
+            fresh()
+            diff.diff()
+
+        print '%-55s %11.4fs %11.4fs' % (name1 + ' ' + name2, best_of(first), best_of(every))
+
+
+def benchmark_corpus():
+    """Times CorpusDiff on the bach variants with one worker and with
+    one worker per CPU.  The registry is cleared before every run so that
+    each variant is indexed again
+
+
+    """
+
+    variants = [variant for variant in find_variants(path + '/bach') if variant != 'different_clefs4.mxl']
+    print '%-10s %12s' % ('workers', 'time')
+
+    for workers in sorted(set([1, multiprocessing.cpu_count()])):
+
+        corpus = CorpusDiff('bwv66.6.mxl', variants, path, workers)
+        run = lambda: (ScoreDiff.default_registry().clear(), corpus.run())
+        print '%-10d %11.4fs' % (workers, best_of(run, repeat=3))
+
+
+def benchmark_parallel_parse():
+    """Times the construction of a ScoreDiff for pairs of the large test cases
+    with an empty cache, parsing the scores one after the other and in parallel.
+    Thawing both scores stays in the calling process, so it is also timed on its
+    own: with one CPU for each score, the parallel time is about the time of the
+    slower parse and freeze, plus the thaw and the indexing
+
+
+    """
+
+    cache = ScoreCache(tempfile.mkdtemp())
+    print '%d CPUs' % multiprocessing.cpu_count()
+    print '%-55s %12s %12s %12s' % ('scores', 'sequential', 'parallel', 'thaw')
+
+    def build(name1, name2, parallel):
+
+        cache.clear()
+        ScoreDiff(name1, name2, path, cache=cache, registry=ScoreRegistry(), parallel=parallel)
+
+    try:
+
+        for name1, name2 in zip(LARGE_SCORES, LARGE_SCORES[1:]):
+
+            sequential = best_of(lambda: build(name1, name2, False), repeat=3)
+            parallel = best_of(lambda: build(name1, name2, True), repeat=3)
+            frozen = [freeze(base.parse(name)) for name in [name1, name2]]
+            thawed = best_of(lambda: [thaw(score) for score in frozen], repeat=3)
+            print '%-55s %11.4fs %11.4fs %11.4fs' % (name1 + ' ' + name2, sequential, parallel, thawed)
+
+    finally:
+
+        shutil.rmtree(cache.directory)
+
+
+def benchmark_shards():
+    """Times ScoreDiff.diff on pairs of the large test cases with the parts
+    compared in this process and in one worker process per CPU
+
+
+    """
+
+    workers = multiprocessing.cpu_count()
+    print '%-55s %12s %12s' % ('scores', 'one process', '%d workers' % workers)
+
+    for name1, name2 in zip(LARGE_SCORES, LARGE_SCORES[1:]):
+
+        single = best_of(lambda: ScoreDiff(name1, name2, path, use_cache=False).diff(), repeat=3)
+        sharded = best_of(lambda: ScoreDiff(name1, name2, path, use_cache=False).diff(workers=workers), repeat=3)
+        print '%-55s %11.4fs %11.4fs' % (name1 + ' ' + name2, single, sharded)
+
+
+def benchmark_align():
+    """Times ScoreDiff.align on the first part of pairs of the large test cases,
+    and edit_script on 2000 fingerprints with a few measures inserted and deleted
+
+
+    """
+
+    print '%-55s %12s %8s' % ('scores', 'align', 'edits')
+
+    for name1, name2 in zip(LARGE_SCORES, LARGE_SCORES[1:]):
+
+        diff = ScoreDiff(name1, name2, path)
+        diff.align()
+        edits = len([edit for edit in diff.align() if edit.operation != 'match'])
+        print '%-55s %11.4fs %8d' % (name1 + ' ' + name2, best_of(diff.align), edits)
+
+    sequence1 = range(0, 2000)
+    sequence2 = sequence1[:500] + sequence1[510:1500] + [-1, -2] + sequence1[1500:]
+    print '%-55s %11.4fs %8d' % ('2000 measures', best_of(lambda: edit_script(sequence1, sequence2)), 12)
+
+
+def benchmark_timeline():
+    """Compares building the Timeline of bwv66.6 with music21's chordify, and
+    times ScoreDiff.harmonic_diff on pairs of the large test cases.  chordify
+    is too slow to time on the large test cases
+
+
+    """
+
+    diff = ScoreDiff('bwv66.6.mxl', 'different_pitches3.mxl', path)
+    parts = diff.measures1.part_count()
+    print '%-30s %12s %12s' % ('score', 'chordify', 'timeline')
+    print '%-30s %11.4fs %11.4fs' % ('bwv66.6.mxl', best_of(diff.score1.chordify, repeat=3),
+                                     best_of(lambda: Timeline.build(diff.notes1, parts)))
+    print '%-55s %12s %8s' % ('scores', 'harmonic', 'spans')
+
+    for name1, name2 in zip(LARGE_SCORES, LARGE_SCORES[1:]):
+
+        diff = ScoreDiff(name1, name2, path)
+        spans = len(diff.harmonic_diff())
+        print '%-55s %11.4fs %8d' % (name1 + ' ' + name2, best_of(diff.harmonic_diff), spans)
+
+
+def benchmark_similarity():
+    """Times ScoreDiff.similarity_matrix on the first part of pairs of the large
+    test cases against a loop of edit_distance over every pair of measures, and
+    ScoreDiff.score_similarity
+
+
+    """
+
+    print '%-55s %10s %12s %12s %12s' % ('scores', 'pairs', 'matrix', 'pairwise', 'score')
+
+    for name1, name2 in zip(LARGE_SCORES, LARGE_SCORES[1:]):
+
+        diff = ScoreDiff(name1, name2, path)
+        table1 = diff.notes1.part(0)
+        table2 = diff.notes2.part(0)
+
+        def pairwise():
+
+            for msr1 in range(0, table1.measure_count):
+
+                values1 = list(table1.values('pitches', msr1))
+
+                for msr2 in range(0, table2.measure_count):
+
+                    edit_distance(values1, list(table2.values('pitches', msr2)))
+
+        print '%-55s %10d %11.4fs %11.4fs %11.4fs' % (name1 + ' ' + name2, table1.measure_count * table2.measure_count,
+                                                      best_of(diff.similarity_matrix), best_of(pairwise, 1),
+                                                      best_of(diff.score_similarity, 1))
+
+
+def benchmark_reader():
+    """Times the construction of a ScoreDiff for pairs of the large test cases
+    without any cache, parsing the scores with music21 and reading them with a
+    MusicXMLReader, with every part lowered into a NoteTable
+
+
+    """
+
+    print '%-55s %12s %12s' % ('scores', 'music21', 'stream')
+
+    def build(name1, name2, reader):
+
+        diff = ScoreDiff(name1, name2, path, use_cache=False, reader=reader)
+
+        for part in range(0, diff.measures1.part_count()):
+
+            diff.notes1.part(part)
+
+    for name1, name2 in zip(LARGE_SCORES, LARGE_SCORES[1:]):
+
+        print '%-55s %11.4fs %11.4fs' % (name1 + ' ' + name2, best_of(lambda: build(name1, name2, 'music21'), 1),
+                                         best_of(lambda: build(name1, name2, 'stream'), 3))
+
+
+def benchmark_window():
+    """Times the construction of a ScoreDiff on measures 200 to 220 of a large
+    test case compared with itself, reading the whole score with a MusicXMLReader,
+    and reading only the window through a measure index, once when the index
+    is built and once it has been saved
+
+    """
+
+    directory = tempfile.mkdtemp()
+
+    try:
+
+        shutil.copy(path + '/beethoven/beethoven_appassionata.mxl', directory)
+        score = directory + '/beethoven_appassionata.mxl'
+
+        def build(window, sidecars):
+
+            ScoreDiff(score, score, path, use_cache=False, reader='stream', window=window, sidecars=sidecars)
+
+        print 'whole score:     %.4fs' % best_of(lambda: build(None, False), 3)
+        print 'building index:  %.4fs' % best_of(lambda: build((200, 221), False), 3)
+        build((200, 221), True)
+        print 'saved index:     %.4fs' % best_of(lambda: build((200, 221), True), 3)
+
+    finally:
+
+        shutil.rmtree(directory)
+
+
+def benchmark_incremental():
+    """Times comparing a large test case with an edited copy of itself again
+    after one of its measures is changed, with an IncrementalDiff and with a
+    new ScoreDiff that reads the edited score in full
+
+    """
+
+    directory = tempfile.mkdtemp()
+
+    try:
+
+        reference = path + '/beethoven/beethoven_appassionata.mxl'
+        score = directory + '/edited.xml'
+        shutil.copy(reference, score)
+        text = open(score).read()
+        incremental = IncrementalDiff(reference, score, path)
+
+        def edit(step):
+
+            position = text.index('<step>', len(text) // 2)
+            open(score, 'w').write(text[:position] + '<step>' + step + '</step>' + text[position + 14:])
+            incremental.reader.signature = None
+
+        def refresh(step):
+
+            edit(step)
+            incremental.refresh()
+
+        print 'full read:    %.4fs' % best_of(lambda: ScoreDiff(reference, score, path, reader='stream',
+                                                                 registry=ScoreRegistry()).diff(), 3)
+        print 'incremental:  %.4fs' % min(best_of(lambda: refresh('D'), 1), best_of(lambda: refresh('E'), 1))
+
+    finally:
+
+        shutil.rmtree(directory)
+
+
+def resident_diffs(lean):
+    """Keeps three ScoreDiffs of a large test case resident together and
+    returns the peak memory of the process, in KB
+
+    """
+
+    import resource
+
+    diffs = [ScoreDiff(path + '/beethoven/beethoven_appassionata.mxl', path + '/bach/bwv66.6.mxl', path,
+                       use_cache=False, lean=lean) for i in range(0, 3)]
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def benchmark_lean():
+    """Measures the memory of ScoreDiffs of a large test case resident together,
+    keeping the music21 scores and releasing them.  Each is measured in a new
+    process, so that the peaks do not mix
+
+    """
+
+    for lean in [False, True]:
+
+        pool = multiprocessing.Pool(1)
+
+        try:
+
+            print 'lean=%s:  %d KB at the peak' % (lean, pool.apply(resident_diffs, (lean,)))
+
+        finally:
+
+            pool.terminate()
+
+
+BENCHMARKS = [('index_build', benchmark_index_build), ('diff', benchmark_diff),
+              ('first_difference', benchmark_first_difference),
+              ('corpus', benchmark_corpus), ('parallel_parse', benchmark_parallel_parse),
+              ('shards', benchmark_shards), ('align', benchmark_align),
+              ('timeline', benchmark_timeline), ('similarity', benchmark_similarity),
+              ('reader', benchmark_reader), ('window', benchmark_window),
+              ('incremental', benchmark_incremental), ('lean', benchmark_lean)]
+
+if __name__ == '__main__':
+
+    for name, benchmark in BENCHMARKS:
+
+        if(len(argv) == 1 or name in argv[1:]):
+
+            print '== ' + name
+            benchmark()
@@ -1,2 +1,15 @@
 from scorediff import *
 from tables import *
+from cache import *
+from registry import *
+from measures import *
+from features import *
+from notetable import *
+from corpus import *
+from digest import *
+from align import *
+from harmony import *
+from similarity import *
+from reader import *
+from measureindex import *
+from incremental import *
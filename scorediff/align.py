@@ -0,0 +1,208 @@
+"""
+
+.. module:: align
+     :synopsis: A module for lining up the measures of two scores when measures
+       have been inserted or deleted
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+from collections import namedtuple
+
+
+#One step of an edit script.  operation is 'match', 'change', 'delete' or
+#'insert'; measure1 is None for 'insert' and measure2 is None for 'delete'
+Edit = namedtuple('Edit', ['operation', 'measure1', 'measure2'])
+
+
+def edit_script(sequence1, sequence2, max_cost=None):
+    """Returns a shortest edit script that turns sequence1 into sequence2, using
+    the O(ND) difference algorithm of Myers.  The cost grows with the length of
+    the sequences times the number of insertions and deletions, so sequences
+    that are mostly the same are aligned in close to linear time.  The items they
+    start and end with in common are matched before the search begins.
+
+    Args:
+      sequence1 and sequence2 (list):  The items to align, such as measure fingerprints
+
+    Kwargs:
+      max_cost (int):  Stop searching once more than this many insertions and deletions
+      would be needed, and report every item between the common start and end as
+      deleted and inserted.  This bounds the time spent on unrelated sequences
+
+    Returns:
+      list.  Edit tuples in order, with 'match', 'delete' and 'insert' operations
+
+
+    """
+
+    sequence1 = list(sequence1)
+    sequence2 = list(sequence2)
+    head = 0
+
+    while(head < min(len(sequence1), len(sequence2)) and sequence1[head] == sequence2[head]):
+
+        head += 1
+
+    tail = 0
+
+    while(tail < min(len(sequence1), len(sequence2)) - head and
+          sequence1[len(sequence1) - tail - 1] == sequence2[len(sequence2) - tail - 1]):
+
+        tail += 1
+
+    middle1 = sequence1[head:len(sequence1) - tail]
+    middle2 = sequence2[head:len(sequence2) - tail]
+    script = [Edit('match', i, i) for i in range(0, head)]
+
+    for edit in _myers(middle1, middle2, max_cost):
+
+        script.append(Edit(edit.operation,
+                           None if edit.measure1 is None else edit.measure1 + head,
+                           None if edit.measure2 is None else edit.measure2 + head))
+
+    script += [Edit('match', len(sequence1) - tail + i, len(sequence2) - tail + i) for i in range(0, tail)]
+    return script
+
+
+def _myers(sequence1, sequence2, max_cost=None):
+    """Returns the edit script of edit_script for sequences that differ at both ends
+
+    """
+
+    count1 = len(sequence1)
+    count2 = len(sequence2)
+    offset = count1 + count2 + 1
+    furthest = [0] * (2 * offset + 1)
+    trace = []
+
+    for cost in range(0, count1 + count2 + 1):
+
+        if(max_cost is not None and cost > max_cost):
+
+            return [Edit('delete', x, None) for x in range(0, count1)] + \
+                   [Edit('insert', None, y) for y in range(0, count2)]
+
+        #keep the diagonals reached so far, which backtracking needs
+        trace.append(furthest[offset - cost - 1:offset + cost + 2])
+
+        for diagonal in range(-cost, cost + 1, 2):
+
+            if(diagonal == -cost or (diagonal != cost and
+                                     furthest[offset + diagonal - 1] < furthest[offset + diagonal + 1])):
+
+                x = furthest[offset + diagonal + 1]
+
+            else:
+
+                x = furthest[offset + diagonal - 1] + 1
+
+            y = x - diagonal
+
+            while(x < count1 and y < count2 and sequence1[x] == sequence2[y]):
+
+                x += 1
+                y += 1
+
+            furthest[offset + diagonal] = x
+
+            if(x >= count1 and y >= count2):
+
+                return _backtrack(trace, count1, count2)
+
+
+def _backtrack(trace, x, y):
+    """Follows the diagonals kept in trace back from the end of both sequences
+    and returns the edits in order
+
+    """
+
+    script = []
+
+    for cost in range(len(trace) - 1, -1, -1):
+
+        reached = trace[cost]
+        diagonal = x - y
+
+        #reached starts at diagonal -cost - 1
+        if(diagonal == -cost or (diagonal != cost and
+                                 reached[diagonal - 1 + cost + 1] < reached[diagonal + 1 + cost + 1])):
+
+            previous = diagonal + 1
+
+        else:
+
+            previous = diagonal - 1
+
+        previous_x = reached[previous + cost + 1]
+        previous_y = previous_x - previous
+
+        while(x > previous_x and y > previous_y):
+
+            script.append(Edit('match', x - 1, y - 1))
+            x -= 1
+            y -= 1
+
+        if(cost > 0):
+
+            if(x == previous_x):
+
+                script.append(Edit('insert', None, y - 1))
+
+            else:
+
+                script.append(Edit('delete', x - 1, None))
+
+        x = previous_x
+        y = previous_y
+
+    script.reverse()
+    return script
+
+
+def pair_changes(script):
+    """Turns the deletions and insertions between two matches into changes, so that
+    a measure that was edited is paired with its new version.  The n-th deleted
+    measure of a run is paired with the n-th inserted measure, and the measures
+    left over stay deleted or inserted
+
+    Args:
+      script (list):  Edit tuples, as returned by edit_script
+
+    Returns:
+      list.  Edit tuples in order, with 'change' operations added
+
+
+    """
+
+    paired = []
+    deleted = []
+    inserted = []
+
+    for edit in script + [None]:
+
+        if(edit is not None and edit.operation == 'delete'):
+
+            deleted.append(edit)
+
+        elif(edit is not None and edit.operation == 'insert'):
+
+            inserted.append(edit)
+
+        else:
+
+            for old, new in zip(deleted, inserted):
+
+                paired.append(Edit('change', old.measure1, new.measure2))
+
+            paired += deleted[len(inserted):] + inserted[len(deleted):]
+            deleted = []
+            inserted = []
+
+            if(edit is not None):
+
+                paired.append(edit)
+
+    return paired
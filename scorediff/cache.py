@@ -0,0 +1,369 @@
+"""
+
+.. module:: cache
+     :synopsis: A module for keeping parsed scores on disk so that a score
+       does not have to be parsed again every time it is compared
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+import os
+import hashlib
+import logging
+import music21
+from music21 import freezeThaw
+from music21.corpus import base
+
+
+def find_score(name):
+    """Returns the full pathname of a score, searching the corpus
+    (including the local corpus) if name is not a file on disk
+
+    Args:
+      name (str):  The pathname or corpus name of a score
+
+    Returns:
+      str.  The full pathname of the score
+
+
+    """
+
+    if(os.path.isfile(name)):
+
+        return os.path.abspath(name)
+
+    path = base.getWork(name)
+
+    if(isinstance(path, list)):
+
+        path = path[0]
+
+    return os.path.abspath(path)
+
+
+def file_key(path, content=True):
+    """Returns a key that changes whenever the file at path is edited, made of
+    a hash of the music21 version and the size and modification time of the file
+
+    Args:
+      path (str):  The full pathname of a score
+
+    Kwargs:
+      content (bool):  Also hash the contents of the file, which reads the whole
+      file but catches edits that keep its size and modification time
+
+    Returns:
+      str
+
+
+    """
+
+    info = os.stat(path)
+    fields = [music21.VERSION_STR, str(info.st_size), repr(info.st_mtime)]
+
+    if(content):
+
+        digest = hashlib.sha1()
+
+        with open(path, 'rb') as source:
+
+            for chunk in iter(lambda: source.read(1 << 16), b''):
+
+                digest.update(chunk)
+
+        fields.append(digest.hexdigest())
+
+    version = hashlib.sha1()
+    version.update('|'.join(fields).encode('utf-8'))
+    return version.hexdigest()
+
+
+def freeze(score):
+    """Returns a parsed score frozen into a string, which thaw turns back into
+    a score in this or another process
+
+    Args:
+      score (music21.stream.Score):  The parsed score
+
+    Returns:
+      str
+
+
+    """
+
+    return freezeThaw.StreamFreezer(score).writeStr(fmt='pickle')
+
+
+def thaw(frozen):
+    """Returns the score frozen by freeze
+
+    Args:
+      frozen (str):  The frozen score
+
+    Returns:
+      music21.stream.Score
+
+
+    """
+
+    thawer = freezeThaw.StreamThawer()
+    thawer.openStr(frozen)
+    return thawer.stream
+
+
+class ScoreCache:
+    """The ScoreCache class stores parsed music21 scores on disk in a frozen
+    (pickled) form.  An entry is keyed by the pathname, size, modification time
+    and content hash of the original file, so editing a file invalidates its
+    entry.  The cache is capped at max_size bytes, and the least recently used
+    entries are evicted first once the cap is exceeded.
+
+
+    """
+
+    DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.scorediff', 'cache')
+    DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+    EXTENSION = '.p'
+
+
+    def __init__(self, directory=None, max_size=None):
+        """Initializes a ScoreCache object
+
+        Kwargs:
+          directory (str):  The directory to keep the cache entries in
+
+          max_size (int):  The maximum number of bytes the cache may occupy
+
+
+        """
+
+        if(directory is None):
+
+            directory = ScoreCache.DEFAULT_DIRECTORY
+
+        if(max_size is None):
+
+            max_size = ScoreCache.DEFAULT_MAX_SIZE
+
+        self.directory = directory
+        self.max_size = max_size
+
+
+    def key(self, path):
+        """Returns the key of the cache entry for the file at path
+
+        Args:
+          path (str):  The full pathname of a score
+
+        Returns:
+          str.  A key made of a hash of the pathname followed by a hash
+          of the size, modification time and contents of the file
+
+
+        """
+
+        return self.__path_hash(path) + '-' + file_key(path)
+
+
+    def load(self, path):
+        """Returns the cached score for the file at path
+
+        Args:
+          path (str):  The full pathname of a score
+
+        Returns:
+          music21.stream.Score.  The cached score, or None if there is no
+          up to date entry for the file
+
+
+        """
+
+        entry = self.__entry(self.key(path))
+
+        if(not os.path.exists(entry)):
+
+            logging.debug("cache miss: " + path)
+            return None
+
+        try:
+
+            thawer = freezeThaw.StreamThawer()
+            thawer.open(entry)
+
+        except Exception:
+
+            logging.debug("discarding unreadable cache entry: " + entry)
+            self.__remove(entry)
+            return None
+
+        #touch the entry so that eviction sees it as recently used
+        os.utime(entry, None)
+        logging.debug("cache hit: " + path)
+        return thawer.stream
+
+
+    def store(self, path, score):
+        """Stores score as the entry for the file at path, replacing any
+        stale entries for the same file
+
+        Args:
+          path (str):  The full pathname of the file score was parsed from
+
+          score (music21.stream.Score):  The parsed score
+
+
+        """
+
+        self.store_frozen(path, freeze(score))
+
+
+    def store_frozen(self, path, frozen):
+        """Stores a score already frozen with freeze as the entry for the file
+        at path, replacing any stale entries for the same file
+
+        Args:
+          path (str):  The full pathname of the file the score was parsed from
+
+          frozen (str):  The frozen score
+
+
+        """
+
+        if(not os.path.isdir(self.directory)):
+
+            os.makedirs(self.directory)
+
+        key = self.key(path)
+        entry = self.__entry(key)
+        temp = entry + '.' + str(os.getpid()) + '.tmp'
+
+        with open(temp, 'wb') as written:
+
+            written.write(frozen)
+
+        os.rename(temp, entry)
+
+        self.invalidate(path, keep=key)
+        self.__evict()
+
+
+    def invalidate(self, path, keep=None):
+        """Removes all entries for the file at path
+
+        Args:
+          path (str):  The full pathname of a score
+
+        Kwargs:
+          keep (str):  The key of an entry that should not be removed
+
+
+        """
+
+        prefix = self.__path_hash(path) + '-'
+
+        for name in self.__names():
+
+            if(name.startswith(prefix) and name != str(keep) + ScoreCache.EXTENSION):
+
+                self.__remove(os.path.join(self.directory, name))
+
+
+    def clear(self):
+        """Removes every entry from the cache
+
+
+        """
+
+        for name in self.__names():
+
+            self.__remove(os.path.join(self.directory, name))
+
+
+    def size(self):
+        """Returns the number of bytes occupied by the cache
+
+        Returns:
+          int
+
+
+        """
+
+        return sum(os.path.getsize(os.path.join(self.directory, name)) for name in self.__names())
+
+
+    def __evict(self):
+        """Removes the least recently used entries until the cache
+        fits within max_size
+
+
+        """
+
+        entries = []
+
+        for name in self.__names():
+
+            entry = os.path.join(self.directory, name)
+            info = os.stat(entry)
+            entries.append((info.st_mtime, info.st_size, entry))
+
+        entries.sort()
+        total = sum(size for (used, size, entry) in entries)
+
+        while(total > self.max_size and entries):
+
+            used, size, entry = entries.pop(0)
+            logging.debug("evicting cache entry: " + entry)
+            self.__remove(entry)
+            total -= size
+
+
+    def __names(self):
+        """Returns the file names of all entries in the cache
+
+        Returns:
+          list
+
+
+        """
+
+        if(not os.path.isdir(self.directory)):
+
+            return []
+
+        return [name for name in os.listdir(self.directory) if name.endswith(ScoreCache.EXTENSION)]
+
+
+    def __entry(self, key):
+        """Returns the pathname of the entry with the given key
+
+
+        """
+
+        return os.path.join(self.directory, key + ScoreCache.EXTENSION)
+
+
+    def __path_hash(self, path):
+        """Returns a hash of the full pathname of a score
+
+
+        """
+
+        return hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+
+
+    def __remove(self, entry):
+        """Removes a file from the cache directory, ignoring files that
+        have already been removed by another process
+
+
+        """
+
+        try:
+
+            os.remove(entry)
+
+        except OSError:
+
+            pass
@@ -0,0 +1,229 @@
+"""
+
+.. module:: corpus
+     :synopsis: A module for comparing one reference score against many
+       variants of it, using several processes
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+import os
+import glob
+import logging
+import multiprocessing
+from collections import OrderedDict
+from scorediff import *
+
+
+#The settings of the CorpusDiff a worker process was started for
+_worker = {}
+
+
+def _start_worker(reference, localCorpusPath, categories, cache=None):
+    """Records the settings of a CorpusDiff in a worker process
+
+
+    """
+
+    _worker['reference'] = reference
+    _worker['localCorpusPath'] = localCorpusPath
+    _worker['categories'] = categories
+    _worker['cache'] = cache
+
+
+def _diff_variant(variant):
+    """Parses one variant and compares it to the reference in a worker process.
+    Returns the variant, its differences and None, or the variant, None and the
+    message of the exception that stopped the comparison
+
+
+    """
+
+    try:
+
+        diff = ScoreDiff(_worker['reference'], variant, _worker['localCorpusPath'], cache=_worker['cache'])
+        return variant, diff.diff(_worker['categories']), None
+
+    except Exception as error:
+
+        return variant, None, type(error).__name__ + ': ' + str(error)
+
+
+def find_variants(directory, pattern='different_*.mxl'):
+    """Returns the names of the scores in a directory that match pattern
+
+    Args:
+      directory (str):  The directory to search
+
+    Kwargs:
+      pattern (str):  A shell style pattern for the file names
+
+    Returns:
+      list.  The file names, sorted
+
+
+    """
+
+    return sorted(os.path.basename(name) for name in glob.glob(os.path.join(directory, pattern)))
+
+
+class CorpusDiff:
+    """The CorpusDiff class compares a reference score against a list of
+    variants.  The reference is parsed, indexed and lowered into NoteTables once,
+    in the calling process, before the worker processes are started, so that every
+    worker shares it through the registry it inherits.  On platforms that cannot
+    fork, the workers only share the parsed reference, through the on-disk cache
+    if it is given one.  Each worker then parses and compares one chunk of
+    variants at a time.  Results are always reported in the order of the
+    variants, however many workers are used.  A variant that cannot be parsed
+    or compared does not stop the others; its error is recorded in errors.
+
+
+    """
+
+    def __init__(self, reference, variants, localCorpusPath='.', workers=None, chunksize=1, categories=None,
+                 cache=None):
+        """Initializes a CorpusDiff object
+
+        Args:
+          reference (str):  The pathname of the score to compare the variants to
+
+          variants (list):  The pathnames of the scores to compare to reference
+
+        Kwargs:
+          localCorpusPath (str):  A path to a corpus if your files are located elsewhere
+
+          workers (int):  The number of worker processes, one per CPU by default.  With
+          a single worker the variants are compared in the calling process
+
+          chunksize (int):  The number of variants sent to a worker at a time
+
+          categories (list):  The categories to compare, as for ScoreDiff.diff
+
+          cache (ScoreCache):  An on-disk cache for the parsed scores, as for ScoreDiff
+
+
+        """
+
+        if(workers is None):
+
+            workers = multiprocessing.cpu_count()
+
+        self.reference = reference
+        self.variants = list(variants)
+        self.localCorpusPath = localCorpusPath
+        self.workers = max(1, min(workers, len(self.variants)))
+        self.chunksize = chunksize
+        self.categories = categories
+        self.cache = cache
+        self.errors = OrderedDict()
+
+
+    def __iter__(self):
+        """Compares the variants, yielding (variant, differences) for each
+        variant as soon as it and every variant before it are compared.
+        differences is the list ScoreDiff.diff returns.  Variants that fail
+        are skipped and recorded in errors
+
+
+        """
+
+        #Parse, index and lower the reference once, before the workers are started,
+        #so that they find all of it in the registry they inherit
+        ScoreDiff(self.reference, self.reference, self.localCorpusPath, cache=self.cache)
+        entry = ScoreDiff.default_registry().get(find_score(self.reference))
+
+        if(entry is not None):
+
+            entry.prepare()
+
+        _start_worker(self.reference, self.localCorpusPath, self.categories, self.cache)
+        self.errors.clear()
+
+        if(self.workers == 1):
+
+            for variant in self.variants:
+
+                for result in self.__report(*_diff_variant(variant)):
+
+                    yield result
+
+            return
+
+        logging.debug("starting " + str(self.workers) + " workers")
+        pool = multiprocessing.Pool(self.workers, _start_worker,
+                                    (self.reference, self.localCorpusPath, self.categories, self.cache))
+
+        try:
+
+            for variant, differences, error in pool.imap(_diff_variant, self.variants, self.chunksize):
+
+                for result in self.__report(variant, differences, error):
+
+                    yield result
+
+            pool.close()
+
+        finally:
+
+            pool.terminate()
+            pool.join()
+
+
+    def __report(self, variant, differences, error):
+        """Returns the result of one variant as a list of the values to yield,
+        recording its error instead if there is one
+
+
+        """
+
+        if(error is not None):
+
+            logging.debug("could not compare " + variant + ": " + error)
+            self.errors[variant] = error
+            return []
+
+        return [(variant, differences)]
+
+
+    def run(self):
+        """Compares every variant to the reference
+
+        Returns:
+          OrderedDict.  The differences found for each variant that could be compared,
+          in the order of the variants
+
+
+        """
+
+        return OrderedDict(self)
+
+
+    @staticmethod
+    def summarize(results):
+        """Counts the differences found for each variant by category
+
+        Args:
+          results (dict):  The differences found for each variant, as returned by run
+
+        Returns:
+          OrderedDict.  {variant:{category:int}} for every variant in results
+
+
+        """
+
+        summary = OrderedDict()
+
+        for variant, differences in results.items():
+
+            counts = {}
+
+            for difference in differences:
+
+                counts[difference.category] = counts.get(difference.category, 0) + 1
+
+            summary[variant] = counts
+
+        return summary
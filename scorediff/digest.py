@@ -0,0 +1,414 @@
+"""
+
+.. module:: digest
+     :synopsis: A module for summarizing a score in a tree of fingerprints, so
+       that two scores can be checked for differences without comparing them
+       measure by measure
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+import os
+import json
+import base64
+import logging
+import numpy
+from collections import namedtuple
+from cache import *
+from features import *
+from notetable import *
+
+
+#A difference found by ScoreDigest.differences.  measure is None for the
+#'parts' category, and is the first measure missing from one of the scores
+#for the 'measures' category
+Change = namedtuple('Change', ['part', 'measure', 'category'])
+
+
+def combine(left, right):
+    """Returns the fingerprint of a pair of fingerprints.  The order matters:
+    combine(a, b) and combine(b, a) are almost never equal
+
+    Args:
+      left and right (numpy.ndarray):  Arrays of numpy.uint64, or single numbers
+
+    Returns:
+      numpy.ndarray
+
+
+    """
+
+    with numpy.errstate(over='ignore'):
+
+        return mix(numpy.asarray(left, dtype=numpy.uint64) ^ mix(mix(right) + numpy.uint64(1)))
+
+
+def part_leaves(measures, index, notes, part, categories):
+    """Returns the fingerprint of every category of every measure of a part
+
+    Args:
+      measures (MeasureDirectory):  The measures of the score
+
+      index (dict):  The index of the score built by Tables
+
+      notes (NoteIndex):  The notes of the score
+
+      part (int):  The index of the part
+
+      categories (list):  The categories to include
+
+    Returns:
+      numpy.ndarray.  numpy.uint64 values with one row per measure and one column per category
+
+
+    """
+
+    count = measures.measure_count(part)
+    columns = []
+
+    for category in categories:
+
+        if(category in index):
+
+            context = index[category][part]
+            columns.append(numpy.array([context.fingerprint(msr) for msr in range(0, count)],
+                                       dtype=numpy.uint64))
+
+        else:
+
+            columns.append(notes.part(part).fingerprints[category])
+
+    return numpy.column_stack(columns)
+
+
+def measure_digests(leaves):
+    """Combines the fingerprints of the categories of every measure into one
+    fingerprint per measure
+
+    Args:
+      leaves (numpy.ndarray):  As returned by part_leaves
+
+    Returns:
+      numpy.ndarray.  A numpy.uint64 for each measure
+
+
+    """
+
+    digests = combine(numpy.uint64(leaves.shape[1]), numpy.zeros(len(leaves), dtype=numpy.uint64))
+
+    for column in range(0, leaves.shape[1]):
+
+        digests = combine(digests, leaves[:, column])
+
+    return digests
+
+
+class ScoreDigest:
+    """The ScoreDigest class is a Merkle tree over the fingerprints of a score.
+    The leaves hold the fingerprint of every category of every measure.  Above
+    them, each node combines two neighbouring nodes, so that it covers a range of
+    measures.  The root of each part combines these ranges, and the digest of
+    the score combines the parts.  Two scores with the same digest are the same
+    in every category, and the differing measures are found by descending only
+    into the nodes that differ.  A digest can be saved next to its score and
+    loaded again without parsing the score.
+
+    """
+
+    #The version of the format written by save
+    FORMAT = 1
+    EXTENSION = '.digest'
+
+
+    def __init__(self, leaves, categories=None):
+        """Builds the tree over the leaves
+
+        Args:
+          leaves (list):  For each part, an array of numpy.uint64 with one row per
+          measure and one column per category
+
+        Kwargs:
+          categories (list):  The categories of the columns, CATEGORIES by default
+
+        """
+
+        if(categories is None):
+
+            categories = CATEGORIES
+
+        self.categories = list(categories)
+        self.leaves = [numpy.asarray(part, dtype=numpy.uint64).reshape(-1, len(self.categories))
+                       for part in leaves]
+        self.levels = [self.__build_levels(part) for part in self.leaves]
+        self.parts = [combine(len(part), levels[-1][0] if len(part) else 0)
+                      for part, levels in zip(self.leaves, self.levels)]
+        self.root = combine(len(self.parts), 0)
+
+        for part in self.parts:
+
+            self.root = combine(self.root, part)
+
+
+    @staticmethod
+    def build(measures, index, notes, categories=None):
+        """Computes the digest of a score from its tables
+
+        Args:
+          measures (MeasureDirectory):  The measures of the score
+
+          index (dict):  The index of the score built by Tables
+
+          notes (NoteIndex):  The notes of the score
+
+        Kwargs:
+          categories (list):  The categories to include, CATEGORIES by default
+
+        Returns:
+          ScoreDigest
+
+        """
+
+        if(categories is None):
+
+            categories = CATEGORIES
+
+        leaves = [part_leaves(measures, index, notes, part, categories)
+                  for part in range(0, measures.part_count())]
+        return ScoreDigest(leaves, categories)
+
+
+    def hexdigest(self):
+        """Returns the digest of the whole score
+
+        Returns:
+          str.  16 hexadecimal digits
+
+        """
+
+        return '%016x' % int(self.root)
+
+
+    def matches(self, other):
+        """Checks if two scores are the same in every category with a single comparison
+
+        Args:
+          other (ScoreDigest):  The digest of the other score
+
+        Returns:
+          boolean
+
+        """
+
+        return self.categories == other.categories and self.root == other.root
+
+
+    def differences(self, other):
+        """Finds every measure and category where two scores differ, skipping
+        the parts and ranges of measures whose nodes are the same in both trees.
+        The cost grows with the number of differences and the logarithm of the
+        number of measures.
+
+        .. note:: Part n is compared with part n, and measure m with measure m,
+           as in ScoreDiff.diff.
+
+        Args:
+          other (ScoreDigest):  The digest of the other score
+
+        Returns:
+          list.  Change(part, measure, category) tuples in score order
+
+        Raises:
+          ValueError: If the digests do not hold the same categories
+
+        """
+
+        if(self.categories != other.categories):
+
+            raise ValueError("the digests do not have the same categories")
+
+        changes = []
+
+        if(self.root == other.root):
+
+            return changes
+
+        for part in range(0, min(len(self.parts), len(other.parts))):
+
+            if(self.parts[part] == other.parts[part]):
+
+                continue
+
+            count1 = len(self.leaves[part])
+            count2 = len(other.leaves[part])
+            height = max(len(self.levels[part]), len(other.levels[part]))
+            self.__descend(other, part, height - 1, 0, changes)
+
+            if(count1 != count2):
+
+                changes.append(Change(part, min(count1, count2), 'measures'))
+
+        if(len(self.parts) != len(other.parts)):
+
+            changes.append(Change(min(len(self.parts), len(other.parts)), None, 'parts'))
+
+        logging.debug("digest differences: " + str(len(changes)))
+        return changes
+
+
+    def __descend(self, other, part, level, node, changes):
+        """Adds the differences under one node of the trees of a part to changes
+
+        """
+
+        count1 = len(self.leaves[part])
+        count2 = len(other.leaves[part])
+        start = node << level
+        stop = (node + 1) << level
+
+        if(start >= min(count1, count2)):
+
+            return
+
+        #a node covers the same measures in both trees unless it runs past the
+        #end of the shorter part
+        if(count1 == count2 or stop <= min(count1, count2)):
+
+            if(self.levels[part][level][node] == other.levels[part][level][node]):
+
+                return
+
+        if(level == 0):
+
+            leaf1 = self.leaves[part][node]
+            leaf2 = other.leaves[part][node]
+
+            for column in numpy.flatnonzero(leaf1 != leaf2):
+
+                changes.append(Change(part, node, self.categories[column]))
+
+            return
+
+        self.__descend(other, part, level - 1, 2 * node, changes)
+        self.__descend(other, part, level - 1, 2 * node + 1, changes)
+
+
+    def __build_levels(self, leaves):
+        """Returns the levels of the tree over the leaves of a part, from the
+        measures up to the root.  A node without a neighbour is carried up unchanged
+
+        """
+
+        level = measure_digests(leaves)
+        levels = [level]
+
+        while(len(level) > 1):
+
+            paired = combine(level[0:len(level) - 1:2], level[1::2])
+
+            if(len(level) % 2):
+
+                paired = numpy.append(paired, level[-1:])
+
+            level = paired
+            levels.append(level)
+
+        return levels
+
+
+    def to_json(self):
+        """Returns the digest as a JSON string.  Only the leaves are stored, and
+        the rest of the tree is built again by from_json
+
+        Returns:
+          str
+
+        """
+
+        return json.dumps({'format': ScoreDigest.FORMAT, 'categories': self.categories,
+                           'parts': [base64.b64encode(part.astype('<u8').tostring()) for part in self.leaves]})
+
+
+    @staticmethod
+    def from_json(text):
+        """Reads a digest written by to_json
+
+        Args:
+          text (str):  The JSON string
+
+        Returns:
+          ScoreDigest
+
+        Raises:
+          ValueError: If text is not a digest in the current format
+
+        """
+
+        data = json.loads(text)
+
+        if(data.get('format') != ScoreDigest.FORMAT):
+
+            raise ValueError("unsupported digest format: " + str(data.get('format')))
+
+        leaves = [numpy.frombuffer(base64.b64decode(part), dtype='<u8') for part in data['parts']]
+        return ScoreDigest(leaves, [str(category) for category in data['categories']])
+
+
+    def save(self, path):
+        """Writes the digest next to the score it was computed from, together
+        with the key of the score file so that stale digests can be detected
+
+        Args:
+          path (str):  The full pathname of the score
+
+        """
+
+        text = json.dumps({'key': file_key(path), 'digest': self.to_json()})
+        temp = ScoreDigest.sidecar(path) + '.' + str(os.getpid()) + '.tmp'
+
+        with open(temp, 'w') as sidecar:
+
+            sidecar.write(text)
+
+        os.rename(temp, ScoreDigest.sidecar(path))
+
+
+    @staticmethod
+    def load(path):
+        """Reads the digest saved next to a score, without parsing the score
+
+        Args:
+          path (str):  The full pathname of the score
+
+        Returns:
+          ScoreDigest.  The digest, or None if there is no digest for the current
+          version of the file
+
+        """
+
+        try:
+
+            with open(ScoreDigest.sidecar(path)) as sidecar:
+
+                data = json.loads(sidecar.read())
+
+            if(data['key'] != file_key(path)):
+
+                logging.debug("stale digest: " + path)
+                return None
+
+            return ScoreDigest.from_json(data['digest'])
+
+        except (IOError, ValueError, KeyError):
+
+            return None
+
+
+    @staticmethod
+    def sidecar(path):
+        """Returns the pathname of the digest of the score at path
+
+        """
+
+        return path + ScoreDigest.EXTENSION
@@ -0,0 +1,123 @@
+"""
+
+.. module:: features
+     :synopsis: A module for describing everything that ScoreDiff compares
+       in a measure with plain strings and numbers
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+from tables import *
+from notetable import *
+
+
+#The categories of differences that can be detected, in the order they are reported
+CATEGORIES = ['pitches', 'accidentals', 'articulations', 'ornaments', 'spanners',
+              'stems', 'clef', 'key', 'time']
+
+#The names of the signs in the contour category
+CONTOURS = {-1: 'down', 0: 'same', 1: 'up'}
+
+
+def decode_values(category, values):
+    """Decodes the values a NoteTable compares for a note category into
+    readable names, in the same order
+
+    Args:
+      category (str):  A key of NoteTable.SELECTIONS
+
+      values (numpy.ndarray):  The values, as returned by NoteTable.values
+
+    Returns:
+      list.  Pitch names, accidental or stem names, the class names of the
+      articulations, ornaments or spanners, one note after the other, intervals
+      in semitones, 'up', 'down' and 'same' for the contour, or the durations of the
+      notes in quarter lengths for the rhythm
+
+
+    """
+
+    if(category in ['pitches', 'pitches_ignore_order']):
+
+        return [pitch_name(key) for key in values]
+
+    if(category == 'intervals'):
+
+        return [int(cents) // 100 if cents % 100 == 0 else cents / 100.0 for cents in values]
+
+    if(category == 'contour'):
+
+        return [CONTOURS[int(sign)] for sign in values]
+
+    if(category == 'rhythm'):
+
+        return [ticks / float(TICKS) for ticks in values]
+
+    if(category in ['accidentals', 'stems']):
+
+        vocabulary = ACCIDENTALS if category == 'accidentals' else STEMS
+        return [decode(code, vocabulary) for code in values]
+
+    vocabulary = {'articulations': ARTICULATIONS, 'ornaments': ORNAMENT_NAMES, 'spanners': SPANNERS}[category]
+    names = []
+
+    for value in values:
+
+        names += decode_sequence(value, vocabulary)
+
+    return names
+
+
+class MeasureFeatures:
+    """The MeasureFeatures class decodes the rows of a measure in a NoteTable
+    into the value of every category in CATEGORIES, using plain strings and
+    numbers so that they can be read and compared directly.  Pitches are named
+    as by pitch_name, and articulations, ornaments and spanners by their class
+    names, in the order of the notes they belong to.  pitches_ignore_order holds
+    the same pitches as pitches, sorted.  intervals holds the steps between
+    neighbouring pitches in semitones, and contour their directions.  rhythm
+    holds the duration of every note and chord.
+
+    """
+
+    def __init__(self, table, msr, clef=None, key_signature=None, time_signature=None):
+        """Decodes the features of a measure
+
+        Args:
+          table (NoteTable):  The notes of the part
+
+          msr (int):  The index of the measure
+
+        Kwargs:
+          clef (music21.clef.Clef):  The clef in effect at the measure
+
+          key_signature (music21.key.KeySignature):  The key signature in effect at the measure
+
+          time_signature (music21.meter.TimeSignature):  The time signature in effect at the measure
+
+        """
+
+        for category in NoteTable.SELECTIONS:
+
+            setattr(self, category, decode_values(category, table.values(category, msr)))
+
+        self.clef = Tables.SIGNATURES['clef'](clef)
+        self.key = Tables.SIGNATURES['key'](key_signature)
+        self.time = Tables.SIGNATURES['time'](time_signature)
+
+
+    def get(self, category):
+        """Returns the value of one category
+
+        Args:
+          category (str):  One of CATEGORIES
+
+        Returns:
+          list for the note categories, and the signature of the context
+          object for clef, key and time
+
+        """
+
+        return getattr(self, category)
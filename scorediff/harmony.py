@@ -0,0 +1,220 @@
+"""
+
+.. module:: harmony
+     :synopsis: A module for describing what sounds at every moment of a score,
+       across all of its parts, so that the harmony of two scores can be compared
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+import numpy
+from bisect import bisect_right
+from collections import namedtuple
+
+
+#A span of time where two timelines differ, found by Timeline.differences.  detail
+#holds the (pitch classes, bass) sounding in each score, as returned by Timeline.at
+HarmonicDifference = namedtuple('HarmonicDifference', ['start', 'stop', 'detail'])
+
+PITCH_CLASSES = ['C', 'C#', 'D', 'E-', 'E', 'F', 'F#', 'G', 'G#', 'A', 'B-', 'B']
+
+
+def pitch_class_names(mask):
+    """Returns the names of the pitch classes set in a 12 bit mask
+
+    Args:
+      mask (int):  Bit n is set when pitch class n (0 for C) sounds
+
+    Returns:
+      list
+
+
+    """
+
+    return [name for bit, name in enumerate(PITCH_CLASSES) if int(mask) >> bit & 1]
+
+
+class Timeline:
+    """The Timeline class divides a score into vertical slices: the spans of time
+    in which the same pitches sound in all of the parts together.  Each slice is
+    encoded as a 12 bit mask of the pitch classes that sound and the MIDI number
+    of the lowest pitch (the bass), or -1 when nothing sounds.  Neighbouring slices
+    with the same encoding are merged.  Sounding pitches are rounded to the nearest
+    semitone.
+
+    """
+
+    def __init__(self, times, masks, bass):
+        """Initializes a Timeline object
+
+        Args:
+          times (numpy.ndarray):  The boundaries of the slices in quarter lengths, one
+          more than the number of slices
+
+          masks (numpy.ndarray):  The pitch class mask of each slice
+
+          bass (numpy.ndarray):  The MIDI number of the bass of each slice, -1 for none
+
+        """
+
+        self.times = numpy.asarray(times, dtype=numpy.float64)
+        self.masks = numpy.asarray(masks, dtype=numpy.int64)
+        self.bass = numpy.asarray(bass, dtype=numpy.int64)
+
+
+    @staticmethod
+    def build(notes, part_count):
+        """Builds the timeline of a score in one sweep over the notes of all of
+        its parts, with array operations
+
+        Args:
+          notes (NoteIndex):  The notes of the score
+
+          part_count (int):  The number of parts in the score
+
+        Returns:
+          Timeline
+
+        """
+
+        starts = []
+        stops = []
+        pitches = []
+
+        for part in range(0, part_count):
+
+            table = notes.part(part)
+            sounding = table.duration > 0
+            starts.append(table.offset[sounding])
+            stops.append(table.offset[sounding] + table.duration[sounding])
+            pitches.append(numpy.clip(numpy.round(table.ps[sounding]), 0, 127).astype(numpy.int64))
+
+        starts = numpy.concatenate(starts) if starts else numpy.zeros(0)
+        stops = numpy.concatenate(stops) if stops else numpy.zeros(0)
+        pitches = numpy.concatenate(pitches) if pitches else numpy.zeros(0, dtype=numpy.int64)
+        times = numpy.unique(numpy.concatenate([starts, stops]))
+
+        if(len(times) < 2):
+
+            return Timeline(numpy.zeros(1), [], [])
+
+        count = len(times) - 1
+
+        #count the notes sounding on each of the 132 rows (11 octaves of 12
+        #pitch classes) at every slice, adding at the start and removing at the stop
+        sounding = numpy.zeros((132, count + 1), dtype=numpy.int32)
+        numpy.add.at(sounding, (pitches, numpy.searchsorted(times, starts)), 1)
+        numpy.add.at(sounding, (pitches, numpy.searchsorted(times, stops)), -1)
+        sounding = numpy.cumsum(sounding, axis=1)[:, :count] > 0
+
+        classes = sounding.reshape(11, 12, count).any(axis=0)
+        masks = (classes * (1 << numpy.arange(12))[:, None]).sum(axis=0)
+        bass = numpy.where(sounding.any(axis=0), sounding.argmax(axis=0), -1)
+
+        changed = numpy.concatenate([[True], (masks[1:] != masks[:-1]) | (bass[1:] != bass[:-1])])
+        kept = numpy.flatnonzero(changed)
+        return Timeline(numpy.append(times[kept], times[-1]), masks[kept], bass[kept])
+
+
+    def at(self, time):
+        """Returns what sounds at a moment
+
+        Args:
+          time (float):  In quarter lengths from the start of the score
+
+        Returns:
+          tuple.  (mask, bass), which is (0, -1) when nothing sounds
+
+        """
+
+        slice_number = bisect_right(self.times, time) - 1
+
+        if(slice_number < 0 or slice_number >= len(self.masks)):
+
+            return (0, -1)
+
+        return (int(self.masks[slice_number]), int(self.bass[slice_number]))
+
+
+    def differences(self, other, start=None, stop=None, bass=True):
+        """Finds the spans of time where this timeline and other do not sound
+        the same
+
+        Args:
+          other (Timeline):  The timeline to compare with
+
+        Kwargs:
+          start and stop (float):  Only compare this span, the whole of both
+          timelines by default
+
+          bass (bool):  Set to False to compare the pitch classes only
+
+        Returns:
+          list.  HarmonicDifference(start, stop, detail) tuples in order of time,
+          where detail holds the pitch class names and bass of each timeline.
+          Neighbouring spans are merged when the details are the same
+
+        """
+
+        times = numpy.unique(numpy.concatenate([self.times, other.times]))
+
+        if(start is not None):
+
+            times = numpy.unique(numpy.append(times[times > start], start))
+
+        if(stop is not None):
+
+            times = numpy.unique(numpy.append(times[times < stop], stop))
+
+        if(len(times) < 2):
+
+            return []
+
+        lefts = times[:-1]
+        encoded1 = self.__lookup(lefts)
+        encoded2 = other.__lookup(lefts)
+        differs = encoded1[0] != encoded2[0]
+
+        if(bass):
+
+            differs |= encoded1[1] != encoded2[1]
+
+        differences = []
+
+        for segment in numpy.flatnonzero(differs):
+
+            detail = ((pitch_class_names(encoded1[0][segment]), int(encoded1[1][segment])),
+                      (pitch_class_names(encoded2[0][segment]), int(encoded2[1][segment])))
+
+            if(differences and differences[-1].stop == times[segment] and differences[-1].detail == detail):
+
+                differences[-1] = HarmonicDifference(differences[-1].start, float(times[segment + 1]), detail)
+
+            else:
+
+                differences.append(HarmonicDifference(float(times[segment]), float(times[segment + 1]), detail))
+
+        return differences
+
+
+    def __lookup(self, times):
+        """Returns the masks and basses sounding at many moments at once
+
+        """
+
+        slices = numpy.searchsorted(self.times, times, 'right') - 1
+        inside = (slices >= 0) & (slices < len(self.masks))
+        slices = numpy.clip(slices, 0, max(len(self.masks) - 1, 0))
+
+        if(len(self.masks) == 0):
+
+            return (numpy.zeros(len(times), dtype=numpy.int64), numpy.full(len(times), -1, dtype=numpy.int64))
+
+        return (numpy.where(inside, self.masks[slices], 0), numpy.where(inside, self.bass[slices], -1))
+
+
+    def __len__(self):
+
+        return len(self.masks)
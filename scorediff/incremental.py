@@ -0,0 +1,466 @@
+"""
+
+.. module:: incremental
+     :synopsis: A module for comparing an edited score with a reference again,
+       reading and comparing only the measures that changed since the last time
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+import os
+import time
+import mmap
+import hashlib
+import logging
+import zipfile
+import numpy
+from reader import *
+from measureindex import *
+from digest import *
+from align import *
+from scorediff import *
+
+
+#The categories the measures of an edited score are digested in, so that
+#the measures that changed in any category are found
+DIGESTED = CATEGORIES + ['pitches_ignore_order', 'intervals', 'contour', 'rhythm']
+
+
+class PartHistory:
+    """The PartHistory class holds what an IncrementalReader keeps of one
+    part of a MusicXML file until the next read: a hash of the bytes of every
+    measure, the state of the PartReader when every measure starts and once the
+    part ends, whether a spanner was open at each of these points, the context
+    objects and offsets of the measures, and the NoteTable and contexts of
+    every staff.  It takes the place of a PartReader in MusicXMLReader.assemble.
+
+    """
+
+    def __init__(self, hashes, states, clean, reader, tables):
+        """Initializes a PartHistory object
+
+        Args:
+          hashes (list):  The hash of the element of every measure
+
+          states (list):  The state of the reader when every measure starts, as
+          returned by PartReader.snapshot, and its state once the part ends
+
+          clean (list):  For the same points, True when no spanner was open
+
+          reader (PartReader):  The reader the part was read with
+
+          tables (list):  A (NoteTable, contexts) pair for each staff
+
+        """
+
+        self.hashes = hashes
+        self.states = states
+        self.clean = clean
+        self.contexts = reader.contexts
+        self.offsets = reader.offsets
+        self.staves = reader.staves
+        self.staff_tables = tables
+
+
+    def tables(self):
+        """Returns the notes and contexts of the part, as PartReader.tables does
+
+        Returns:
+          list.  A (NoteTable, contexts) pair for each staff
+
+        """
+
+        return self.staff_tables
+
+
+class IncrementalReader:
+    """The IncrementalReader class reads the same MusicXML file again each
+    time it is edited, parsing only the measures whose bytes changed.  The
+    measures are found with MeasureIndex.scan, and the hashes of their elements
+    are aligned with those of the last read, so that measures moved by an
+    insertion or a deletion are still recognized.  An unchanged measure is
+    reused when the part is in the same state where it starts, and its notes
+    are taken from the last NoteTable.  The measures read again start and end
+    where no spanner is open, so every spanner is read whole.  The digest of
+    every measure is kept, and the measures that differ from the last read in
+    any category are reported in changed.
+
+    .. note:: Only uncompressed MusicXML files can be read this way.
+
+    """
+
+    def __init__(self, path):
+        """Initializes an IncrementalReader object
+
+        Args:
+          path (str):  The full pathname of the score
+
+        """
+
+        self.path = path
+        self.parts = {}
+        self.digests = None
+        self.changed = None
+        self.signature = None
+
+
+    def modified(self):
+        """Checks if the file was saved since the last read
+
+        Returns:
+          boolean
+
+        """
+
+        info = os.stat(self.path)
+        return (info.st_size, info.st_mtime) != self.signature
+
+
+    def read(self):
+        """Reads the file, reusing the measures of the last read that did not change
+
+        Returns:
+          ScoreEntry.  An entry without a score, whose measures are a MeasureOutline
+
+        Raises:
+          ValueError: If the file is compressed or is not a score-partwise document
+
+        """
+
+        if(zipfile.is_zipfile(self.path)):
+
+            raise ValueError("only uncompressed MusicXML files can be read incrementally: " + self.path)
+
+        info = os.stat(self.path)
+        parts = {}
+
+        with open(self.path, 'rb') as source:
+
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+            try:
+
+                encoding = MeasureIndex.declared_encoding(mapped)
+                order, found = MeasureIndex.scan(mapped)
+
+                for name in [name for name in order if name in found]:
+
+                    parts[name] = self.__read_part(mapped, encoding, found[name], self.parts.get(name))
+
+            finally:
+
+                mapped.close()
+
+        entry = MusicXMLReader.assemble([parts[name] for name in order if name in parts])
+        digests = [measure_digests(part_leaves(entry.measures, entry.index, entry.notes, part, DIGESTED))
+                   for part in range(0, entry.measures.part_count())]
+
+        self.changed = None if self.digests is None else IncrementalReader.__compare(self.digests, digests)
+        self.parts = parts
+        self.digests = digests
+        self.signature = (info.st_size, info.st_mtime)
+        return entry
+
+
+    @staticmethod
+    def __compare(previous, digests):
+        """Returns {part:list} with the measures of every part whose digests
+        differ, including the measures that only one of the reads has
+
+        """
+
+        changed = {}
+
+        for part, current in enumerate(digests):
+
+            old = previous[part] if part < len(previous) else numpy.zeros(0, dtype=numpy.uint64)
+            count = min(len(old), len(current))
+            changed[part] = [int(msr) for msr in numpy.flatnonzero(old[:count] != current[:count])] + \
+                            range(count, max(len(old), len(current)))
+
+        return changed
+
+
+    def __read_part(self, mapped, encoding, ranges, old):
+        """Reads one part, reusing the runs of measures of old that did not change
+
+        Args:
+          mapped (mmap.mmap):  The bytes of the file
+
+          encoding (str):  The encoding of the file
+
+          ranges (list):  The (start, stop) byte range of every measure
+
+          old (PartHistory):  The part as it was last read, None to read every measure
+
+        Returns:
+          PartHistory
+
+        """
+
+        hashes = [hashlib.sha1(mapped[start:stop]).digest() for start, stop in ranges]
+        matched = {}
+
+        if(old is not None):
+
+            for edit in edit_script(old.hashes, hashes):
+
+                if(edit.operation == 'match'):
+
+                    matched[edit.measure2] = edit.measure1
+
+        reader = PartReader()
+        states = []
+        clean = []
+        runs = []
+        msr = 0
+
+        while(msr < len(ranges)):
+
+            stop = self.__reusable(old, reader, matched, msr)
+
+            if(stop is None):
+
+                states.append(reader.snapshot())
+                clean.append(not reader.open and not reader.pending)
+                reader.read_measure(MeasureIndex.parse(mapped[ranges[msr][0]:ranges[msr][1]], encoding))
+                msr += 1
+
+            else:
+
+                first = matched[msr]
+                shift = reader.offset - old.states[first][0]
+                runs.append((first, stop, msr, shift))
+                self.__replay(old, reader, first, stop, shift, states, clean)
+                msr += stop - first
+
+        states.append(reader.snapshot())
+        clean.append(not reader.open and not reader.pending)
+
+        if(not runs):
+
+            return PartHistory(hashes, states, clean, reader, reader.tables())
+
+        #a staff added after the reused measures leaves no table to take them from
+        if(reader.staves != old.staves):
+
+            return self.__read_part(mapped, encoding, ranges, None)
+
+        tables = [(self.__splice(table, old.staff_tables[staff][0], runs, len(ranges)), contexts)
+                  for staff, (table, contexts) in enumerate(reader.tables())]
+
+        logging.debug("reused " + str(sum(stop - first for first, stop, start, shift in runs)) + " of " +
+                      str(len(ranges)) + " measures")
+        return PartHistory(hashes, states, clean, reader, tables)
+
+
+    def __reusable(self, old, reader, matched, msr):
+        """Returns the measure after the run of unchanged measures of old that
+        can be reused from measure msr on, or None if measure msr must be read.
+        The run must start in the state the reader is in, and start and end where
+        no spanner is open
+
+        """
+
+        first = matched.get(msr)
+
+        if(first is None or not old.clean[first] or reader.open or reader.pending or
+           old.states[first][1:] != reader.snapshot()[1:]):
+
+            return None
+
+        stop = first + 1
+
+        while(matched.get(msr + stop - first) == stop):
+
+            stop += 1
+
+        while(stop > first and not old.clean[stop]):
+
+            stop -= 1
+
+        return stop if stop > first else None
+
+
+    def __replay(self, old, reader, first, stop, shift, states, clean):
+        """Adds the measures of a reused run to the reader, as if it had read them
+
+        """
+
+        #the context objects in effect when the run starts are the reader's own
+        replaced = {}
+
+        if(first > 0):
+
+            clefs, key, time_signature = old.contexts[first - 1]
+            replaced = dict((id(clef), reader.clefs.get(staff)) for staff, clef in clefs.items())
+            replaced[id(key)] = reader.key
+            replaced[id(time_signature)] = reader.time
+
+        for msr in range(first, stop):
+
+            states.append([old.states[msr][0] + shift] + old.states[msr][1:])
+            clean.append(old.clean[msr])
+            clefs, key, time_signature = old.contexts[msr]
+            reader.contexts.append((dict((staff, replaced.get(id(clef), clef)) for staff, clef in clefs.items()),
+                                    replaced.get(id(key), key), replaced.get(id(time_signature), time_signature)))
+            reader.offsets.append(old.offsets[msr] + shift)
+
+        clefs, reader.key, reader.time = reader.contexts[-1]
+        reader.clefs = dict(clefs)
+        reader.offset = old.states[stop][0] + shift
+        reader.divisions = old.states[stop][1]
+        reader.staves = old.states[stop][2]
+
+
+    def __splice(self, table, old_table, runs, count):
+        """Builds the NoteTable of a staff from the rows of the measures read
+        again, in table, and the rows of the reused runs, in old_table
+
+        """
+
+        pieces = []
+        msr = 0
+
+        for first, stop, start, shift in runs + [(0, 0, count, 0.0)]:
+
+            pieces.append((table, table.starts[msr], table.starts[start], 0, 0.0))
+            pieces.append((old_table, old_table.starts[first], old_table.starts[stop], start - first, shift))
+            msr = start + stop - first
+
+        columns = dict((name, []) for name, dtype in NoteTable.COLUMNS)
+        chord = 0
+
+        for source, start, stop, moved, shift in pieces:
+
+            if(stop == start):
+
+                continue
+
+            for name, dtype in NoteTable.COLUMNS:
+
+                columns[name].append(getattr(source, name)[start:stop])
+
+            #the chords are numbered one after the other through the whole staff
+            columns['measure'][-1] = columns['measure'][-1] + moved
+            columns['offset'][-1] = columns['offset'][-1] + shift
+            columns['chord'][-1] = columns['chord'][-1] - columns['chord'][-1][0] + chord
+            chord = columns['chord'][-1][-1] + 1
+
+        return NoteTable(dict((name, numpy.concatenate(columns[name]) if columns[name] else [])
+                              for name in columns), count)
+
+
+class IncrementalDiff:
+    """The IncrementalDiff class compares an edited score with a reference,
+    and compares them again each time the edited score is saved.  The edited
+    score is read with an IncrementalReader, and only the measures it reports
+    as changed are compared again; the differences found in the other measures
+    are kept.
+
+    """
+
+    def __init__(self, reference, edited, localCorpusPath='.', categories=None, use_cache=True, registry=None):
+        """Reads both scores and compares them.  The reference is read once, with a
+        MusicXMLReader, and the edited score with the IncrementalReader
+
+        Args:
+          reference (str):  The pathname of the score that does not change
+
+          edited (str):  The pathname of the score that is edited, an uncompressed MusicXML file
+
+        Kwargs:
+          localCorpusPath (str):  A path to a corpus if your files are located elsewhere
+
+          categories (list):  The categories to compare, all of CATEGORIES by default
+
+          use_cache (bool):  Set to False to always read the reference instead of reusing
+          the entry held in the registry
+
+          registry (ScoreRegistry):  The in-memory registry to use instead of the default one
+
+        """
+
+        self.categories = CATEGORIES if categories is None else list(categories)
+        self.reader = IncrementalReader(find_score(edited))
+        self.scores = ScoreDiff(reference, edited, localCorpusPath, use_cache, None, registry, reader='stream',
+                                entries=[None, self.reader.read()])
+        self.differences = self.scores.diff(self.categories)
+
+
+    def refresh(self):
+        """Compares the scores again if the edited score was saved since the last comparison
+
+        Returns:
+          dictionary.  {part:list} with the measures of every part of the edited
+          score that changed, or None if the file was not saved
+
+        """
+
+        if(not self.reader.modified()):
+
+            return None
+
+        self.scores.update(2, self.reader.read())
+        changed = self.reader.changed
+        parts = min(self.scores.measures1.part_count(), self.scores.measures2.part_count())
+        compared = dict((part, set(measures)) for part, measures in changed.items())
+        kept = [difference for difference in self.differences
+                if difference.category not in ['measures', 'parts'] and difference.part < parts and
+                difference.measure not in compared.get(difference.part, [])]
+        found = list(self.scores.iter_differences(self.categories, measures=changed))
+        ranks = dict((category, rank) for rank, category in enumerate(self.categories + ['measures']))
+        self.differences = sorted(kept + found, key=lambda difference: (difference.category == 'parts', difference.part,
+                                                                         difference.measure,
+                                                                         ranks.get(difference.category)))
+        return changed
+
+
+    def watch(self, callback, interval=0.05, timeout=None):
+        """Compares the scores again each time the edited score is saved,
+        polling its size and modification time
+
+        Args:
+          callback (function):  Called as callback(differences, changed) after each
+          comparison, with the differences as returned by ScoreDiff.diff and the
+          measures that changed, as returned by refresh.  Watching stops when it
+          returns False
+
+        Kwargs:
+          interval (float):  The time to wait between two polls, in seconds
+
+          timeout (float):  Stop watching after this many seconds, never by default
+
+        Returns:
+          int.  The number of comparisons made
+
+        """
+
+        started = time.time()
+        updates = 0
+
+        while(timeout is None or time.time() - started < timeout):
+
+            #a file caught while it is being written is read again at the next poll
+            try:
+
+                changed = self.refresh()
+
+            except (SyntaxError, ValueError, IOError) as error:
+
+                logging.debug("could not read " + self.reader.path + ": " + str(error))
+                changed = None
+
+            if(changed is not None):
+
+                updates += 1
+
+                if(callback(self.differences, changed) is False):
+
+                    break
+
+            time.sleep(interval)
+
+        return updates
@@ -0,0 +1,406 @@
+"""
+
+.. module:: measureindex
+     :synopsis: A module for finding where every measure of a MusicXML file is,
+       so that a window of measures can be read without parsing the whole file
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+import os
+import re
+import json
+import mmap
+import logging
+import zipfile
+from xml.etree import cElementTree
+from cache import *
+from reader import *
+
+
+class MeasureIndex:
+    """The MeasureIndex class records where every measure of a MusicXML file
+    starts and ends, in bytes, together with the state a PartReader is in when
+    the measure starts: its offset, the divisions and the clefs, key and time
+    signature in effect.  A window of measures is read by parsing only their
+    elements, taken from the file through a memory map, and the context carried
+    over from the measures before the window comes from the index.  An index can
+    be saved next to its score and loaded again without scanning the score.
+
+    .. note:: Only uncompressed MusicXML files in an encoding that extends ASCII,
+       such as UTF-8, can be indexed.  The notes of a window do not belong to the
+       spanners that start before it.
+
+    """
+
+    #The version of the format written by save
+    FORMAT = 1
+    EXTENSION = '.measures'
+
+    #The tags the byte ranges are found from.  Comments and CDATA sections are
+    #matched so that the tags they hold are skipped
+    TAGS = re.compile(r'<!--.*?-->|<!\[CDATA\[.*?\]\]>|'
+                      r'<(/?)(score-partwise|score-timewise|score-part|part|measure)(?=[\s/>])([^>]*)>', re.S)
+    ID = re.compile(r'\bid\s*=\s*(["\'])(.*?)\1')
+    ENCODING = re.compile(r'<\?xml[^>]*encoding\s*=\s*["\']([^"\']*)["\']')
+
+
+    def __init__(self, parts, encoding='utf-8'):
+        """Initializes a MeasureIndex object
+
+        Args:
+          parts (list):  For each part in score order, a dictionary holding its 'id',
+          its number of 'staves' and its 'measures': a [start, stop, state] list for
+          every measure, where start and stop are the byte offsets of its element and
+          state is as returned by PartReader.snapshot
+
+        Kwargs:
+          encoding (str):  The encoding of the file
+
+        """
+
+        self.parts = parts
+        self.encoding = encoding
+
+
+    @staticmethod
+    def build(path):
+        """Indexes a MusicXML file.  The byte ranges are found by scanning the
+        file for the part and measure tags, then the state at every measure is
+        found by reading the attributes and durations of the measures one at a
+        time, without reading their notes.  Every measure is still parsed, so
+        building an index costs a good part of reading the whole file, and
+        ScoreDiff saves it next to the score to be loaded on later runs
+
+        Args:
+          path (str):  The full pathname of the score
+
+        Returns:
+          MeasureIndex
+
+        Raises:
+          ValueError: If the file is compressed or is not a score-partwise document
+
+        """
+
+        if(zipfile.is_zipfile(path)):
+
+            raise ValueError("only uncompressed MusicXML files can be indexed: " + path)
+
+        with open(path, 'rb') as source:
+
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+            try:
+
+                index = MeasureIndex([], MeasureIndex.declared_encoding(mapped))
+                order, found = MeasureIndex.scan(mapped)
+
+                for name in [name for name in order if name in found]:
+
+                    reader = PartReader()
+                    measures = []
+
+                    for start, stop in found[name]:
+
+                        measures.append([start, stop, reader.snapshot()])
+                        reader.read_measure(MeasureIndex.parse(mapped[start:stop], index.encoding), False)
+
+                    index.parts.append({'id': name, 'staves': reader.staves, 'measures': measures})
+
+            finally:
+
+                mapped.close()
+
+        logging.debug("indexed " + str(len(index.parts)) + " parts of " + path)
+        return index
+
+
+    @staticmethod
+    def scan(mapped):
+        """Finds every measure of a MusicXML document by scanning it for the
+        part and measure tags, without parsing it
+
+        Args:
+          mapped (mmap.mmap or str):  The bytes of the document
+
+        Returns:
+          tuple.  (order, found), where order holds the ids of the parts in the
+          order of the part list, and found holds the (start, stop) byte range of
+          every measure of each part id
+
+        Raises:
+          ValueError: If the document is not a score-partwise document
+
+        """
+
+        order = []
+        found = {}
+        measures = None
+        start = None
+
+        for match in MeasureIndex.TAGS.finditer(mapped):
+
+            closing, tag, attributes = match.groups()
+
+            if(tag is None):
+
+                continue
+
+            if(tag == 'score-timewise'):
+
+                raise ValueError("only score-partwise documents can be indexed")
+
+            if(closing):
+
+                if(tag == 'measure' and measures is not None and start is not None):
+
+                    measures.append((start, match.end()))
+                    start = None
+
+                elif(tag == 'part'):
+
+                    measures = None
+
+                #anything after the end of the document is left unread
+                elif(tag == 'score-partwise'):
+
+                    break
+
+            elif(tag == 'score-part'):
+
+                order.append(MeasureIndex.__id(attributes))
+
+            elif(tag == 'part'):
+
+                measures = found.setdefault(MeasureIndex.__id(attributes), [])
+
+            elif(tag == 'measure' and measures is not None):
+
+                if(attributes.endswith('/')):
+
+                    measures.append((match.start(), match.end()))
+
+                else:
+
+                    start = match.start()
+
+        return order, found
+
+
+    @staticmethod
+    def __id(attributes):
+
+        found = MeasureIndex.ID.search(attributes)
+        return None if found is None else found.group(2)
+
+
+    @staticmethod
+    def declared_encoding(mapped):
+        """Returns the encoding declared by a MusicXML document, 'utf-8' if
+        it declares none
+
+        """
+
+        declared = MeasureIndex.ENCODING.match(mapped[:200])
+        return declared.group(1).lower() if declared else 'utf-8'
+
+
+    @staticmethod
+    def parse(fragment, encoding='utf-8'):
+        """Parses the element of one measure
+
+        Args:
+          fragment (str):  The bytes of the element, as found by scan
+
+        Kwargs:
+          encoding (str):  The encoding of the document
+
+        Returns:
+          xml.etree.ElementTree.Element
+
+        """
+
+        parser = cElementTree.XMLParser(encoding=encoding)
+        parser.feed(fragment)
+        return parser.close()
+
+
+    def part_count(self):
+        """Returns the number of parts in the file, counting a part written on
+        several staves once
+
+        Returns:
+          int
+
+        """
+
+        return len(self.parts)
+
+
+    def measure_count(self, part):
+        """Returns the number of measures in a part of the file
+
+        Args:
+          part (int):  The index of the part, as counted by part_count
+
+        Returns:
+          int
+
+        """
+
+        return len(self.parts[part]['measures'])
+
+
+    def read(self, path, start, stop):
+        """Reads a window of measures of every part
+
+        Args:
+          path (str):  The full pathname of the indexed score
+
+          start (int):  The first measure to read
+
+          stop (int):  The measure after the last one to read
+
+        Returns:
+          ScoreEntry.  An entry without a score, whose measures are a MeasureOutline.
+          Its measures are numbered from 0 for measure start, and their offsets are
+          counted from the start of the score
+
+        Raises:
+          ValueError: If the window holds no measures
+
+        """
+
+        if(start < 0 or stop <= start):
+
+            raise ValueError("empty measure window: " + str((start, stop)))
+
+        readers = []
+
+        with open(path, 'rb') as source:
+
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+            try:
+
+                for part in self.parts:
+
+                    reader = PartReader()
+                    measures = part['measures'][start:stop]
+
+                    if(measures):
+
+                        reader.resume(measures[0][2])
+
+                    for first, last, state in measures:
+
+                        reader.read_measure(MeasureIndex.parse(mapped[first:last], self.encoding))
+
+                    #a window has as many staves as the whole part
+                    reader.staves = max(reader.staves, part['staves'])
+                    readers.append(reader)
+
+            finally:
+
+                mapped.close()
+
+        return MusicXMLReader.assemble(readers)
+
+
+    def to_json(self):
+        """Returns the index as a JSON string
+
+        Returns:
+          str
+
+        """
+
+        return json.dumps({'format': MeasureIndex.FORMAT, 'encoding': self.encoding, 'parts': self.parts})
+
+
+    @staticmethod
+    def from_json(text):
+        """Reads an index written by to_json
+
+        Args:
+          text (str):  The JSON string
+
+        Returns:
+          MeasureIndex
+
+        Raises:
+          ValueError: If text is not an index in the current format
+
+        """
+
+        data = json.loads(text)
+
+        if(data.get('format') != MeasureIndex.FORMAT):
+
+            raise ValueError("unsupported measure index format: " + str(data.get('format')))
+
+        return MeasureIndex(data['parts'], str(data['encoding']))
+
+
+    def save(self, path):
+        """Writes the index next to the score it was built from, together
+        with the key of the score file so that stale indexes can be detected.
+        The key does not hash the contents of the file, which a windowed read
+        would otherwise have to read in full
+
+        Args:
+          path (str):  The full pathname of the score
+
+        """
+
+        text = json.dumps({'key': file_key(path, False), 'index': self.to_json()})
+        temp = MeasureIndex.sidecar(path) + '.' + str(os.getpid()) + '.tmp'
+
+        with open(temp, 'w') as sidecar:
+
+            sidecar.write(text)
+
+        os.rename(temp, MeasureIndex.sidecar(path))
+
+
+    @staticmethod
+    def load(path):
+        """Reads the index saved next to a score, without scanning the score
+
+        Args:
+          path (str):  The full pathname of the score
+
+        Returns:
+          MeasureIndex.  The index, or None if there is no index for the current
+          version of the file
+
+        """
+
+        try:
+
+            with open(MeasureIndex.sidecar(path)) as sidecar:
+
+                data = json.loads(sidecar.read())
+
+            if(data['key'] != file_key(path, False)):
+
+                logging.debug("stale measure index: " + path)
+                return None
+
+            return MeasureIndex.from_json(data['index'])
+
+        except (IOError, ValueError, KeyError):
+
+            return None
+
+
+    @staticmethod
+    def sidecar(path):
+        """Returns the pathname of the measure index of the score at path
+
+        """
+
+        return path + MeasureIndex.EXTENSION
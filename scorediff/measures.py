@@ -0,0 +1,120 @@
+"""
+
+.. module:: measures
+     :synopsis: A module for looking up the measures of a score and their notes
+       without building the same streams again
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+
+class MeasureDirectory:
+    """The MeasureDirectory class collects the measures of every part of a
+    score once, so that the number of parts, the number of measures in each
+    part, the measures themselves and their offsets from the start of the part
+    can be looked up without querying the score again.  The flattened notes of
+    a measure are built the first time they are asked for and kept for every
+    later lookup.
+
+    """
+
+    def __init__(self, score):
+        """Collects the measures of every part of score
+
+        Args:
+          score (music21.stream.Score):  A music21 score object to analyze
+
+        """
+
+        self.parts = []
+        self.offsets = []
+
+        for part in score.parts:
+
+            measures = list(part.getElementsByClass('Measure'))
+            self.parts.append(measures)
+            self.offsets.append([measure.getOffsetBySite(part) for measure in measures])
+
+        self.lengths = [len(measures) for measures in self.parts]
+        self.__notes = [[None] * length for length in self.lengths]
+
+
+    def part_count(self):
+        """Returns the number of parts in the score
+
+        Returns:
+          int
+
+        """
+
+        return len(self.parts)
+
+
+    def measure_count(self, part):
+        """Returns the number of measures in a part
+
+        Args:
+          part (int):  The index of the part
+
+        Returns:
+          int
+
+        """
+
+        return self.lengths[part]
+
+
+    def measures(self, part):
+        """Returns the measures of a part
+
+        Args:
+          part (int):  The index of the part
+
+        Returns:
+          list.  The music21.stream.Measure objects of the part, in order
+
+        """
+
+        return self.parts[part]
+
+
+    def measure(self, part, msr):
+        """Returns one measure of a part
+
+        Args:
+          part (int):  The index of the part
+
+          msr (int):  The index of the measure within the part
+
+        Returns:
+          music21.stream.Measure
+
+        """
+
+        return self.parts[part][msr]
+
+
+    def notes(self, part, msr):
+        """Returns the notes and chords of a measure, flattened so that
+        notes in every voice are included
+
+        Args:
+          part (int):  The index of the part
+
+          msr (int):  The index of the measure within the part
+
+        Returns:
+          music21.stream.Stream.  The same stream is returned every time
+
+        """
+
+        notes = self.__notes[part][msr]
+
+        if(notes is None):
+
+            notes = self.parts[part][msr].flat.notes
+            self.__notes[part][msr] = notes
+
+        return notes
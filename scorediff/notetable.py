@@ -0,0 +1,812 @@
+"""
+
+.. module:: notetable
+     :synopsis: A module for lowering the notes of a score into NumPy arrays
+       so that measures and whole parts can be compared with array operations
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+import inspect
+import numpy
+import music21.pitch
+import music21.note
+from music21 import articulations, dynamics, expressions, spanner
+
+
+#This ornaments list is used as a reference when comparing ornaments
+ORNAMENTS = set(['Appoggiatura', 'GeneralAppoggiatura', 'GeneralMordent', 'HalfStepAppoggiatura',
+                 'HalfSetpInvertedAppoggiatura', 'HalfStepInvertedMordent', 'HalfStepMordent', 'HalfStepTrill',
+                 'InvertedAppoggiatura', 'InvertedMordent', 'InvertedTurn', 'Mordent', 'Schleifer', 'Shake',
+                 'Tremolo', 'Trill', 'Turn', 'WholeStepAppoggiatura', 'WholeStepInvertedAppoggiatura',
+                 'WholeStepInvertedMordent', 'WholeStepMordent', 'WholeStepTrill'])
+
+
+def subclass_names(modules, base_class):
+    """Returns the sorted names of the subclasses of base_class defined in modules
+
+
+    """
+
+    names = set()
+
+    for module in modules:
+
+        for name, value in vars(module).items():
+
+            if(inspect.isclass(value) and issubclass(value, base_class)):
+
+                names.add(name)
+
+    return sorted(names)
+
+
+#The vocabularies used to encode names as small integers.  Code 0 always means
+#"none", and names that are not in a vocabulary share its last code
+ACCIDENTALS = sorted(music21.pitch.accidentalNameToModifier.keys())
+STEMS = sorted(music21.note.stemDirectionNames)
+ARTICULATIONS = subclass_names([articulations], articulations.Articulation)[:62]
+SPANNERS = subclass_names([spanner, dynamics, expressions], spanner.Spanner)[:62]
+ORNAMENT_NAMES = sorted(ORNAMENTS)
+STEPS = 'CDEFGAB'
+
+#The number of ticks in a quarter length, which divides every common tuplet
+TICKS = 10080
+
+#The number of names of a note kept by encode_sequence, 6 bits each
+SEQUENCE_LENGTH = 10
+
+
+def encode(name, vocabulary):
+    """Returns the code of name in vocabulary: 0 for None, 1 to len(vocabulary)
+    for the names in it and len(vocabulary) + 1 for any other name
+
+
+    """
+
+    if(name is None):
+
+        return 0
+
+    try:
+
+        return vocabulary.index(name) + 1
+
+    except ValueError:
+
+        return len(vocabulary) + 1
+
+
+def decode(code, vocabulary):
+    """Returns the name for a code returned by encode
+
+
+    """
+
+    if(code == 0):
+
+        return None
+
+    if(code > len(vocabulary)):
+
+        return 'other'
+
+    return vocabulary[code - 1]
+
+
+def encode_sequence(names, vocabulary, ordered=True):
+    """Returns one integer holding the codes of names in vocabulary, 6 bits each,
+    so that two notes have the same integer exactly when they have the same names
+    the same number of times, in the same order.  The names after the first
+    SEQUENCE_LENGTH are not kept
+
+    Kwargs:
+      ordered (bool):  Whether the order of the names matters.  If not, the codes are sorted
+
+    """
+
+    codes = [encode(name, vocabulary) for name in names]
+
+    if(not ordered):
+
+        codes.sort()
+
+    value = 0
+
+    for code in reversed(codes[:SEQUENCE_LENGTH]):
+
+        value = value * 64 + code
+
+    return value
+
+
+def decode_sequence(value, vocabulary):
+    """Returns the names held by an integer returned by encode_sequence, in order
+
+
+    """
+
+    names = []
+    value = int(value)
+
+    while(value):
+
+        names.append(decode(value % 64, vocabulary))
+        value //= 64
+
+    return names
+
+
+def chord_stems(stems):
+    """Returns the codes of the different stem directions of a note or chord, in
+    the order of STEMS.  A chord whose pitches all have the same stem direction
+    has one, as for a single note
+
+
+    """
+
+    return sorted(set(encode(stem, STEMS) for stem in stems))
+
+
+def pitch_key(diatonic, accidental, ps):
+    """Combines the spelling and the sounding pitch of a pitch into one integer.
+    Two pitches have the same key when they are equal as music21 pitches: same
+    step, octave and accidental (no accidental differs from a natural sign), and
+    the same microtonal inflection
+
+
+    """
+
+    return (int(diatonic) + 128) * 2 ** 32 + int(accidental) * 2 ** 24 + int(round(ps * 100)) + 2 ** 20
+
+
+def pitch_name(key):
+    """Returns the name with octave of a pitch key.  An explicit natural is written
+    as 'n', because a pitch with a natural sign is not equal to the same pitch without one
+
+    Returns:
+      str.  For example 'C#4', 'Cn4' or 'C4'
+
+    """
+
+    diatonic = int(key // 2 ** 32) - 128
+    accidental = decode(int(key // 2 ** 24) % 2 ** 8, ACCIDENTALS)
+    step = STEPS[(diatonic - 1) % 7]
+    octave = (diatonic - 1) // 7
+
+    if(accidental is None):
+
+        modifier = ''
+
+    elif(accidental == 'natural'):
+
+        modifier = 'n'
+
+    else:
+
+        modifier = music21.pitch.accidentalNameToModifier.get(accidental, '?')
+
+    return step + modifier + str(octave)
+
+
+def mix(values):
+    """Scrambles an array of 64 bit integers so that nearby inputs give unrelated
+    outputs (the finalizer of the SplitMix64 generator).  The arithmetic wraps
+    around, so the result does not depend on the platform
+
+    Returns:
+      numpy.ndarray.  An array of numpy.uint64
+
+    """
+
+    values = numpy.asarray(values).astype(numpy.uint64)
+
+    with numpy.errstate(over='ignore'):
+
+        values = (values ^ (values >> numpy.uint64(30))) * numpy.uint64(0xbf58476d1ce4e5b9)
+        values = (values ^ (values >> numpy.uint64(27))) * numpy.uint64(0x94d049bb133111eb)
+
+    return values ^ (values >> numpy.uint64(31))
+
+
+def measure_fingerprints(keys, starts, ordered=True):
+    """Returns a 64 bit fingerprint for the values of every measure.  Measures with
+    the same values always have the same fingerprint, and measures with different
+    values almost never do
+
+    Args:
+      keys (numpy.ndarray):  The values of all the measures, one measure after the other
+
+      starts (numpy.ndarray):  The index of the first value of every measure, followed
+      by the number of values
+
+    Kwargs:
+      ordered (bool):  Whether the order of the values within a measure matters
+
+    Returns:
+      numpy.ndarray.  A numpy.uint64 for each measure
+
+    """
+
+    starts = numpy.asarray(starts)
+    lengths = numpy.diff(starts)
+    hashed = mix(keys[starts[0]:starts[-1]])
+
+    if(ordered):
+
+        #mix each value with its position in the measure
+        positions = numpy.arange(starts[-1] - starts[0]) - numpy.repeat(starts[:-1] - starts[0], lengths)
+        hashed = mix(hashed ^ mix(positions + 1))
+
+    totals = numpy.concatenate([numpy.zeros(1, dtype=numpy.uint64), numpy.cumsum(hashed, dtype=numpy.uint64)])
+    sums = totals[starts[1:] - starts[0]] - totals[starts[:-1] - starts[0]]
+    return mix(sums ^ mix(lengths))
+
+
+class NoteTable:
+    """The NoteTable class holds the notes of one part as NumPy arrays, with one
+    row per pitch (a chord takes one row for each of its pitches).  The columns are:
+
+      measure: the index of the measure
+
+      offset, duration: in quarter lengths, offset from the start of the part
+
+      ps: the sounding pitch, as in music21.pitch.Pitch.ps
+
+      pitch: the pitch key, see pitch_key
+
+      accidental: the code of the accidental in ACCIDENTALS
+
+      reported: the code of the accidental ScoreDiff.have_same_accidentals reports
+      for this pitch, or -1 if it reports none
+
+      stem: on the first rows of each note or chord, one code in STEMS for each of
+      its different stem directions, in the order of STEMS (see chord_stems); 0 on the others
+
+      stem_first: True on the rows that hold a stem direction
+
+      chord: the index of the note or chord the pitch belongs to, within the part
+
+      first: True for the first row of each note or chord
+
+      voice: the number of the voice the note is in, 0 if the measure has no voices
+
+      articulations, ornaments, spanners: the class names of the articulations,
+      ornaments and spanners of the note or chord in ARTICULATIONS, ORNAMENT_NAMES and
+      SPANNERS, encoded with encode_sequence on its first row only.  Articulations and
+      ornaments keep their order and number within the note.  Spanners are kept by
+      class name in sorted order, so the notes of two scores that are in spanners of
+      the same kinds compare equal
+
+    Four more columns are derived from these when the table is built:
+
+      interval: the distance in cents from the pitch of the previous row of the
+      same measure, 0 on the first row of each measure
+
+      contour: the sign of interval, -1, 0 or 1
+
+      follows: True unless the row is the first of its measure
+
+      ticks: the duration in TICKS per quarter length, rounded
+
+    """
+
+    COLUMNS = [('measure', numpy.int32), ('offset', numpy.float64), ('duration', numpy.float64),
+               ('ps', numpy.float64), ('pitch', numpy.int64), ('accidental', numpy.int8),
+               ('reported', numpy.int8), ('stem', numpy.int8), ('stem_first', numpy.bool_),
+               ('chord', numpy.int32), ('first', numpy.bool_), ('voice', numpy.int16),
+               ('articulations', numpy.int64), ('ornaments', numpy.int64), ('spanners', numpy.int64)]
+
+    #The column compared for each category, and the column and minimum value
+    #that select the rows to compare
+    SELECTIONS = {'pitches': ('pitch', None, None), 'pitches_ignore_order': ('pitch', None, None),
+                  'accidentals': ('reported', 'reported', 0), 'stems': ('stem', 'stem_first', 1),
+                  'articulations': ('articulations', 'articulations', 1),
+                  'ornaments': ('ornaments', 'ornaments', 1), 'spanners': ('spanners', 'spanners', 1),
+                  'intervals': ('interval', 'follows', 1), 'contour': ('contour', 'follows', 1),
+                  'rhythm': ('ticks', 'first', 1)}
+
+
+    def __init__(self, columns, measure_count):
+        """Initializes a NoteTable object from its columns, and computes the
+        fingerprint of every measure in every category
+
+        Args:
+          columns (dict):  A list of values or an array for each name in NoteTable.COLUMNS
+
+          measure_count (int):  The number of measures in the part
+
+        """
+
+        for name, dtype in NoteTable.COLUMNS:
+
+            setattr(self, name, numpy.asarray(columns[name], dtype=dtype))
+
+        self.measure_count = measure_count
+        self.starts = numpy.searchsorted(self.measure, numpy.arange(measure_count + 1))
+        self.__selections = {}
+        self.fingerprints = {}
+
+        #the melodic intervals within each measure, which do not change when
+        #the measure is transposed
+        cents = numpy.round(self.ps * 100).astype(numpy.int64)
+        self.follows = numpy.ones(len(cents), dtype=numpy.bool_)
+        self.follows[self.starts[:-1][self.starts[:-1] < len(cents)]] = False
+        self.interval = numpy.where(self.follows, cents - numpy.roll(cents, 1), 0)
+        self.contour = numpy.sign(self.interval)
+        self.ticks = numpy.round(self.duration * TICKS).astype(numpy.int64)
+
+        #the rows in order of onset, and of pitch for the rows with the same onset
+        self.onset_order = numpy.lexsort((self.pitch, self.offset))
+        self.onsets = self.offset[self.onset_order]
+        self.longest = self.duration.max() if len(self.duration) else 0.0
+
+        for category in NoteTable.SELECTIONS:
+
+            keys, starts = self.__selection(category)
+            ordered = category != 'pitches_ignore_order'
+            self.fingerprints[category] = measure_fingerprints(keys, starts, ordered)
+
+
+    @staticmethod
+    def lower(measures, part, keys, start=0, stop=None):
+        """Lowers the measures of a part into a NoteTable, walking every note once
+
+        Args:
+          measures (MeasureDirectory):  The measures of the score
+
+          part (int):  The index of the part
+
+          keys (ContextMap):  The key signature in effect at every measure of the part
+
+        Kwargs:
+          start (int):  The first measure to lower
+
+          stop (int):  The measure after the last one to lower, the end of the part
+          by default.  The measures of the table are numbered from start
+
+        Returns:
+          NoteTable
+
+        """
+
+        columns = dict((name, []) for (name, dtype) in NoteTable.COLUMNS)
+        chord = 0
+        stop = measures.measure_count(part) if stop is None else stop
+
+        for msr, measure in enumerate(measures.measures(part)[start:stop], start):
+
+            key_signature = keys[msr]
+            altered = [] if key_signature is None else [x.name for x in key_signature.alteredPitches]
+            naturals = set()
+            offset = measures.offsets[part][msr]
+            voices = {}
+
+            for number, voice in enumerate(measure.voices):
+
+                for note in voice.notes:
+
+                    voices[id(note)] = number + 1
+
+            notes = measures.notes(part, msr)
+
+            for note in notes:
+
+                if(note.isChord):
+
+                    pitches = note.pitches
+                    stems = chord_stems([note.getStemDirection(pitch) for pitch in pitches])
+
+                else:
+
+                    pitches = [note.pitch]
+                    stems = chord_stems([note.stemDirection])
+
+                ornaments = [cls for expression in note.expressions for cls in expression.classes
+                             if cls in ORNAMENTS]
+                event = [msr - start, offset + note.getOffsetBySite(notes), note.quarterLength]
+
+                for i, pitch in enumerate(pitches):
+
+                    accidental = None if pitch.accidental is None else pitch.accidental.name
+                    reported = -1
+
+                    #the rules of ScoreDiff.have_same_accidentals
+                    if(accidental is not None and not pitch.name in altered):
+
+                        reported = encode(accidental, ACCIDENTALS)
+
+                        if(accidental == 'natural'):
+
+                            naturals.add(pitch.name)
+
+                    elif(pitch.name in altered and pitch.name[0] in naturals):
+
+                        reported = encode(accidental, ACCIDENTALS)
+                        naturals.discard(pitch.name)
+
+                    code = encode(accidental, ACCIDENTALS)
+                    row = event + [pitch.ps, pitch_key(pitch.diatonicNoteNum, code, pitch.ps), code, reported,
+                                   stems[i] if i < len(stems) else 0, i < len(stems), chord, i == 0,
+                                   voices.get(id(note), 0)]
+
+                    if(i == 0):
+
+                        row += [encode_sequence([a.classes[0] for a in note.articulations], ARTICULATIONS),
+                                encode_sequence(ornaments, ORNAMENT_NAMES),
+                                encode_sequence([s.classes[0] for s in note.getSpannerSites()], SPANNERS, False)]
+
+                    else:
+
+                        row += [0, 0, 0]
+
+                    for (name, dtype), value in zip(NoteTable.COLUMNS, row):
+
+                        columns[name].append(value)
+
+                chord += 1
+
+        return NoteTable(columns, stop - start)
+
+
+    @staticmethod
+    def join(tables):
+        """Joins the tables of consecutive runs of measures of a part into the
+        table of all of their measures
+
+        Args:
+          tables (list):  The NoteTable of each run, in order
+
+        Returns:
+          NoteTable
+
+        """
+
+        columns = dict((name, []) for (name, dtype) in NoteTable.COLUMNS)
+        measure_count = 0
+        chord = 0
+
+        for table in tables:
+
+            for name, dtype in NoteTable.COLUMNS:
+
+                columns[name].append(getattr(table, name))
+
+            #the measures and chords are numbered one after the other through the part
+            columns['measure'][-1] = table.measure + measure_count
+            columns['chord'][-1] = table.chord + chord
+            measure_count += table.measure_count
+            chord += table.chord[-1] + 1 if len(table.chord) else 0
+
+        return NoteTable(dict((name, numpy.concatenate(columns[name]) if columns[name] else [])
+                              for name in columns), measure_count)
+
+
+    def measure_run(self, start, stop):
+        """Returns the table of a run of measures of this table
+
+        Args:
+          start (int):  The first measure of the run
+
+          stop (int):  The measure after the last one of the run
+
+        Returns:
+          NoteTable.  The rows of the run, with its measures numbered from start
+
+        """
+
+        rows = slice(self.starts[start], self.starts[stop])
+        columns = dict((name, getattr(self, name)[rows]) for name, dtype in NoteTable.COLUMNS)
+        columns['measure'] = columns['measure'] - start
+
+        if(len(columns['chord'])):
+
+            columns['chord'] = columns['chord'] - columns['chord'][0]
+
+        return NoteTable(columns, stop - start)
+
+
+    def rows(self, msr):
+        """Returns the rows of a measure
+
+        Args:
+          msr (int):  The index of the measure
+
+        Returns:
+          slice
+
+        """
+
+        return slice(self.starts[msr], self.starts[msr + 1])
+
+
+    def values(self, category, msr):
+        """Returns the values compared for one category in one measure
+
+        Args:
+          category (str):  A key of NoteTable.SELECTIONS
+
+          msr (int):  The index of the measure
+
+        Returns:
+          numpy.ndarray
+
+        """
+
+        keys, starts = self.__selection(category)
+        values = keys[starts[msr]:starts[msr + 1]]
+
+        if(category == 'pitches_ignore_order'):
+
+            values = numpy.sort(values)
+
+        return values
+
+
+    def sequences(self, category):
+        """Returns the values compared for a category in every measure of the
+        part, one measure after the other
+
+        Args:
+          category (str):  A key of NoteTable.SELECTIONS
+
+        Returns:
+          tuple.  (values, starts) arrays, where starts holds the index of the first
+          value of every measure, followed by the number of values
+
+        """
+
+        keys, starts = self.__selection(category)
+
+        if(category == 'pitches_ignore_order'):
+
+            measure = numpy.repeat(numpy.arange(self.measure_count), numpy.diff(starts))
+            keys = keys[numpy.lexsort((keys, measure))]
+
+        return keys, starts
+
+
+    def window(self, start, stop, sounding=False):
+        """Returns the rows of the notes that start in a span of time, found with
+        a binary search over the onsets of the part.  The cost is proportional to
+        the number of notes in the span, not to the number of measures before it
+
+        Args:
+          start and stop (float):  The span, in quarter lengths from the start of the
+          part, stop not included
+
+        Kwargs:
+          sounding (bool):  Also include the notes that start before the span and
+          are still sounding at its start
+
+        Returns:
+          numpy.ndarray.  The indices of the rows, in order of onset and then of pitch
+
+        """
+
+        low = start - self.longest if sounding else start
+        first = numpy.searchsorted(self.onsets, low, 'left')
+        last = numpy.searchsorted(self.onsets, stop, 'left')
+        rows = self.onset_order[first:last]
+
+        if(sounding):
+
+            rows = rows[(self.offset[rows] >= start) | (self.offset[rows] + self.duration[rows] > start)]
+
+        return rows
+
+
+    def window_values(self, category, rows):
+        """Returns the values compared for one category in some rows, such as
+        the rows returned by window
+
+        Args:
+          category (str):  A key of NoteTable.SELECTIONS
+
+          rows (numpy.ndarray):  The indices of the rows
+
+        Returns:
+          numpy.ndarray
+
+        """
+
+        column, mask, minimum = NoteTable.SELECTIONS[category]
+        values = getattr(self, column)[rows]
+
+        if(mask is not None):
+
+            values = values[getattr(self, mask)[rows] >= minimum]
+
+        if(category == 'pitches_ignore_order'):
+
+            values = numpy.sort(values)
+
+        return values
+
+
+    def same_measure(self, other, category, msr1, msr2):
+        """Compares one category of a measure of this table with a measure of other.
+        Measures with different fingerprints differ, and the values of measures
+        with the same fingerprint are compared to confirm that they are the same
+
+        Args:
+          other (NoteTable):  The table to compare with
+
+          category (str):  A key of NoteTable.SELECTIONS
+
+          msr1 and msr2 (int):  The measures to compare
+
+        Returns:
+          boolean
+
+        """
+
+        if(self.fingerprints[category][msr1] != other.fingerprints[category][msr2]):
+
+            return False
+
+        return numpy.array_equal(self.values(category, msr1), other.values(category, msr2))
+
+
+    def measure_equality(self, other, category):
+        """Compares one category of every measure of this table with the measure
+        with the same index in other.  Measures with different fingerprints differ,
+        and the values of all the measures with the same fingerprint are compared
+        at once to confirm that they are the same
+
+        Args:
+          other (NoteTable):  The table to compare with
+
+          category (str):  A key of NoteTable.SELECTIONS
+
+        Returns:
+          numpy.ndarray.  A boolean for each measure that exists in both tables,
+          True where the category is the same
+
+        """
+
+        count = min(self.measure_count, other.measure_count)
+        same = self.fingerprints[category][:count] == other.fingerprints[category][:count]
+        values1, starts1 = self.sequences(category)
+        values2, starts2 = other.sequences(category)
+        lengths = numpy.diff(starts1)[:count]
+        same &= lengths == numpy.diff(starts2)[:count]
+
+        #line up the values of the candidate measures and look for any that differ
+        candidates = numpy.flatnonzero(same & (lengths > 0))
+        lengths = lengths[candidates]
+        owners = numpy.repeat(numpy.arange(len(candidates)), lengths)
+        positions = numpy.arange(lengths.sum()) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+        differ = values1[starts1[candidates][owners] + positions] != values2[starts2[candidates][owners] + positions]
+        same[candidates[owners[differ]]] = False
+        return same
+
+
+    def __selection(self, category):
+        """Returns the values compared for a category across the whole part,
+        and the index of the first value of every measure
+
+        Returns:
+          tuple.  (values, starts) arrays
+
+        """
+
+        if(category not in self.__selections):
+
+            column, mask, minimum = NoteTable.SELECTIONS[category]
+            keys = getattr(self, column)
+            measure = self.measure
+
+            if(mask is not None):
+
+                selected = getattr(self, mask) >= minimum
+                keys = keys[selected]
+                measure = measure[selected]
+
+            starts = numpy.searchsorted(measure, numpy.arange(self.measure_count + 1))
+            self.__selections[category] = (keys, starts)
+
+        return self.__selections[category]
+
+
+    def __len__(self):
+
+        return len(self.measure)
+
+
+class NoteIndex:
+    """The NoteIndex class lowers the parts of a score into NoteTable objects
+    the first time each part is asked for
+
+    """
+
+    def __init__(self, measures, index):
+        """Initializes a NoteIndex object
+
+        Args:
+          measures (MeasureDirectory):  The measures of the score
+
+          index (dict):  The index of the score built by Tables
+
+        """
+
+        self.measures = measures
+        self.index = index
+        self.__tables = [None] * measures.part_count()
+
+
+    def part(self, part):
+        """Returns the NoteTable of a part
+
+        Args:
+          part (int):  The index of the part
+
+        Returns:
+          NoteTable
+
+        """
+
+        table = self.__tables[part]
+
+        if(table is None):
+
+            table = NoteTable.lower(self.measures, part, self.index['key'][part])
+            self.__tables[part] = table
+
+        return table
+
+
+    def lowered(self, part):
+        """Checks if the NoteTable of a part has been lowered or stored
+
+        Args:
+          part (int):  The index of the part
+
+        Returns:
+          boolean
+
+        """
+
+        return self.__tables[part] is not None
+
+
+    def measure_run(self, part, start, stop):
+        """Returns the NoteTable of a run of measures of a part, with its measures
+        numbered from start.  Only the measures of the run are lowered if the
+        part has not been lowered yet, and the table is not kept
+
+        Args:
+          part (int):  The index of the part
+
+          start (int):  The first measure of the run
+
+          stop (int):  The measure after the last one of the run
+
+        Returns:
+          NoteTable
+
+        """
+
+        table = self.__tables[part]
+
+        if(table is not None):
+
+            return table.measure_run(start, stop)
+
+        return NoteTable.lower(self.measures, part, self.index['key'][part], start, stop)
+
+
+    def store(self, part, table):
+        """Sets the NoteTable of a part that was lowered elsewhere, such as in
+        another process
+
+        Args:
+          part (int):  The index of the part
+
+          table (NoteTable):  The notes of the part
+
+        """
+
+        self.__tables[part] = table
@@ -0,0 +1,896 @@
+"""
+
+.. module:: reader
+     :synopsis: A module for reading MusicXML files straight into the tables
+       that ScoreDiff compares, without building music21 streams
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+import inspect
+import logging
+import zipfile
+from array import array
+from xml.etree import cElementTree
+from music21 import expressions, pitch
+from tables import *
+from registry import *
+from notetable import *
+
+
+#The length in quarter lengths of every MusicXML note type
+TYPES = {'maxima': 32.0, 'long': 16.0, 'longa': 16.0, 'breve': 8.0, 'whole': 4.0, 'half': 2.0,
+         'quarter': 1.0, 'eighth': 0.5, '16th': 0.25, '32nd': 0.125, '32th': 0.125, '64th': 0.0625,
+         '128th': 0.03125, '256th': 0.015625, '512th': 0.0078125, '1024th': 0.00390625}
+
+STEP_SEMITONES = {'C': 0, 'D': 2, 'E': 4, 'F': 5, 'G': 7, 'A': 9, 'B': 11}
+
+#The alteration of every accidental name, and the music21 names of the
+#MusicXML accidentals that are spelled differently
+ALTERS = {'natural': 0.0, 'sharp': 1.0, 'flat': -1.0, 'double-sharp': 2.0, 'double-flat': -2.0,
+          'triple-sharp': 3.0, 'triple-flat': -3.0, 'quadruple-sharp': 4.0, 'quadruple-flat': -4.0,
+          'half-sharp': 0.5, 'half-flat': -0.5, 'one-and-a-half-sharp': 1.5, 'one-and-a-half-flat': -1.5}
+ACCIDENTAL_NAMES = {'quarter-sharp': 'half-sharp', 'three-quarters-sharp': 'one-and-a-half-sharp',
+                    'quarter-flat': 'half-flat', 'three-quarters-flat': 'one-and-a-half-flat',
+                    'flat-flat': 'double-flat', 'sharp-sharp': 'double-sharp'}
+
+#The music21 class names of the MusicXML articulations and technical marks
+ARTICULATION_CLASSES = {'accent': 'Accent', 'strong-accent': 'StrongAccent', 'staccato': 'Staccato',
+                        'staccatissimo': 'Staccatissimo', 'spiccato': 'Spiccato', 'tenuto': 'Tenuto',
+                        'detached-legato': 'DetachedLegato', 'scoop': 'Scoop', 'plop': 'Plop',
+                        'doit': 'Doit', 'falloff': 'Falloff', 'breath-mark': 'BreathMark',
+                        'caesura': 'Caesura', 'stress': 'Stress', 'unstress': 'Unstress',
+                        'other-articulation': 'Articulation'}
+TECHNICAL_CLASSES = {'up-bow': 'UpBow', 'down-bow': 'DownBow', 'harmonic': 'Harmonic',
+                     'open-string': 'OpenString', 'thumb-position': 'StringThumbPosition',
+                     'fingering': 'StringFingering', 'pluck': 'FrettedPluck', 'double-tongue': 'DoubleTongue',
+                     'triple-tongue': 'TripleTongue', 'stopped': 'Stopped', 'snap-pizzicato': 'SnapPizzicato',
+                     'fret': 'FretIndication', 'string': 'StringIndication', 'hammer-on': 'HammerOn',
+                     'pull-off': 'PullOff', 'bend': 'FretBend', 'tap': 'FretTap', 'heel': 'OrganHeel',
+                     'toe': 'OrganToe', 'fingernails': 'HarpFingerNails', 'other-technical': 'TechnicalIndication'}
+
+#The names in ORNAMENTS of the classes of the expression music21 makes of every
+#MusicXML ornament
+ORNAMENT_CLASSES = dict((tag, [cls.__name__ for cls in inspect.getmro(getattr(expressions, name))
+                               if cls.__name__ in ORNAMENTS])
+                        for tag, name in [('trill-mark', 'Trill'), ('mordent', 'Mordent'),
+                                          ('inverted-mordent', 'InvertedMordent'), ('turn', 'Turn'),
+                                          ('inverted-turn', 'InvertedTurn'), ('shake', 'Shake'),
+                                          ('schleifer', 'Schleifer')])
+
+#The spanners a note belongs to when its notations hold these elements
+NOTATION_SPANNERS = {'slur': 'Slur', 'glissando': 'Glissando'}
+ORNAMENT_SPANNERS = {'wavy-line': 'TrillExtension', 'tremolo': 'Tremolo'}
+
+#The directions that take up a place in a measure, so that they count towards its length
+PLACED_DIRECTIONS = ['dynamics', 'words', 'segno', 'coda', 'metronome']
+
+#The media types of the root files of a compressed archive that are MusicXML documents
+MUSICXML_MEDIA_TYPES = [None, 'application/vnd.recordare.musicxml+xml', 'application/vnd.recordare.musicxml']
+
+
+def root_file(archive):
+    """Returns the name of the MusicXML document in a compressed .mxl archive:
+    the first MusicXML root file listed in META-INF/container.xml, or the first
+    file outside META-INF when the archive has no container
+
+    Args:
+      archive (zipfile.ZipFile):  The open archive
+
+    Returns:
+      str
+
+    Raises:
+      ValueError: If the archive holds no MusicXML document
+
+
+    """
+
+    names = archive.namelist()
+
+    if('META-INF/container.xml' in names):
+
+        with archive.open('META-INF/container.xml') as container:
+
+            rootfiles = cElementTree.parse(container).findall('rootfiles/rootfile')
+
+        for rootfile in rootfiles:
+
+            if(rootfile.get('media-type') in MUSICXML_MEDIA_TYPES and rootfile.get('full-path') in names):
+
+                return rootfile.get('full-path')
+
+    names = [name for name in names if not name.startswith('META-INF/') and not name.endswith('/')]
+
+    if(not names):
+
+        raise ValueError("no MusicXML document in the archive")
+
+    return names[0]
+
+
+class ClefRecord(object):
+    """A clef read from a MusicXML file, or kept in place of a music21 clef,
+    with the attributes of a music21.clef.Clef that ScoreDiff compares
+
+    """
+
+    __slots__ = ['sign', 'line']
+
+
+    def __init__(self, sign, line=None):
+
+        self.sign = sign
+        self.line = line
+
+
+class KeyRecord(object):
+    """A key signature read from a MusicXML file, or kept in place of a music21
+    key signature, with the attributes of a music21.key.KeySignature that
+    ScoreDiff compares
+
+    """
+
+    __slots__ = ['sharps', 'mode']
+
+
+    def __init__(self, sharps, mode=None):
+
+        self.sharps = sharps
+        self.mode = mode
+
+
+    def altered_names(self):
+        """Returns the names of the pitches the key signature alters, such as 'F#'
+
+        """
+
+        order, modifier = ('FCGDAEB', '#') if self.sharps > 0 else ('BEADGCF', '-')
+        return [order[i % 7] + modifier * (i // 7 + 1) for i in range(0, abs(self.sharps))]
+
+
+class TimeRecord(object):
+    """A time signature read from a MusicXML file, or kept in place of a music21
+    time signature, with the attributes of a music21.meter.TimeSignature that
+    ScoreDiff compares
+
+    """
+
+    __slots__ = ['numerator', 'denominator']
+
+
+    def __init__(self, numerator, denominator):
+
+        self.numerator = numerator
+        self.denominator = denominator
+
+
+    def bar_length(self):
+        """Returns the length of a full measure in quarter lengths
+
+        """
+
+        return self.numerator * 4.0 / self.denominator
+
+
+#Make the record that takes the place of a music21 context object of each kind
+RECORDS = {'clef': lambda clef: None if clef is None else ClefRecord(clef.sign, clef.line),
+           'key': lambda key: None if key is None else KeyRecord(key.sharps, getattr(key, 'mode', None)),
+           'time': lambda time: None if time is None else TimeRecord(time.numerator, time.denominator)}
+
+
+def lean_entry(entry):
+    """Returns an entry that holds only what the comparisons need of an entry
+    built from a music21 score, like the entries a MusicXMLReader builds.  Every
+    part is lowered into a NoteTable, the context objects are replaced by
+    records, and the measures by a MeasureOutline, so that nothing refers to
+    the music21 score any more
+
+    Args:
+      entry (ScoreEntry):  An entry built with ScoreEntry.build
+
+    Returns:
+      ScoreEntry.  An entry without a score
+
+
+    """
+
+    tables = [entry.notes.part(part) for part in range(0, entry.measures.part_count())]
+    index = dict((context, [maps.converted(RECORDS[context]) for maps in entry.index[context]])
+                 for context in entry.index)
+    measures = MeasureOutline(entry.measures.offsets)
+    notes = NoteIndex(measures, index)
+
+    for part, table in enumerate(tables):
+
+        notes.store(part, table)
+
+    return ScoreEntry(None, index, measures, notes)
+
+
+class MeasureOutline:
+    """The MeasureOutline class describes the measures of a score read by
+    MusicXMLReader the way a MeasureDirectory does: the number of parts, the
+    number of measures in each part and their offsets from the start of the
+    part.  It holds no music21 objects, so the measures themselves cannot be
+    looked up.  The offsets of each part are kept in an array of doubles.
+
+    """
+
+    def __init__(self, offsets):
+        """Initializes a MeasureOutline object
+
+        Args:
+          offsets (list):  For each part, the offset of every measure in quarter lengths
+
+        """
+
+        self.offsets = [array('d', part) for part in offsets]
+        self.lengths = [len(part) for part in offsets]
+
+
+    def part_count(self):
+        """Returns the number of parts in the score
+
+        Returns:
+          int
+
+        """
+
+        return len(self.offsets)
+
+
+    def measure_count(self, part):
+        """Returns the number of measures in a part
+
+        Args:
+          part (int):  The index of the part
+
+        Returns:
+          int
+
+        """
+
+        return self.lengths[part]
+
+
+class PartReader:
+    """The PartReader class turns the measures of one MusicXML part into the
+    rows of a NoteTable and the context objects in effect at every measure,
+    following the rules music21 applies when it imports the same part.  A part
+    written on several staves is split into one part per staff, as music21 does.
+
+    """
+
+    def __init__(self):
+        """Initializes a PartReader object for a part with no measures yet
+
+        """
+
+        self.divisions = None
+        self.time = None
+        self.clefs = {}
+        self.key = None
+        self.staves = 1
+        self.offset = 0.0
+        self.offsets = []
+        self.contexts = []
+        self.rows = []
+        self.pending = []
+        self.open = {}
+
+
+    def read_measure(self, element, notes=True):
+        """Reads one measure
+
+        Args:
+          element (xml.etree.ElementTree.Element):  The complete measure element
+
+        Kwargs:
+          notes (bool):  Set to False to only follow what snapshot records, the
+          attributes and the length of the measure, without reading the pitches,
+          marks and spanners of the notes or keeping them as rows
+
+        """
+
+        msr = len(self.offsets)
+        self.__read_attributes(element.findall('attributes'))
+        voices = sorted(set(voice.text for voice in element.iterfind('note/voice')))
+        voices = voices if len(voices) > 1 else []
+        position = 0.0
+        highest = 0.0
+        events = []
+        chord = None
+        rests = []
+        single = 0
+        children = list(element)
+
+        for i, child in enumerate(children):
+
+            if(child.tag == 'backup' or child.tag == 'forward'):
+
+                step = float(child.findtext('duration')) / float(self.divisions)
+                position += step if child.tag == 'forward' else -step
+
+            elif(child.tag == 'direction'):
+
+                placed = position + float(child.findtext('offset', 0)) / float(self.divisions)
+
+                if([kind for kind in PLACED_DIRECTIONS if child.find('direction-type/' + kind) is not None]):
+
+                    highest = max(highest, placed)
+
+                if(notes):
+
+                    self.__read_direction_spanners(child, events[-1] if events else None)
+
+            elif(child.tag == 'note' and child.get('print-object') != 'no'):
+
+                following = children[i + 1] if i + 1 < len(children) else None
+                continued = following is not None and following.tag == 'note' and following.find('chord') is not None
+
+                if(child.find('rest') is not None):
+
+                    length = self.__duration(child)
+                    rests.append((position, length))
+                    highest = max(highest, position + length)
+                    position += length
+                    events.append(None)
+                    continue
+
+                #a chord is complete at its last note
+                if(continued):
+
+                    chord = (chord or []) + [child]
+                    continue
+
+                if(chord is None):
+
+                    single += 1
+
+                if(not notes):
+
+                    event = {'offset': position, 'duration': self.__duration((chord or [child])[0])}
+                    chord = None
+
+                elif(chord is None):
+
+                    event = self.__event(msr, position, [child], voices, single=True)
+
+                else:
+
+                    event = self.__event(msr, position, chord + [child], voices, single=False)
+                    chord = None
+
+                event['order'] = len(events)
+                events.append(event)
+                highest = max(highest, position + event['duration'])
+                position += event['duration']
+
+        time = self.time if self.time is not None else TimeRecord(4, 4)
+
+        #a lone rest four quarters long fills the whole measure, as in music21
+        if(len(rests) == 1 and single == 0 and not voices and rests[0][1] == 4.0 and
+           rests[0][1] != time.bar_length()):
+
+            highest = max([rests[0][0] + time.bar_length()] +
+                          [event['offset'] + event['duration'] for event in events if event is not None])
+
+        if(highest == 0.0 and not events):
+
+            highest = time.bar_length()
+
+        placed = [event for event in events if event is not None and notes]
+        placed.sort(key=lambda event: (event['offset'], not event['grace'], event['voice'], event['order']))
+
+        for event in placed:
+
+            event['offset'] += self.offset
+            self.rows.append(event)
+
+        self.offsets.append(self.offset)
+        self.contexts.append((dict(self.clefs), self.key, self.time))
+        self.offset += highest
+
+
+    def snapshot(self):
+        """Returns the state the next measure is read in: its offset, the
+        divisions, the number of staves and the context objects in effect
+
+        Returns:
+          list.  [offset, divisions, staves, clefs, key, time], where clefs holds
+          a [staff, sign, line] list for each staff with a clef, key is [sharps, mode]
+          and time is [numerator, denominator], or None when there is none yet
+
+        """
+
+        clefs = [[staff, clef.sign, clef.line] for staff, clef in sorted(self.clefs.items())]
+        key = None if self.key is None else [self.key.sharps, self.key.mode]
+        time = None if self.time is None else [self.time.numerator, self.time.denominator]
+        return [self.offset, self.divisions, self.staves, clefs, key, time]
+
+
+    def resume(self, state):
+        """Continues the part from a state returned by snapshot, so that the
+        measures read next are read as if every measure before them had been
+
+        Args:
+          state (list):  As returned by snapshot
+
+        """
+
+        self.offset, self.divisions, self.staves, clefs, key, time = state
+        self.clefs = dict((staff, ClefRecord(sign, line)) for staff, sign, line in clefs)
+        self.key = None if key is None else KeyRecord(*key)
+        self.time = None if time is None else TimeRecord(*time)
+
+
+    def tables(self):
+        """Returns the notes and contexts of the part, once every measure has been read
+
+        Returns:
+          list.  A (NoteTable, contexts) pair for each staff, where contexts
+          maps 'clef', 'key' and 'time' to a ContextMap
+
+        """
+
+        staves = []
+
+        for staff in range(1, self.staves + 1):
+
+            contexts = dict((context, ContextMap(Tables.SIGNATURES[context])) for context in Tables.SIGNATURES)
+
+            for clefs, key, time in self.contexts:
+
+                contexts['clef'].append(clefs.get(staff))
+                contexts['key'].append(key)
+                contexts['time'].append(time)
+
+            rows = [event for event in self.rows if self.staves == 1 or event['staff'] in [staff, None]]
+            staves.append((self.__lower(rows, contexts['key']), contexts))
+
+        return staves
+
+
+    def __read_attributes(self, elements):
+        """Takes the context objects and divisions of a measure from its
+        attributes, where the first value found of each kind is used
+
+        """
+
+        changed = {}
+
+        for attributes in elements:
+
+            for name in ['divisions', 'staves', 'clef', 'key', 'time']:
+
+                found = attributes.findall(name)
+
+                if(found and name not in changed):
+
+                    changed[name] = found
+
+        if('divisions' in changed):
+
+            self.divisions = int(float(changed['divisions'][0].text))
+
+        if('staves' in changed):
+
+            self.staves = max(self.staves, int(changed['staves'][0].text))
+
+        if('clef' in changed):
+
+            self.clefs = dict(self.clefs)
+            found = set()
+
+            #a clef without a staff number is on every staff
+            for element in changed['clef']:
+
+                number = element.get('number')
+                staves = range(1, self.staves + 1) if number is None else [int(number)]
+                sign = element.findtext('sign')
+                line = element.findtext('line')
+                clef = ClefRecord(None if sign in ['percussion', 'none'] else sign, None if line is None else int(line))
+
+                for staff in staves:
+
+                    if(staff not in found):
+
+                        self.clefs[staff] = clef
+                        found.add(staff)
+
+        if('key' in changed and changed['key'][0].findtext('fifths') is not None):
+
+            element = changed['key'][0]
+            self.key = KeyRecord(int(element.findtext('fifths')), element.findtext('mode'))
+
+        if('time' in changed and changed['time'][0].findtext('beats') is not None):
+
+            element = changed['time'][0]
+            beats = sum(int(beat) for beat in element.findtext('beats').split('+'))
+            self.time = TimeRecord(beats, int(element.findtext('beat-type')))
+
+
+    def __duration(self, element):
+        """Returns the length of a note or rest in quarter lengths
+
+        """
+
+        if(element.find('grace') is not None):
+
+            return 0.0
+
+        kind = element.findtext('type')
+        duration = element.findtext('duration')
+
+        if(kind is None and duration is not None):
+
+            return float(duration) / float(self.divisions)
+
+        dots = len(element.findall('dot'))
+        length = TYPES.get(kind, 0.5) * (((2 ** (dots + 1.0)) - 1.0) / (2 ** dots))
+        modification = element.find('time-modification')
+
+        if(duration is not None and modification is not None):
+
+            unit = TYPES[modification.findtext('normal-type', kind)]
+            length *= (int(modification.findtext('normal-notes')) * unit /
+                       (int(modification.findtext('actual-notes')) * unit))
+
+        return length
+
+
+    def __event(self, msr, position, elements, voices, single):
+        """Returns a note or chord as a dictionary with its pitches and marks
+
+        """
+
+        first = elements[0]
+        voice = first.findtext('voice')
+        grace = first.find('grace') is not None
+        event = {'measure': msr, 'offset': position, 'duration': self.__duration(first), 'grace': grace,
+                 'voice': voices.index(voice) + 1 if voice in voices else 0,
+                 'staff': None if first.findtext('staff') is None else int(first.findtext('staff')),
+                 'pitches': [self.__pitch(element) for element in elements],
+                 'articulations': [], 'ornaments': [], 'spanners': []}
+
+        if(single):
+
+            stem = first.findtext('stem', 'unspecified')
+            event['stems'] = ['noStem' if stem == 'none' else stem]
+
+            for notations in first.findall('notations'):
+
+                self.__read_notations(notations, event)
+
+        else:
+
+            event['stems'] = [element.findtext('stem') for element in elements]
+
+        #a pending direction spanner starts at the next note or chord
+        if(self.pending and self.pending[0] in self.open):
+
+            self.__span(self.pending.pop(0), None, event, False)
+
+        elif(self.pending):
+
+            self.pending.pop(0)
+
+        return event
+
+
+    def __pitch(self, element):
+        """Returns the (step, octave, accidental name, sounding pitch) of a note
+
+        """
+
+        step = element.findtext('pitch/step')
+        octave = int(element.findtext('pitch/octave'))
+        alter = element.findtext('pitch/alter')
+        shown = element.find('accidental')
+        accidental = None
+
+        if(shown is not None):
+
+            name = ACCIDENTAL_NAMES.get(shown.text, shown.text)
+            accidental = name if name in ALTERS else None
+
+        elif(alter is not None):
+
+            accidental = [name for name in ALTERS if ALTERS[name] == float(alter)]
+
+            if(not accidental):
+
+                raise ValueError("incorrect accidental " + alter + " for pitch " + step + str(octave))
+
+            accidental = accidental[0]
+
+        ps = 12 * (octave + 1) + STEP_SEMITONES[step] + ALTERS.get(accidental, 0.0)
+        return (step, octave, accidental, ps)
+
+
+    def __read_notations(self, notations, event):
+        """Adds the articulations, ornaments and spanners of the notations of a note to event
+
+        """
+
+        for element in notations:
+
+            if(element.tag == 'articulations' or element.tag == 'technical'):
+
+                classes = ARTICULATION_CLASSES if element.tag == 'articulations' else TECHNICAL_CLASSES
+                event['articulations'] += [classes[mark.tag] for mark in element if mark.tag in classes]
+
+            elif(element.tag == 'ornaments'):
+
+                for ornament in element:
+
+                    event['ornaments'] += ORNAMENT_CLASSES.get(ornament.tag, [])
+
+                    if(ornament.tag in ORNAMENT_SPANNERS):
+
+                        #a tremolo on a single note has no type
+                        ends = ['stop', None] if ornament.tag == 'tremolo' else ['stop']
+                        name = ORNAMENT_SPANNERS[ornament.tag]
+                        self.__span((name, ornament.get('number')), name, event, ornament.get('type') in ends)
+
+            elif(element.tag in NOTATION_SPANNERS):
+
+                name = NOTATION_SPANNERS[element.tag]
+                self.__span((name, element.get('number')), name, event, element.get('type') == 'stop')
+
+
+    def __span(self, key, name, event, complete):
+        """Adds a note or chord to the open spanner with the given key, opening
+        it if there is none.  The notes of a spanner only take it as one of their
+        spanners once it is complete, as music21 keeps no incomplete spanners
+
+        """
+
+        spanner = self.open.setdefault(key, (name, []))
+
+        #music21 copies grace notes, and the copy is not in the spanner
+        if(event is not None and not event['grace']):
+
+            spanner[1].append(event)
+
+        if(complete):
+
+            del self.open[key]
+
+            for member in spanner[1]:
+
+                member['spanners'].append(spanner[0])
+
+
+    def __read_direction_spanners(self, direction, last):
+        """Follows the wedges, brackets and dashes of a direction.  A spanner
+        that starts waits for the next note or chord, and one that stops ends on
+        the last note, chord or rest of the measure
+
+        """
+
+        for kind in ['wedge', 'bracket', 'dashes']:
+
+            element = direction.find('direction-type/' + kind)
+
+            if(element is None):
+
+                continue
+
+            key = (kind, element.get('number'))
+
+            if(element.get('type') in ['crescendo', 'diminuendo', 'start']):
+
+                name = {'crescendo': 'Crescendo', 'diminuendo': 'Diminuendo'}.get(element.get('type'), 'Line')
+                self.__span(key, name, None, False)
+                self.pending.append(key)
+
+            elif(element.get('type') == 'stop' and key in self.open):
+
+                self.__span(key, None, last, True)
+
+
+    def __lower(self, rows, keys):
+        """Builds the NoteTable of some of the rows read, with the accidentals
+        reported by ScoreDiff.have_same_accidentals
+
+        """
+
+        columns = dict((name, []) for (name, dtype) in NoteTable.COLUMNS)
+        msr = None
+
+        for chord, event in enumerate(rows):
+
+            if(event['measure'] != msr):
+
+                msr = event['measure']
+                key_signature = keys[msr]
+                altered = [] if key_signature is None else key_signature.altered_names()
+                naturals = set()
+
+            stems = chord_stems(event['stems'])
+
+            for i, (step, octave, accidental, ps) in enumerate(event['pitches']):
+
+                name = step + ('' if accidental is None else pitch.accidentalNameToModifier[accidental])
+                reported = -1
+
+                #the rules of ScoreDiff.have_same_accidentals
+                if(accidental is not None and not name in altered):
+
+                    reported = encode(accidental, ACCIDENTALS)
+
+                    if(accidental == 'natural'):
+
+                        naturals.add(name)
+
+                elif(name in altered and name[0] in naturals):
+
+                    reported = encode(accidental, ACCIDENTALS)
+                    naturals.discard(name)
+
+                code = encode(accidental, ACCIDENTALS)
+                row = [msr, event['offset'], event['duration'], ps,
+                       pitch_key(octave * 7 + STEPS.index(step) + 1, code, ps), code, reported,
+                       stems[i] if i < len(stems) else 0, i < len(stems), chord, i == 0, event['voice']]
+
+                if(i == 0):
+
+                    row += [encode_sequence(event['articulations'], ARTICULATIONS),
+                            encode_sequence(event['ornaments'], ORNAMENT_NAMES),
+                            encode_sequence(event['spanners'], SPANNERS, False)]
+
+                else:
+
+                    row += [0, 0, 0]
+
+                for (column, dtype), value in zip(NoteTable.COLUMNS, row):
+
+                    columns[column].append(value)
+
+        return NoteTable(columns, len(self.offsets))
+
+
+class MusicXMLReader:
+    """The MusicXMLReader class reads a score-partwise MusicXML file with an
+    incremental parser, one measure at a time, into the tables ScoreDiff
+    compares.  Every measure element is discarded as soon as it has been read,
+    so neither the document nor a music21 stream is ever held in memory.  The
+    notes, contexts and measure offsets are the same as those music21 builds
+    from the same file.  The document of a compressed .mxl archive is found
+    through its container and decompressed as the parser reads it, a chunk at
+    a time.
+
+    .. note:: Chord symbols (harmony elements) are not read.
+
+    """
+
+    def __init__(self, source):
+        """Initializes a MusicXMLReader object
+
+        Args:
+          source (str or file):  The pathname of a .xml or .mxl file, or an open file
+
+        """
+
+        self.source = source
+
+
+    def read(self):
+        """Reads the score
+
+        Returns:
+          ScoreEntry.  An entry without a score, whose measures are a MeasureOutline
+
+        Raises:
+          ValueError: If the file is not a score-partwise MusicXML document
+
+        """
+
+        archive = None
+        document = self.source
+
+        if(isinstance(self.source, basestring) and zipfile.is_zipfile(self.source)):
+
+            archive = zipfile.ZipFile(self.source)
+            document = archive.open(root_file(archive))
+
+        try:
+
+            order, readers = self.__read_parts(document)
+
+        finally:
+
+            if(archive is not None):
+
+                document.close()
+                archive.close()
+
+        return MusicXMLReader.assemble([readers[name] for name in order if name in readers])
+
+
+    def __read_parts(self, document):
+        """Reads every part of a document, returning the ids of the parts in
+        the order of the part list and the PartReader of each id
+
+        """
+
+        order = []
+        readers = {}
+        reader = None
+
+        for event, element in cElementTree.iterparse(document, ('start', 'end')):
+
+            if(event == 'start'):
+
+                if(element.tag == 'score-timewise'):
+
+                    raise ValueError("only score-partwise documents can be read")
+
+                if(element.tag == 'part'):
+
+                    reader = readers.setdefault(element.get('id'), PartReader())
+
+                continue
+
+            if(element.tag == 'score-part'):
+
+                order.append(element.get('id'))
+
+            elif(element.tag == 'measure' and reader is not None):
+
+                reader.read_measure(element)
+                element.clear()
+
+            elif(element.tag == 'part'):
+
+                element.clear()
+                reader = None
+
+            #anything after the end of the document is left unread
+            elif(element.tag == 'score-partwise'):
+
+                break
+
+        return order, readers
+
+
+    @staticmethod
+    def assemble(parts):
+        """Gathers the tables of parts that have been read into a ScoreEntry
+
+        Args:
+          parts (list):  The PartReader of every part, in score order
+
+        Returns:
+          ScoreEntry.  An entry without a score, whose measures are a MeasureOutline
+
+        """
+
+        index = dict((context, []) for context in Tables.SIGNATURES)
+        offsets = []
+        tables = []
+
+        for part in parts:
+
+            for table, contexts in part.tables():
+
+                tables.append(table)
+                offsets.append(part.offsets)
+
+                for context in contexts:
+
+                    index[context].append(contexts[context])
+
+        measures = MeasureOutline(offsets)
+        notes = NoteIndex(measures, index)
+
+        for part, table in enumerate(tables):
+
+            notes.store(part, table)
+
+        logging.debug("read " + str(len(tables)) + " parts with " + str(sum(measures.lengths)) + " measures")
+        return ScoreEntry(None, index, measures, notes)
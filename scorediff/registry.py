@@ -0,0 +1,254 @@
+"""
+
+.. module:: registry
+     :synopsis: A module for sharing parsed scores and their tables between
+       ScoreDiff objects in the same process
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from tables import *
+from measures import *
+from notetable import *
+
+
+class ScoreEntry:
+    """The ScoreEntry class holds everything that is built for one score
+    and can be shared between ScoreDiff objects: the parsed score, its
+    MeasureDirectory, the index built by Tables and its NoteIndex
+
+
+    """
+
+    def __init__(self, score, index, measures, notes=None):
+        """Initializes a ScoreEntry object
+
+        Args:
+          score (music21.stream.Score):  The parsed score, or None if the score
+          was read without music21 or has been released
+
+          index (dict):  The index returned by Tables(score).build(), or a ContextIndex
+
+          measures (MeasureDirectory):  The measures of score, or a MeasureOutline
+
+        Kwargs:
+          notes (NoteIndex):  The notes of the score, if they have already been
+          lowered.  They are lowered from measures when they are first needed otherwise
+
+
+        """
+
+        self.score = score
+        self.index = index
+        self.measures = measures
+        self.notes = NoteIndex(measures, index) if notes is None else notes
+
+
+    @staticmethod
+    def build(score):
+        """Collects the measures of a parsed score.  The index of each part is
+        built the first time it is needed, see ContextIndex
+
+        Args:
+          score (music21.stream.Score):  The parsed score
+
+        Returns:
+          ScoreEntry
+
+
+        """
+
+        measures = MeasureDirectory(score)
+        return ScoreEntry(score, ContextIndex(Tables(score, measures), measures.part_count()), measures)
+
+
+    def prepare(self):
+        """Indexes and lowers every part now instead of the first time each part
+        is needed, such as before starting worker processes that inherit the entry
+
+
+        """
+
+        for part in range(0, self.measures.part_count()):
+
+            if(isinstance(self.index, ContextIndex)):
+
+                self.index.part(part)
+
+            self.notes.part(part)
+
+
+class ScoreRegistry:
+    """The ScoreRegistry class keeps recently used ScoreEntry objects in memory,
+    keyed by the pathname, size and modification time of the file they were
+    built from.  The registry is bounded by an estimate of the memory its entries
+    occupy and evicts the least recently used entries first.  It is safe to use
+    from several threads.
+
+
+    """
+
+    #A parsed score occupies roughly this many times the size of its file, and
+    #an entry without a score, as made by MusicXMLReader or lean_entry, this many
+    EXPANSION = 80
+    LEAN_EXPANSION = 2
+    DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+
+
+    def __init__(self, max_size=None):
+        """Initializes a ScoreRegistry object
+
+        Kwargs:
+          max_size (int):  The estimated number of bytes the entries may occupy
+
+
+        """
+
+        if(max_size is None):
+
+            max_size = ScoreRegistry.DEFAULT_MAX_SIZE
+
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()
+        self.__size = 0
+        self.__lock = threading.RLock()
+
+
+    def __getstate__(self):
+        """A registry sent to another process arrives empty, with the same max_size
+
+        """
+
+        return {'max_size': self.max_size}
+
+
+    def __setstate__(self, state):
+
+        self.__init__(state['max_size'])
+
+
+    def get(self, path):
+        """Returns the entry for the file at path
+
+        Args:
+          path (str):  The full pathname of a score
+
+        Returns:
+          ScoreEntry.  The entry, or None if there is no entry for the
+          current version of the file
+
+
+        """
+
+        stamp = self.__stamp(path)
+
+        with self.__lock:
+
+            found = self.__entries.pop(path, None)
+
+            if(found is not None and found[0] == stamp):
+
+                self.__entries[path] = found
+                self.hits += 1
+                return found[2]
+
+            if(found is not None):
+
+                self.__size -= found[1]
+
+            self.misses += 1
+            return None
+
+
+    def add(self, path, entry):
+        """Adds the entry for the file at path, evicting the least recently
+        used entries if the registry grows past max_size
+
+        Args:
+          path (str):  The full pathname of the file the entry was built from
+
+          entry (ScoreEntry):  The entry to add
+
+
+        """
+
+        stamp = self.__stamp(path)
+        size = stamp[0] * (ScoreRegistry.EXPANSION if entry.score is not None else ScoreRegistry.LEAN_EXPANSION)
+
+        with self.__lock:
+
+            self.remove(path)
+            self.__entries[path] = (stamp, size, entry)
+            self.__size += size
+
+            while(self.__size > self.max_size and len(self.__entries) > 1):
+
+                evicted, found = self.__entries.popitem(last=False)
+                self.__size -= found[1]
+                logging.debug("evicting registry entry: " + evicted)
+
+
+    def remove(self, path):
+        """Removes the entry for the file at path, if there is one
+
+        Args:
+          path (str):  The full pathname of a score
+
+
+        """
+
+        with self.__lock:
+
+            found = self.__entries.pop(path, None)
+
+            if(found is not None):
+
+                self.__size -= found[1]
+
+
+    def clear(self):
+        """Removes every entry and resets the hit and miss counters
+
+
+        """
+
+        with self.__lock:
+
+            self.__entries.clear()
+            self.__size = 0
+            self.hits = 0
+            self.misses = 0
+
+
+    def stats(self):
+        """Returns the usage statistics of the registry
+
+        Returns:
+          dictionary.  {'hits':int, 'misses':int, 'entries':int, 'size':int}
+          where size is the estimated number of bytes held
+
+
+        """
+
+        with self.__lock:
+
+            return {'hits':self.hits, 'misses':self.misses,
+                    'entries':len(self.__entries), 'size':self.__size}
+
+
+    def __stamp(self, path):
+        """Returns the size and modification time of the file at path
+
+
+        """
+
+        info = os.stat(path)
+        return (info.st_size, info.st_mtime)
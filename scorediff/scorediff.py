@@ -15,6 +15,98 @@ logging.basicConfig(filename='debug.log', level = logging.DEBUG)
 #To enable debug output, comment out the following line
 logging.disable(logging.DEBUG)
 from tables import *
+from cache import *
+from registry import *
+from measures import *
+from features import *
+from notetable import *
+from digest import *
+from align import *
+from harmony import *
+from similarity import *
+from reader import *
+from measureindex import *
+import numpy
+import multiprocessing
+from bisect import bisect_left, bisect_right
+from collections import namedtuple, Counter
+
+
+#A difference found by ScoreDiff.diff.  detail holds the values of the category
+#in score1 and score2, or the numbers of parts or measures for the 'parts' and
+#'measures' categories
+Difference = namedtuple('Difference', ['part', 'measure', 'category', 'detail'])
+
+#The result of comparing one category of two measures with ScoreDiff.compare_measure.
+#only1 and only2 hold the items of each measure that the other does not match
+Verdict = namedtuple('Verdict', ['same', 'only1', 'only2'])
+
+#A difference found by ScoreDiff.aligned_diff.  measure1 is None for the
+#'inserted' category and measure2 is None for the 'deleted' category
+AlignedDifference = namedtuple('AlignedDifference', ['part', 'measure1', 'measure2', 'category', 'detail'])
+
+#A measure of score2 found by ScoreDiff.find_transpositions to hold the same
+#melody as a measure of score1, moved by the given number of semitones
+Transposition = namedtuple('Transposition', ['measure1', 'measure2', 'semitones'])
+
+
+def _parse_frozen(arguments):
+    """Parses a score in a worker process and returns it frozen, storing it in
+    the cache too if there is one
+
+
+    """
+
+    name, localCorpusPath, cache = arguments
+    music21.environment.set('localCorpusPath', localCorpusPath)
+    frozen = freeze(base.parse(name))
+
+    if(cache is not None):
+
+        try:
+
+            cache.store_frozen(find_score(name), frozen)
+
+        except (IOError, OSError):
+
+            logging.debug("could not cache " + name)
+
+    return frozen
+
+
+#The ScoreDiff and categories a shard worker process compares
+_shard = {}
+
+
+def _start_shard(name1, name2, localCorpusPath, categories, reader='music21', window=None, lean=False,
+                 use_cache=True, cache=None, registry=None, sidecars=True):
+    """Prepares a shard worker process.  A worker started by forking reuses the
+    ScoreDiff it inherited, any other worker loads the scores itself with the
+    settings of the ScoreDiff that started it
+
+
+    """
+
+    diff = _shard.get('diff')
+
+    if(diff is None or (diff.name1, diff.name2) != (name1, name2)):
+
+        _shard['diff'] = ScoreDiff(name1, name2, localCorpusPath, use_cache, cache, registry, reader=reader,
+                                   window=window, lean=lean, sidecars=sidecars)
+
+    _shard['categories'] = categories
+
+
+def _diff_shard(part):
+    """Compares one part in a shard worker process.  Returns the differences
+    found in the part and the NoteTables of the part in both scores
+
+
+    """
+
+    diff = _shard['diff']
+    differences = diff.diff(_shard['categories'], [part])
+    return differences, diff.notes1.part(part), diff.notes2.part(part)
 
 
 class ScoreDiff:
@@ -25,15 +117,22 @@ class ScoreDiff:
     """
 
 
-    #This ornaments list is used as a reference when comparing ornaments    
-    ORNAMENTS = set(['Appoggiatura', 'GeneralAppoggiatura', 'GeneralMordent', 'HalfStepAppoggiatura',
-                 'HalfSetpInvertedAppoggiatura', 'HalfStepInvertedMordent', 'HalfStepMordent', 'HalfStepTrill',
-                 'InvertedAppoggiatura', 'InvertedMordent', 'InvertedTurn', 'Mordent', 'Schleifer', 'Shake',
-                 'Tremolo', 'Trill', 'Turn', 'WholeStepAppoggiatura', 'WholeStepInvertedAppoggiatura',
-                 'WholeStepInvertedMordent', 'WholeStepMordent', 'WholeStepTrill'])
+    #This ornaments list is used as a reference when comparing ornaments
+    ORNAMENTS = ORNAMENTS
+
+    #The ways a score can be read, see __init__
+    READERS = ['music21', 'stream']
 
+    #The number of measures iter_differences lowers at a time
+    RUN = 32
 
-    def __init__(self, score1, score2, localCorpusPath = '.'):
+    _default_cache = None
+    _default_registry = None
+
+
+    def __init__(self, score1, score2, localCorpusPath = '.', use_cache = True, cache = None, registry = None,
+                 parallel = False, reader = 'music21', window = None, lean = False, entries = None,
+                 sidecars = True):
         """Initializes a ScoreDiff object.
     
         Args:
@@ -44,16 +143,355 @@ class ScoreDiff:
         Kwargs:
          localCorpusPath (str)  A path to a corpus if your files are located elsewhere
 
+         use_cache (bool)  Set to False to always parse and index both scores instead of
+         reusing the copies held in memory or in the on-disk cache
+
+         cache (ScoreCache)  An on-disk cache to keep the parsed scores in between runs,
+         such as ScoreDiff.default_cache().  Without one, scores are only kept in memory
+         and nothing is written to disk
+
+         registry (ScoreRegistry)  The in-memory registry to use instead of the default one
+
+         parallel (bool)  Set to True to parse both scores at the same time in two worker
+         processes when neither can be reused.  The workers send the scores back frozen
+         and store them in the cache if there is one, and the scores are indexed in this
+         process
+
+         reader (str)  'music21' to parse the scores with music21, or 'stream' to read
+         them with a MusicXMLReader, which builds the same tables several times faster
+         without building music21 streams.  With 'stream', score1 and score2 are None
+         and display parses the scores with music21 the first time it is called
+
+         window (tuple)  (start, stop) to read only the measures from start up to but not
+         including stop, numbered from 0.  Only the elements of these measures are parsed,
+         found through a MeasureIndex that is saved next to each score and reused on later
+         runs, and the clefs, keys and time signatures in effect come from the index.  The
+         scores are read as with the 'stream' reader, and the measure numbers passed to the
+         other methods count from start.  Only uncompressed MusicXML files can be windowed
+
+         lean (bool)  Set to True to keep only what the comparisons need once the scores
+         are indexed, see lean_entry: every part is lowered into a NoteTable, the clefs,
+         keys and time signatures are kept as records and the music21 scores are released,
+         also from the registry, so score1 and score2 are None.  display parses the scores
+         again the first time it is called
+
+         entries (list)  A ScoreEntry for each score that was already read, such as the
+         one an IncrementalReader returns, or None for the scores to read.  The files of
+         the scores given are not read again
+
+         sidecars (bool)  Set to False to neither load nor save the MeasureIndex next to
+         a windowed score, so that it is built again and nothing is written next to the score
+
+        Raises:
+         ValueError: If reader is not one of ScoreDiff.READERS, or window holds no measures
+
 
 	"""        
 
+        if(reader not in ScoreDiff.READERS):
+
+            raise ValueError("unknown reader: " + str(reader))
+
         music21.environment.set('localCorpusPath', localCorpusPath)
-        self.score1 = base.parse(score1)
-       	self.score2 = base.parse(score2)
+
+        if(use_cache and registry is None):
+
+            registry = ScoreDiff.default_registry()
+
+        self.cache = cache if use_cache else None
+        self.registry = registry if use_cache else None
+        self.localCorpusPath = localCorpusPath
+        self.reader = reader
+        self.lean = lean
+        self.window = None if window is None else tuple(window)
+        self.sidecars = sidecars
+        entries = [None, None] if entries is None else list(entries)
+        loaded = iter(self.__load([name for name, entry in zip([score1, score2], entries) if entry is None], parallel))
+        entry1, entry2 = [next(loaded) if entry is None else entry for entry in entries]
+        self.score1 = entry1.score
+        self.score2 = entry2.score
         self.name1 = score1
         self.name2 = score2
-	self.index1 = Tables(self.score1).build()	
-	self.index2 = Tables(self.score2).build()
+        self.index1 = entry1.index
+        self.index2 = entry2.index
+        self.measures1 = entry1.measures
+        self.measures2 = entry2.measures
+        self.notes1 = entry1.notes
+        self.notes2 = entry2.notes
+        self.__timelines = {}
+        self.__displayed = {}
+
+
+    @staticmethod
+    def default_cache():
+        """Returns a ScoreCache in the default directory, shared by every caller,
+        for the ScoreDiff objects that should keep their scores on disk
+
+        Returns:
+          ScoreCache
+
+
+        """
+
+        if(ScoreDiff._default_cache is None):
+
+            ScoreDiff._default_cache = ScoreCache()
+
+        return ScoreDiff._default_cache
+
+
+    @staticmethod
+    def default_registry():
+        """Returns the ScoreRegistry shared by all ScoreDiff objects in this
+        process that are not given a registry of their own
+
+        Returns:
+          ScoreRegistry
+
+
+        """
+
+        if(ScoreDiff._default_registry is None):
+
+            ScoreDiff._default_registry = ScoreRegistry()
+
+        return ScoreDiff._default_registry
+
+
+    def __load(self, names, parallel=False):
+        """Parses and indexes scores, reusing entries from the registry or
+        parsed copies from the cache whenever the files have not changed
+
+        Args:
+          names (list):  The pathnames of the scores to parse
+
+        Kwargs:
+          parallel (bool):  Whether to parse the scores that cannot be reused
+          in worker processes
+
+        Returns:
+          list.  A ScoreEntry for each name
+
+
+        """
+
+        if(self.window is not None):
+
+            indexes = {}
+            return [self.__read_window(name, indexes) for name in names]
+
+        if(self.reader == 'stream'):
+
+            return [self.__read(name) for name in names]
+
+        loaded = {}
+        scores = {}
+        paths = {}
+        missing = []
+
+        for name in names:
+
+            if(name in paths):
+
+                continue
+
+            paths[name] = None if self.registry is None else find_score(name)
+
+            if(paths[name] is not None):
+
+                loaded[name] = self.registry.get(paths[name])
+
+                #an entry read without music21 has no score to keep
+                if(loaded[name] is not None and loaded[name].score is None and not self.lean):
+
+                    loaded[name] = None
+
+                if(loaded[name] is None and self.cache is not None):
+
+                    scores[name] = self.cache.load(paths[name])
+
+            if(loaded.get(name) is None and scores.get(name) is None):
+
+                missing.append(name)
+
+        if(parallel and len(missing) > 1):
+
+            scores.update(self.__parse_parallel(missing))
+
+        else:
+
+            for name in missing:
+
+                scores[name] = base.parse(name)
+
+                if(self.cache is not None):
+
+                    self.cache.store(paths[name], scores[name])
+
+        for name in paths:
+
+            if(loaded.get(name) is None):
+
+                loaded[name] = ScoreEntry.build(scores.pop(name))
+
+            elif(not self.lean or loaded[name].score is None):
+
+                continue
+
+            #the entry takes the place of the one with the score in the registry
+            if(self.lean):
+
+                loaded[name] = lean_entry(loaded[name])
+
+            if(paths[name] is not None):
+
+                self.registry.add(paths[name], loaded[name])
+
+        return [loaded[name] for name in names]
+
+
+    def __read(self, name):
+        """Reads a score with a MusicXMLReader, reusing the entry in the
+        registry if the file has not changed
+
+        Args:
+          name (str):  The pathname of the score
+
+        Returns:
+          ScoreEntry
+
+
+        """
+
+        path = find_score(name)
+        entry = None if self.registry is None else self.registry.get(path)
+
+        if(entry is None):
+
+            entry = MusicXMLReader(path).read()
+
+            if(self.registry is not None):
+
+                self.registry.add(path, entry)
+
+        return entry
+
+
+    def __read_window(self, name, indexes):
+        """Reads the measures of the window of a score with a MeasureIndex,
+        loading the index saved next to the score if it is up to date, and
+        building and saving it otherwise
+
+        Args:
+          name (str):  The pathname of the score
+
+          indexes (dict):  The indexes already found by pathname, shared by the
+          scores of one load so that a file is only indexed once
+
+        Returns:
+          ScoreEntry
+
+
+        """
+
+        path = find_score(name)
+        index = indexes.get(path)
+
+        if(index is None and self.sidecars):
+
+            index = MeasureIndex.load(path)
+
+        if(index is None):
+
+            index = MeasureIndex.build(path)
+
+            if(self.sidecars):
+
+                try:
+
+                    index.save(path)
+
+                except (IOError, OSError):
+
+                    logging.debug("could not save the measure index of " + path)
+
+        indexes[path] = index
+        return index.read(path, self.window[0], self.window[1])
+
+
+    def __parse_parallel(self, names):
+        """Parses scores in worker processes, one per score, which send them
+        back frozen.  Freezing a score takes longer than thawing it, so the
+        workers take on the slowest steps.  A score that cannot be thawed is
+        parsed again in this process
+
+        Args:
+          names (list):  The pathnames of the scores to parse
+
+        Returns:
+          dictionary.  {name:music21.stream.Score}
+
+
+        """
+
+        logging.debug("parsing in parallel: " + str(names))
+        pool = multiprocessing.Pool(len(names))
+
+        try:
+
+            frozen = pool.map(_parse_frozen, [(name, self.localCorpusPath, self.cache) for name in names])
+            pool.close()
+
+        finally:
+
+            pool.terminate()
+            pool.join()
+
+        scores = {}
+
+        for name, score in zip(names, frozen):
+
+            try:
+
+                scores[name] = thaw(score)
+
+            except Exception:
+
+                logging.debug("could not thaw " + name + ", parsing it again")
+                scores[name] = base.parse(name)
+
+        return scores
+
+    
+    def update(self, score_number, entry, name=None):
+        """Replaces one of the scores with another ScoreEntry, such as a newer
+        version of the same file read by an IncrementalReader, and keeps the other
+
+        Args:
+          score_number (int):  1 for score1, 2 for score2
+
+          entry (ScoreEntry):  The score to compare instead
+
+        Kwargs:
+          name (str):  The pathname of the new score, the pathname of the score
+          it replaces by default
+
+
+        """
+
+        if(score_number == 1):
+
+            self.score1, self.index1, self.measures1, self.notes1 = entry.score, entry.index, entry.measures, entry.notes
+            self.name1 = self.name1 if name is None else name
+
+        else:
+
+            self.score2, self.index2, self.measures2, self.notes2 = entry.score, entry.index, entry.measures, entry.notes
+            self.name2 = self.name2 if name is None else name
+
+        self.__timelines.pop(score_number, None)
+        self.__displayed.pop(score_number, None)
+
     
     def display(self, msr1=0, part1=0, msr2=0, part2=0):
         """Useful for displaying the differences between the two scores visually
@@ -73,12 +511,44 @@ class ScoreDiff:
 
         self.__verify_part_and_measure(msr1, part1, msr2, part2)	
 	
-	partial1 = self.score1.parts[part1].getElementsByClass('Measure')[msr1]
-	partial2 = self.score2.parts[part2].getElementsByClass('Measure')[msr2]
+        first = 0 if self.window is None else self.window[0]
+        partial1 = self.__displayed_measures(1).measure(part1, msr1 + first)
+        partial2 = self.__displayed_measures(2).measure(part2, msr2 + first)
         partial1.show()
         partial2.show()
 
 
+    def __displayed_measures(self, score_number):
+        """Returns the MeasureDirectory of a score, parsing the score with
+        music21 the first time if it was read without it
+
+        """
+
+        measures = self.measures1 if score_number == 1 else self.measures2
+
+        if(isinstance(measures, MeasureDirectory)):
+
+            return measures
+
+        if(score_number not in self.__displayed):
+
+            name = self.name1 if score_number == 1 else self.name2
+            path = None if self.cache is None else find_score(name)
+            score = None if path is None else self.cache.load(path)
+
+            if(score is None):
+
+                score = base.parse(name)
+
+                if(path is not None):
+
+                    self.cache.store(path, score)
+
+            self.__displayed[score_number] = MeasureDirectory(score)
+
+        return self.__displayed[score_number]
+
+
     def have_same_accidentals(self, msr1=0, part1=0, msr2=0, part2=0):
         """Checks if the two scores both have the same accidentals at the 
 	specified measures of the specified parts
@@ -97,546 +567,1580 @@ class ScoreDiff:
 	   True -- The scores have the same accidentals
 	   False -- The scores do not have the same accidentals
 
-	Raises:
-	  PartRangeError: If user passes in a part that is out of range for either score
-	  
-	  MeasureRangeError: If user passes in a measure that is out of range for either score
+	Raises:
+	  PartRangeError: If user passes in a part that is out of range for either score
+	  
+	  MeasureRangeError: If user passes in a measure that is out of range for either score
+
+
+	"""
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+
+        logging.debug("accidentals1: " + str(table1.values('accidentals', msr1)))
+        logging.debug("accidentals2: " + str(table2.values('accidentals', msr2)))
+        return table1.same_measure(table2, 'accidentals', msr1, msr2)
+
+
+    def have_same_articulations(self, msr1=0, part1=0, msr2=0, part2=0):
+        """Checks if the two scores both have the same articulations 
+	at the specified measures of the specified parts [#f2]_
+
+	.. note:: The articulations are compared by class, note by note, in the
+	   order and number they have on each note, so a staccato and an accent on
+	   one note differ from the same marks split over two notes.
+	
+	Kwargs:
+          msr1 and msr2 (int):  The measures to compare
+
+	  part1 and part2 (int): The parts to compare
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same articulations
+           False -- The scores do not have the same articulations
+
+        Raises:
+	  PartRangeError: If user passes in a part that is out of range for either score
+	  
+	  MeasureRangeError: If user passes in a measure that is out of range for either score
+
+       
+
+        """
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+
+        logging.debug("articulations1: " + str(table1.values('articulations', msr1)))
+        logging.debug("articulations2: " + str(table2.values('articulations', msr2)))
+        return table1.same_measure(table2, 'articulations', msr1, msr2)
+
+
+    def have_same_clef_markings(self, msr1=0, part1=0, msr2=0, part2=0):
+        """Checks if the two scores both have the same clef markings 
+	at the specified measures of the specified parts
+
+	.. note:: The current version does not support mid-measure clef
+	   changes.  This is something that will be addressed in future
+	   versions.
+
+        Kwargs:
+          msr1 and msr2 (int):  The measures to compare
+
+	  part1 and part2 (int): The parts to compare
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same clef markings
+           False -- The scores do not have the same clef markings
+
+        Raises:
+	  PartRangeError: If user passes in a part that is out of range for either score
+	  
+	  MeasureRangeError: If user passes in a measure that is out of range for either score
+
+
+
+        """
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        clefs1 = self.index1['clef'][part1]
+        clefs2 = self.index2['clef'][part2]
+	        	
+	logging.debug("clef1: " + str(clefs1.signature_at(msr1)))
+	logging.debug("clef2: " + str(clefs2.signature_at(msr2)))
+	return clefs1.same(clefs2, msr1, msr2)
+    
+
+
+    def have_same_contour(self, msr1=0, part1=0, msr2=0, part2=0):
+        """Checks if the pitches of the two scores go up, down or stay the same
+        in the same order at the specified measures of the specified parts
+
+        .. note:: Only the direction of each step between neighbouring pitches is
+           compared, so a measure has the same contour as any transposition of it.
+
+        Kwargs:
+          msr1 and msr2 (int):  The measures to compare
+
+          part1 and part2 (int): The parts to compare
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same contour
+           False -- The scores do not have the same contour
+
+        Raises:
+          PartRangeError: If user passes in a part that is out of range for either score
+
+          MeasureRangeError: If user passes in a measure that is out of range for either score
+
+
+        """
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+
+        logging.debug("contour1: " + str(table1.values('contour', msr1)))
+        logging.debug("contour2: " + str(table2.values('contour', msr2)))
+        return table1.same_measure(table2, 'contour', msr1, msr2)
+
+
+    def have_same_intervals(self, msr1=0, part1=0, msr2=0, part2=0):
+        """Checks if the steps between neighbouring pitches of the two scores are
+        the same at the specified measures of the specified parts
+
+        .. note:: The intervals are compared in the order that they occur, so a
+           measure has the same intervals as any transposition of it.
+
+        Kwargs:
+          msr1 and msr2 (int):  The measures to compare
+
+          part1 and part2 (int): The parts to compare
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same intervals
+           False -- The scores do not have the same intervals
+
+        Raises:
+          PartRangeError: If user passes in a part that is out of range for either score
+
+          MeasureRangeError: If user passes in a measure that is out of range for either score
+
+
+        """
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+
+        logging.debug("intervals1: " + str(table1.values('intervals', msr1)))
+        logging.debug("intervals2: " + str(table2.values('intervals', msr2)))
+        return table1.same_measure(table2, 'intervals', msr1, msr2)
+
+
+    def have_same_key_signature(self, msr1=0, part1=0, msr2=0, part2=0):
+        """Checks if the two scores both have the same key signature 
+	at the specified measures of the specified parts
+
+	.. note:: The exception raised in the case of a measure with no
+	   key signature is done to alert the user in case someone has
+	   inadvertently omitted a key signature from a measure, not to
+	   suggest that an atonal piece is "wrong".
+
+        Kwargs:
+          msr1 and msr2 (int): The measures to compare
+
+	  part1 and part2 (int): The parts to compare
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same key
+           False -- The scores do not have the same key
+
+        Raises:
+	  PartRangeError: If user passes in a part that is out of range for either score
+	  
+	  MeasureRangeError: If user passes in a measure that is out of range for either score
+
+	  AtonalPassageException: If there is no recorded key signature for msr1 or msr2
+
+       
+
+        """
+
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+       	key_signature1 = self.index1['key'][part1][msr1]
+        key_signature2 = self.index2['key'][part2][msr2]
+
+	if(key_signature1 is None  and key_signature2 is not None or
+			key_signature2 is None and key_signature1 is not None):
+            
+	    raise AtonalPassageException("One or more measures does not have a key signature")
+
+        if(key_signature1 is None and key_signature2 is None):
+
+	    raise AtonalPassageException("Neither measure has a key signature")
+        		
+	logging.debug("key signature1: " + str(self.index1['key'][part1].signature_at(msr1)))
+	logging.debug("key signature2: " + str(self.index2['key'][part2].signature_at(msr2)))
+	return self.index1['key'][part1].same(self.index2['key'][part2], msr1, msr2)
+
+
+    def have_same_ornaments(self, msr1=0, part1=0, msr2=0, part2=0):
+        """Checks if the two scores both have the same ornaments at the specified measures of the specified parts
+
+        Kwargs:
+          msr1 and msr2 (int):  The measures to compare
+          
+	  part1 and part2 (int): The parts to compare
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same ornaments
+           False -- The scores do not have the same ornaments
+
+        Raises:
+	  PartRangeError: If user passes in a part that is out of range for either score
+	  
+	  MeasureRangeError: If user passes in a measure that is out of range for either score
+
+
+
+        """
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+
+        logging.debug("ornaments1: " + str(table1.values('ornaments', msr1)))
+        logging.debug("ornaments2: " + str(table2.values('ornaments', msr2)))
+        return table1.same_measure(table2, 'ornaments', msr1, msr2)
+
+
+    def have_same_pitches(self, msr1=0, part1=0, msr2=0, part2=0):
+        """Checks if the two scores both have the same pitches at the specified measures of the specified parts
+	
+	.. note:: This method will compare pitches in the order that they occur.  
+	   To compare without considering order, use have_same_pitches_ignore_order.
+
+        
+	Kwargs:
+          msr1 and msr2 (int):  The measures to compare
+          
+	  part1 and part2 (int): The parts to compare
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same pitches
+           False -- The scores do not have the same pitches
+
+        Raises:
+	  PartRangeError: If user passes in a part that is out of range for either score
+	  
+	  MeasureRangeError: If user passes in a measure that is out of range for either score
+       
+
+        """
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+
+        logging.debug("pitches1: " + str(table1.values('pitches', msr1)))
+        logging.debug("pitches2: " + str(table2.values('pitches', msr2)))
+        return table1.same_measure(table2, 'pitches', msr1, msr2)
+
+
+    def have_same_pitches_ignore_order(self, msr1=0, part1=0, msr2=0, part2=0):
+        """Checks if the two scores both have the same pitches at the specified measures of the specified parts
+
+        .. note:: This method will determine if the same pitches are present without considering the order in which they appear.
+
+        Kwargs:
+          msr1 and msr2 (int): The measures to compare
+
+	  part1 and part2 (int): The parts to compare
+
+        Returns:
+          boolean.  The result of the comparison::
+
+	    True -- The scores have the same pitches
+	    False -- The scores do not have the same pitches
+
+        Raises:
+	   PartRangeError: If user passes in a part that is out of range for either score
+	   
+	   MeasureRangeError: If user passes in a measure that is out of range for either score
+
+
+
+	"""
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+
+        logging.debug("pitches1: " + str(table1.values('pitches_ignore_order', msr1)))
+        logging.debug("pitches2: " + str(table2.values('pitches_ignore_order', msr2)))
+        return table1.same_measure(table2, 'pitches_ignore_order', msr1, msr2)
+
+
+    def have_same_spanners(self, msr1=0, part1=0, msr2=0, part2=0):
+        """Checks if the two scores both have the same spanner 
+	sites at the specified measures of the specified parts [#f1]_
+
+	.. note:: The spanners are compared by class, not as the same objects,
+	   since the spanners of two scores are never the same objects.  Each note
+	   or chord has the sorted class names of the spanners it is in, so a measure
+	   compares equal to itself and to a measure with spanners of the same kinds.
+	   A spanner that is started and never stopped, such as a wavy line without
+	   a stop, is not a spanner, as music21 drops it while parsing.
+	
+	Kwargs:
+          msr1 and msr2 (int):  The measures to compare
+          
+	  part1 and part2 (int): The parts to compare
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same spanners
+           False -- The scores do not have the same spanners
+
+        Raises:
+	   PartRangeError: If user passes in a part that is out of range for either score
+	   
+	   MeasureRangeError: If user passes in a measure that is out of range for either score
+
+       
+
+        """
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+
+        logging.debug("spanners1: " + str(table1.values('spanners', msr1)))
+        logging.debug("spanners2: " + str(table2.values('spanners', msr2)))
+        return table1.same_measure(table2, 'spanners', msr1, msr2)
+
+
+    def have_same_stem_directions(self, msr1=0, part1=0, msr2=0, part2=0):
+        """Checks if the two scores both have the same stem 
+	directions at the specified measures of the specified parts
+
+	.. note:: This method will consider a chord with multiple upward
+	   pointing stems as one upward pointing stem.  This is done to facilitate
+	   the comparison of a passage with chords to simpler passages.  The method
+	   will, however, pick up on a stem direction within a chord that is different 
+	   from the other stem directions in the chord.
+
+        Kwargs:
+          msr1 and msr2 (int):  The measures to compare
+          
+	  part1 and part2 (int): The parts to compare
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same stem directions
+           False -- The scores do not have the same stem directions
+
+        Raises:
+	  PartRangeError: If user passes in a part that is out of range for either score
+	  
+	  MeasureRangeError: If user passes in a measure that is out of range for either score
+
+       
+
+        """
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+
+        logging.debug("stems1: " + str(table1.values('stems', msr1)))
+        logging.debug("stems2: " + str(table2.values('stems', msr2)))
+        return table1.same_measure(table2, 'stems', msr1, msr2)
+
+
+    def have_same_time_signature(self, msr1=0, part1=0, msr2=0, part2=0):
+        """Checks if the two scores both have the same time 
+	signature at the specified measures of the specified parts
+
+        Kwargs:
+          msr1 and msr2 (int):  The measures to compare
+          
+	  part1 and part2 (int): The parts to compare
+
+        Returns:
+          boolean.   The result of the comparison::
+
+           True -- The scores have the same time signature
+           False -- The scores do not have the same time signature
+
+        Raises:
+	   PartRangeError: If user passes in a part that is out of range for either score
+	   
+	   MeasureRangeError: If user passes in a measure that is out of range for either score
+
+       
+
+        """
+
+	self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        time_signatures1 = self.index1['time'][part1]
+	time_signatures2 = self.index2['time'][part2]
+	
+	logging.debug("time signature1: " + str(time_signatures1.signature_at(msr1)))
+	logging.debug("time signature2: " + str(time_signatures2.signature_at(msr2)))
+        return time_signatures1.same(time_signatures2, msr1, msr2)
+
+    def diff(self, categories=None, parts=None, workers=1):
+        """Compares the two scores in full, part by part and measure by measure,
+        and reports every difference found.  Each part is compared with array
+        operations over its NoteTable, and only the measures that differ are
+        decoded into MeasureFeatures, so the cost is linear in the size of the scores.
+
+        .. note:: Part n of score1 is compared with part n of score2, and measure m
+           with measure m.  Parts or measures that only exist in one of the scores
+           are reported once, with the categories 'parts' and 'measures'.
+
+        Kwargs:
+          categories (list):  The categories to compare, all of CATEGORIES by default
+
+          parts (list):  The parts to compare, all the parts both scores have by default.
+          The clefs, keys and time signatures of the other parts are never indexed and
+          their notes are never lowered into NoteTables, and the 'parts' difference is
+          only reported when every part is compared
+
+          workers (int):  The number of worker processes to compare the parts in.  Each
+          part is a separate shard: a worker indexes, lowers and compares it and sends
+          back its differences and NoteTables, which are kept for later comparisons
+
+        Returns:
+          list.  Difference(part, measure, category, detail) tuples in score order,
+          where detail is the pair of values found in score1 and score2
+
+        Raises:
+          PartRangeError: If user passes in a part that is out of range for either score
+
+
+        """
+
+        if(workers > 1):
+
+            differences = self.__diff_shards(categories, parts, workers)
+
+        else:
+
+            differences = list(self.iter_differences(categories, parts=parts))
+
+        logging.debug("differences: " + str(len(differences)))
+        return differences
+
+
+    def __diff_shards(self, categories, parts, workers):
+        """Compares the parts in worker processes and merges their differences
+        in score order
+
+
+        """
+
+        shards = self.__parts(parts)
+        differences = []
+        _shard['diff'] = self
+        pool = multiprocessing.Pool(min(workers, max(1, len(shards))), _start_shard,
+                                    (self.name1, self.name2, self.localCorpusPath, categories, self.reader,
+                                     self.window, self.lean, self.registry is not None, self.cache,
+                                     self.registry, self.sidecars))
+
+        try:
+
+            for part, (found, table1, table2) in zip(shards, pool.imap(_diff_shard, shards)):
+
+                differences += found
+                self.notes1.store(part, table1)
+                self.notes2.store(part, table2)
+
+            pool.close()
+
+        finally:
+
+            pool.terminate()
+            pool.join()
+            _shard.clear()
+
+        if(parts is None):
+
+            differences += self.__part_count_differences()
+
+        return differences
+
+
+    def __parts(self, parts):
+        """Returns the parts to compare, checking that they exist in both scores
+
+
+        """
+
+        if(parts is None):
+
+            return range(0, min(self.measures1.part_count(), self.measures2.part_count()))
+
+        for part in parts:
+
+            self.__verify_part(part, part)
+
+        return list(parts)
+
+
+    def __part_count_differences(self):
+        """Returns the 'parts' difference, if the scores have different numbers of parts
+
+
+        """
+
+        parts1 = self.measures1.part_count()
+        parts2 = self.measures2.part_count()
+
+        if(parts1 != parts2):
+
+            return [Difference(min(parts1, parts2), None, 'parts', (parts1, parts2))]
+
+        return []
+
+
+    def iter_differences(self, categories=None, max_results=None, progress=None, parts=None, measures=None):
+        """Generates the same differences as diff, measure by measure as they
+        are found.  The notes of a part that has not been lowered yet are lowered
+        into NoteTables and compared ScoreDiff.RUN measures at a time, when the
+        generator reaches them, so a consumer that stops early does not pay for
+        the rest of the scores.  Once every measure of such a part has been
+        compared, its NoteTables are kept for later comparisons.
+
+        Kwargs:
+          categories (list):  The categories to compare, all of CATEGORIES by default
+
+          max_results (int):  Stop after this many differences
+
+          progress (function):  Called as progress(part, done, total) after each
+          measure of a part is compared, with the number of measures compared so
+          far and the number of measures that will be compared in that part
+
+          parts (list):  The parts to compare, as for diff
+
+          measures (dict):  {part:list} to only compare the listed measures of each part,
+          such as the measures that changed since the last comparison.  The 'measures'
+          and 'parts' differences are reported as usual
+
+        Yields:
+          Difference.  The next difference, in score order
+
+        Raises:
+          PartRangeError: If user passes in a part that is out of range for either score
+
+
+        """
+
+        if(categories is None):
+
+            categories = CATEGORIES
+
+        if(max_results is not None and max_results <= 0):
+
+            return
+
+        found = 0
+
+        for part in self.__parts(parts):
+
+            measures1 = self.measures1.measure_count(part)
+            measures2 = self.measures2.measure_count(part)
+            total = min(measures1, measures2)
+            compared = range(0, total) if measures is None else sorted(msr for msr in measures.get(part, [])
+                                                                        if msr < total)
+            done = 0
+
+            for start, stop, table1, table2, same in self.__measure_runs(part, categories, compared):
+
+                while(done < len(compared) and compared[done] < stop):
+
+                    msr = compared[done]
+                    done += 1
+                    differing = [category for category in categories if not same[category][msr - start]]
+
+                    if(differing):
+
+                        features1 = self.__features(1, msr, part, table1, start)
+                        features2 = self.__features(2, msr, part, table2, start)
+
+                    for category in differing:
+
+                        yield Difference(part, msr, category, (features1.get(category), features2.get(category)))
+                        found += 1
+
+                        if(found == max_results):
+
+                            return
+
+                    if(progress is not None):
+
+                        progress(part, done, len(compared))
+
+            if(measures1 != measures2):
+
+                yield Difference(part, total, 'measures', (measures1, measures2))
+                found += 1
+
+                if(found == max_results):
+
+                    return
+
+        if(parts is None):
+
+            for difference in self.__part_count_differences():
+
+                yield difference
+
+
+    def __measure_runs(self, part, categories, compared):
+        """Generates (start, stop, table1, table2, same) for the runs of measures
+        of a part that hold compared measures, where table1 and table2 hold the
+        notes of measures start to stop of each score and same is as returned by
+        __measure_equality for these measures.  A part lowered in both scores is
+        one run.  Otherwise the part is lowered ScoreDiff.RUN measures at a time,
+        and once every run has been lowered the NoteTables of the part are kept
+
+        Args:
+          part (int):  The part to compare
+
+          categories (list):  The categories to compare
+
+          compared (list):  The measures to compare, in order
+
+
+        """
+
+        total = min(self.measures1.measure_count(part), self.measures2.measure_count(part))
+
+        if(self.notes1.lowered(part) and self.notes2.lowered(part)):
+
+            yield 0, total, self.notes1.part(part), self.notes2.part(part), self.__measure_equality(part, categories)
+            return
+
+        contexts = self.__context_equality(part, categories)
+        runs = ([], [])
+
+        for start in range(0, total, ScoreDiff.RUN):
+
+            stop = min(start + ScoreDiff.RUN, total)
+
+            if(bisect_left(compared, start) == bisect_left(compared, stop)):
+
+                runs = None
+                continue
+
+            table1 = self.notes1.measure_run(part, start, stop)
+            table2 = self.notes2.measure_run(part, start, stop)
+            same = dict((category, contexts[category][start:stop] if category in contexts else
+                         table1.measure_equality(table2, category)) for category in categories)
+
+            if(runs is not None):
+
+                runs[0].append(table1)
+                runs[1].append(table2)
+
+            yield start, stop, table1, table2, same
+
+        #the measures only one of the scores has are lowered last
+        if(runs is not None):
+
+            for notes, measures, tables in [(self.notes1, self.measures1, runs[0]),
+                                            (self.notes2, self.measures2, runs[1])]:
+
+                if(not notes.lowered(part)):
+
+                    tail = [notes.measure_run(part, total, measures.measure_count(part))]
+                    notes.store(part, NoteTable.join(tables + tail))
+
+
+    def __measure_equality(self, part, categories):
+        """Compares every measure of part n of score1 with the same measure of
+        part n of score2, one category at a time
+
+        Args:
+          part (int):  The part to compare
+
+          categories (list):  The categories to compare
+
+        Returns:
+          dictionary.  A numpy boolean array for each category, True for the
+          measures where the category is the same
+
+
+        """
+
+        same = self.__context_equality(part, categories)
+
+        for category in categories:
+
+            if(category not in same):
+
+                same[category] = self.notes1.part(part).measure_equality(self.notes2.part(part), category)
+
+        return same
+
+
+    def __context_equality(self, part, categories):
+        """Compares the clefs, key signatures and time signatures of every
+        measure of part n of score1 with the same measure of part n of score2
+
+        Args:
+          part (int):  The part to compare
+
+          categories (list):  The categories to compare, of which only the contexts are
+
+        Returns:
+          dictionary.  A numpy boolean array for each context category, True for
+          the measures where the category is the same
+
+
+        """
+
+        count = min(self.measures1.measure_count(part), self.measures2.measure_count(part))
+        same = dict()
+
+        for category in categories:
+
+            if(category in self.index1):
+
+                same[category] = numpy.ones(count, dtype=bool)
+
+                for start, stop in self.index1[category][part].diverge(self.index2[category][part]):
+
+                    same[category][start:stop] = False
+
+        return same
+
+
+    def __features(self, score_number, msr=0, part=0, table=None, start=0):
+        """Extracts the features of a measure of one of the scores
+
+        Args:
+          score_number (int):  A score number so the method knows which score to analyze
+
+        Kwargs:
+          msr (int): The measure to analyze
+
+          part (int): The part number for which the score should be analyzed
+
+          table (NoteTable):  The notes of a run of measures of the part that holds
+          msr, the NoteTable of the whole part by default
+
+          start (int):  The first measure of table
+
+        Returns:
+          MeasureFeatures
+
+
+        """
+
+        if(score_number == 1):
+
+            notes, index = self.notes1, self.index1
+
+        else:
+
+            notes, index = self.notes2, self.index2
+
+        table = notes.part(part) if table is None else table
+        return MeasureFeatures(table, msr - start, index['clef'][part][msr],
+                               index['key'][part][msr], index['time'][part][msr])
+
+
+    def compare_measure(self, msr1=0, part1=0, msr2=0, part2=0, categories=None):
+        """Compares two measures in every category at once.  The notes of each
+        measure are read from its NoteTable and decoded a single time, and all of
+        the verdicts are produced from that one pass.
+
+        .. note:: Missing key signatures are compared like any other value
+           instead of raising AtonalPassageException.
+
+        Kwargs:
+          msr1 and msr2 (int):  The measures to compare
+
+          part1 and part2 (int): The parts to compare
+
+          categories (list):  The categories to compare, all of CATEGORIES by default.
+          'pitches_ignore_order' may also be used
+
+        Returns:
+          dictionary.  A Verdict(same, only1, only2) for each category, where same
+          is the result the matching have_same_* method gives.  When the measures
+          differ, only1 and only2 hold the items of each measure that remain once
+          the items both measures start and end with are removed, or for
+          'pitches_ignore_order' the pitches that appear more often in one measure
+          than in the other
+
+        Raises:
+          PartRangeError: If user passes in a part that is out of range for either score
+
+          MeasureRangeError: If user passes in a measure that is out of range for either score
+
+
+        """
+
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+
+        if(categories is None):
+
+            categories = CATEGORIES
+
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+        features1 = self.__features(1, msr1, part1)
+        features2 = self.__features(2, msr2, part2)
+        verdicts = dict()
+
+        for category in categories:
+
+            value1 = features1.get(category)
+            value2 = features2.get(category)
+
+            if(category in self.index1):
+
+                same = value1 == value2
+
+            else:
+
+                same = table1.same_measure(table2, category, msr1, msr2)
+
+            verdicts[category] = self.__verdict(category, same, value1, value2)
+
+        logging.debug("verdicts: " + str(verdicts))
+        return verdicts
+
+
+    def compare_window(self, start, stop, part1=0, part2=0, categories=None, sounding=False):
+        """Compares the two scores over a span of time instead of a measure, so
+        that pickup bars, split measures and different barlines do not matter.
+        The notes in the span are found through the onset index of each NoteTable,
+        so the cost is proportional to the notes in the span.
+
+        .. note:: The notes are compared in order of onset, and of pitch for the
+           notes that start together.  For clef, key and time, the signatures in
+           effect at every measure that overlaps the span are compared, with repeats
+           left out.
+
+        Args:
+          start and stop (float):  The span, in quarter lengths from the start of the
+          parts, stop not included
+
+        Kwargs:
+          part1 and part2 (int): The parts to compare
+
+          categories (list):  The categories to compare, all of CATEGORIES by default.
+          'pitches_ignore_order' may also be used
+
+          sounding (bool):  Also compare the notes that start before the span and are
+          still sounding at its start
+
+        Returns:
+          dictionary.  A Verdict(same, only1, only2) for each category, as for
+          compare_measure
+
+        Raises:
+          PartRangeError: If user passes in a part that is out of range for either score
+
+
+        """
+
+        self.__verify_part(part1, part2)
+
+        if(categories is None):
+
+            categories = CATEGORIES
+
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+        rows1 = table1.window(start, stop, sounding)
+        rows2 = table2.window(start, stop, sounding)
+        verdicts = dict()
+
+        for category in categories:
+
+            if(category in self.index1):
+
+                value1 = self.__window_contexts(self.measures1, self.index1, category, part1, start, stop)
+                value2 = self.__window_contexts(self.measures2, self.index2, category, part2, start, stop)
+                same = value1 == value2
+
+            else:
+
+                keys1 = table1.window_values(category, rows1)
+                keys2 = table2.window_values(category, rows2)
+                same = numpy.array_equal(keys1, keys2)
+                value1 = decode_values(category, keys1)
+                value2 = decode_values(category, keys2)
+
+            verdicts[category] = self.__verdict(category, same, value1, value2)
+
+        logging.debug("window verdicts: " + str(verdicts))
+        return verdicts
+
+
+    def __window_contexts(self, measures, index, category, part, start, stop):
+        """Returns the signatures of a context in effect at the measures of a part
+        that overlap a span of time, leaving out repeats
+
+
+        """
+
+        offsets = measures.offsets[part]
+        first = max(0, bisect_right(offsets, start) - 1)
+        last = max(first + 1, bisect_left(offsets, stop))
+        signatures = []
+
+        for msr in range(first, min(last, len(offsets))):
+
+            signature = Tables.SIGNATURES[category](index[category][part][msr])
+
+            if(not signatures or signatures[-1] != signature):
+
+                signatures.append(signature)
+
+        return signatures
+
+
+    def __verdict(self, category, same, value1, value2):
+        """Returns the Verdict for one category given the values of both scores
+
+
+        """
+
+        if(same):
+
+            return Verdict(same, [], [])
+
+        if(category in self.index1 and not isinstance(value1, list)):
+
+            return Verdict(same, [value1], [value2])
+
+        if(category == 'pitches_ignore_order'):
+
+            count1 = Counter(value1)
+            count2 = Counter(value2)
+            return Verdict(same, sorted((count1 - count2).elements()), sorted((count2 - count1).elements()))
+
+        only1, only2 = self.__trim(value1, value2)
+        return Verdict(same, only1, only2)
+
+
+    def __trim(self, items1, items2):
+        """Removes the items that two lists have in common at their start and end
+        and returns what remains of each
+
+
+        """
+
+        start = 0
+
+        while(start < min(len(items1), len(items2)) and items1[start] == items2[start]):
+
+            start += 1
+
+        stop1 = len(items1)
+        stop2 = len(items2)
+
+        while(stop1 > start and stop2 > start and items1[stop1 - 1] == items2[stop2 - 1]):
+
+            stop1 -= 1
+            stop2 -= 1
+
+        return items1[start:stop1], items2[start:stop2]
+
+
+    def compare_many(self, pairs, categories=None):
+        """Compares many pairs of measures at once.  The ranges of all pairs are
+        checked together, and the measures are compared by their fingerprints,
+        looked up for each part with array operations.  Pairs whose fingerprints
+        match are then compared exactly.
+
+        .. note:: Missing key signatures are compared like any other value
+           instead of raising AtonalPassageException.
+
+        Args:
+          pairs (list):  (msr1, part1, msr2, part2) tuples, in the order taken by
+          the have_same_* methods, or an array with one such row per pair
+
+        Kwargs:
+          categories (list):  The categories to compare, all of CATEGORIES by default.
+          'pitches_ignore_order' may also be used
+
+        Returns:
+          numpy.ndarray.  A boolean for each pair and category, True where the
+          measures are the same, with one row per pair and one column per category
+
+        Raises:
+          PartRangeError: If a pair has a part that is out of range for either score
+
+          MeasureRangeError: If a pair has a measure that is out of range for either score
+
+
+        """
+
+        if(categories is None):
+
+            categories = CATEGORIES
+
+        pairs = numpy.asarray(pairs, dtype=int).reshape(-1, 4)
+        self.__verify_many(pairs)
+        results = numpy.empty((len(pairs), len(categories)), dtype=bool)
+
+        for column, category in enumerate(categories):
+
+            values1 = self.__measure_numbers(1, category, pairs[:, 0], pairs[:, 1])
+            values2 = self.__measure_numbers(2, category, pairs[:, 2], pairs[:, 3])
+            results[:, column] = values1 == values2
+
+            #confirm the pairs whose fingerprints match
+            for row in numpy.flatnonzero(results[:, column]):
+
+                results[row, column] = self.__same(category, *pairs[row])
+
+        return results
+
+
+    def __same(self, category, msr1, part1, msr2, part2):
+        """Compares one category of two measures exactly, without checking ranges
+
+        Args:
+          category (str):  The category to compare
+
+          msr1, part1, msr2, part2 (int):  The measures to compare
+
+        Returns:
+          bool.  True if the measures are the same
+
+
+        """
+
+        if(category in self.index1):
+
+            return self.index1[category][part1].same(self.index2[category][part2], msr1, msr2)
+
+        return self.notes1.part(part1).same_measure(self.notes2.part(part2), category, msr1, msr2)
+
+
+    def __measure_numbers(self, score_number, category, msrs, parts):
+        """Reduces one category of the given measures of one of the scores to
+        their fingerprints
+
+        Args:
+          score_number (int):  A score number so the method knows which score to analyze
+
+          category (str):  The category to reduce
+
+          msrs and parts (numpy.ndarray):  The measures to reduce
+
+        Returns:
+          numpy.ndarray.  A numpy.uint64 for each measure
+
+
+        """
+
+        if(score_number == 1):
+
+            notes, index = self.notes1, self.index1
+
+        else:
+
+            notes, index = self.notes2, self.index2
+
+        reduced = numpy.empty(len(msrs), dtype=numpy.uint64)
+
+        for part in numpy.unique(parts):
+
+            selected = parts == part
+
+            if(category in index):
 
+                context = index[category][part]
+                reduced[selected] = [context.fingerprint(msr) for msr in msrs[selected]]
 
-	"""
+            else:
 
-        self.__verify_part_and_measure(msr1, part1, msr2, part2)
-        
-	accidentals1 = self.__get_accidentals(1,msr1,part1)
-	accidentals2 = self.__get_accidentals(2,msr2,part2)
+                reduced[selected] = notes.part(part).fingerprints[category][msrs[selected]]
 
-	logging.debug("accidentals1: " +str([x.name for x in accidentals1]))
-	logging.debug("accidentals2: " +str([x.name for x in accidentals2]))
-	return accidentals1 == accidentals2
+        return reduced
 
 
-    def __get_accidentals(self, score_number, msr=0, part=0):
-        """A helper method for the have_same_accidentals method
-	
-	Args:
-	  msr (int): measure at which the accidentals should be collected
+    def __verify_many(self, pairs):
+        """Checks the ranges of many (msr1, part1, msr2, part2) pairs at once
 
-	  part (int): the part number for which the score should be analyzed
+        Args:
+          pairs (numpy.ndarray):  One row per pair
 
-	  score_number (int):  A score number so the method knows which score to analyze
+        Raises:
+          PartRangeError: If a pair has a part that is out of range for either score
 
-	Returns:
-	  list:  The collected accidentals
+          MeasureRangeError: If a pair has a measure that is out of range for either score
 
 
-	"""
+        """
 
-        if(score_number == 1):
+        for msrs, parts, measures, name in [(pairs[:, 0], pairs[:, 1], self.measures1, self.name1),
+                                            (pairs[:, 2], pairs[:, 3], self.measures2, self.name2)]:
 
-	    measures = self.score1.parts[part].getElementsByClass('Measure')
-	    notes = measures[msr].flat.notes
+            lengths = numpy.array(measures.lengths, dtype=int)
+            bad = (parts < 0) | (parts >= len(lengths))
 
-            if(self.index1['key'][part][msr] is None):
+            if(bad.any()):
 
-	        altered = []
+                raise PartRangeError("part number " + str(parts[bad][0]) + " does not exist for " + name)
 
-	    else:
+            bad = (msrs < 0) | (msrs >= lengths[parts])
 
-                altered = [x.name for x in self.index1['key'][part][msr].alteredPitches]
-	   	    
-        elif(score_number == 2):
+            if(bad.any()):
 
-            measures = self.score2.parts[part].getElementsByClass('Measure')
-            notes = measures[msr].flat.notes
+                raise MeasureRangeError("measure number " + str(msrs[bad][0]) + " does not exist for " + name)
 
-            if(self.index2['key'][part][msr] is None):
 
-	        altered = []
-            
-	    else:
-		    
-	        altered = [x.name for x in self.index2['key'][part][msr].alteredPitches]
-                           
-        naturals = set()
-        accidentals = []
-	
-        for note in notes:
+    def align(self, part1=0, part2=0, categories=None, max_cost=None):
+        """Lines up the measures of a part of score1 with the measures of a part
+        of score2, so that measures inserted or deleted in one of the scores do not
+        make every later measure differ.  Each measure is reduced to one fingerprint
+        over the categories, and the fingerprints are aligned with edit_script.
 
-            if(note.isChord):
+        Kwargs:
+          part1 and part2 (int): The parts to align
 
-                for pitch in note.pitches:
+          categories (list):  The categories that must be the same for two measures
+          to match, all of CATEGORIES by default
 
-                    if(not pitch.accidental is None and not pitch.name in altered):
+          max_cost (int):  As for edit_script
 
-                        accidentals.append(pitch.accidental)
+        Returns:
+          list.  Edit(operation, measure1, measure2) tuples in order.  'match' pairs
+          measures that are the same, 'change' pairs a measure with its edited
+          version, and 'delete' and 'insert' mark measures that only exist in
+          score1 or score2
 
-                        if(pitch.accidental.name == 'natural'):
+        Raises:
+          PartRangeError: If user passes in a part that is out of range for either score
 
-                            naturals.add(pitch.name)
 
-                    elif(pitch.name in altered and pitch.name[0] in naturals):
+        """
 
-                        accidentals.append(pitch.accidental)
-                        naturals.discard(pitch.name)
-		
-            elif(not note.accidental is None and not note.name in altered):
+        self.__verify_part(part1, part2)
 
-                accidentals.append(note.accidental)
+        if(categories is None):
 
-                if(note.accidental.name == 'natural'):
+            categories = CATEGORIES
 
-                    naturals.add(note.name)
+        signatures1 = measure_digests(part_leaves(self.measures1, self.index1, self.notes1, part1, categories))
+        signatures2 = measure_digests(part_leaves(self.measures2, self.index2, self.notes2, part2, categories))
+        return pair_changes(edit_script(signatures1.tolist(), signatures2.tolist(), max_cost))
 
-            elif(note.name in altered and note.name[0] in naturals):
 
-                accidentals.append(note.accidental)
-                naturals.discard(note.name)
-					
-        return accidentals
+    def aligned_diff(self, categories=None, parts=None, max_cost=None):
+        """Compares the two scores like diff, but compares each measure with the
+        measure it is aligned to by align instead of the measure with the same index
 
+        Kwargs:
+          categories (list):  The categories to compare, all of CATEGORIES by default
 
-    def have_same_articulations(self, msr1=0, part1=0, msr2=0, part2=0):
-        """Checks if the two scores both have the same articulations 
-	at the specified measures of the specified parts [#f2]_
-	
-	Kwargs:
-          msr1 and msr2 (int):  The measures to compare
+          parts (list):  The parts to compare, all the parts both scores have by default
 
-	  part1 and part2 (int): The parts to compare
+          max_cost (int):  As for edit_script
 
         Returns:
-          boolean.   The result of the comparison::
-
-           True -- The scores have the same articulations
-           False -- The scores do not have the same articulations
+          list.  AlignedDifference(part, measure1, measure2, category, detail) tuples
+          in score order.  Inserted and deleted measures are reported with the
+          categories 'inserted' and 'deleted', and the changed measures with every
+          category that differs, where detail is the pair of values found in score1
+          and score2
 
         Raises:
-	  PartRangeError: If user passes in a part that is out of range for either score
-	  
-	  MeasureRangeError: If user passes in a measure that is out of range for either score
+          PartRangeError: If user passes in a part that is out of range for either score
 
-       
 
         """
 
-	self.__verify_part_and_measure(msr1, part1, msr2, part2)
-                
-	notes1 = self.score1.parts[part1].getElementsByClass('Measure')[msr1].flat.notes
-        notes2 = self.score2.parts[part2].getElementsByClass('Measure')[msr2].flat.notes
-	articulations1 = []
-	articulations2 = []
-        
-        for note in notes1:
-            
-            articulations1 += note.articulations
+        if(categories is None):
 
-	for note in notes2:
+            categories = CATEGORIES
 
-	    articulations2 += note.articulations
-        	
-	logging.debug("articulations1: " +str(articulations1))
-	logging.debug("articulations2: "+ str(articulations2))
-        return articulations1 == articulations2
+        differences = []
 
+        for part in self.__parts(parts):
 
-    def have_same_clef_markings(self, msr1=0, part1=0, msr2=0, part2=0):
-        """Checks if the two scores both have the same clef markings 
-	at the specified measures of the specified parts
+            script = self.align(part, part, categories, max_cost)
+            changed = [(edit.measure1, part, edit.measure2, part) for edit in script if edit.operation == 'change']
+            same = iter(self.compare_many(changed, categories)) if changed else iter([])
 
-	.. note:: The current version does not support mid-measure clef
-	   changes.  This is something that will be addressed in future
-	   versions.
+            for edit in script:
 
-        Kwargs:
-          msr1 and msr2 (int):  The measures to compare
+                if(edit.operation == 'delete'):
 
-	  part1 and part2 (int): The parts to compare
+                    differences.append(AlignedDifference(part, edit.measure1, None, 'deleted', None))
 
-        Returns:
-          boolean.   The result of the comparison::
+                elif(edit.operation == 'insert'):
 
-           True -- The scores have the same clef markings
-           False -- The scores do not have the same clef markings
+                    differences.append(AlignedDifference(part, None, edit.measure2, 'inserted', None))
 
-        Raises:
-	  PartRangeError: If user passes in a part that is out of range for either score
-	  
-	  MeasureRangeError: If user passes in a measure that is out of range for either score
+                elif(edit.operation == 'change'):
 
+                    features1 = self.__features(1, edit.measure1, part)
+                    features2 = self.__features(2, edit.measure2, part)
 
+                    for category, verdict in zip(categories, next(same)):
 
-        """
+                        if(not verdict):
 
-        self.__verify_part_and_measure(msr1, part1, msr2, part2)
+                            differences.append(AlignedDifference(part, edit.measure1, edit.measure2, category,
+                                                                 (features1.get(category), features2.get(category))))
 
-        clef1 = self.index1['clef'][part1][msr1]
-        clef2 = self.index2['clef'][part2][msr2]
-	        	
-	logging.debug("clef1.sign: " + str(clef1.sign))
-	logging.debug("clef2.sign: " + str(clef2.sign))
-	return clef1.sign == clef2.sign
-    
+        if(parts is None):
 
+            for difference in self.__part_count_differences():
 
-    def have_same_key_signature(self, msr1=0, part1=0, msr2=0, part2=0):
-        """Checks if the two scores both have the same key signature 
-	at the specified measures of the specified parts
+                differences.append(AlignedDifference(difference.part, None, None, 'parts', difference.detail))
 
-	.. note:: The exception raised in the case of a measure with no
-	   key signature is done to alert the user in case someone has
-	   inadvertently omitted a key signature from a measure, not to
-	   suggest that an atonal piece is "wrong".
+        logging.debug("aligned differences: " + str(len(differences)))
+        return differences
 
-        Kwargs:
-          msr1 and msr2 (int): The measures to compare
 
-	  part1 and part2 (int): The parts to compare
+    def timeline(self, score_number=1):
+        """Returns the Timeline of one of the scores, building it the first time
+
+        Kwargs:
+          score_number (int):  1 for score1, 2 for score2
 
         Returns:
-          boolean.   The result of the comparison::
+          Timeline
 
-           True -- The scores have the same key
-           False -- The scores do not have the same key
 
-        Raises:
-	  PartRangeError: If user passes in a part that is out of range for either score
-	  
-	  MeasureRangeError: If user passes in a measure that is out of range for either score
+        """
 
-	  AtonalPassageException: If there is no recorded key signature for msr1 or msr2
+        if(score_number not in self.__timelines):
 
-       
+            measures, notes = (self.measures1, self.notes1) if score_number == 1 else (self.measures2, self.notes2)
+            self.__timelines[score_number] = Timeline.build(notes, measures.part_count())
 
-        """
+        return self.__timelines[score_number]
 
 
-        self.__verify_part_and_measure(msr1, part1, msr2, part2)
-       	key_signature1 = self.index1['key'][part1][msr1]
-        key_signature2 = self.index2['key'][part2][msr2]
+    def harmonic_diff(self, start=None, stop=None, bass=True):
+        """Compares what sounds in all of the parts of the two scores together at
+        every moment, regardless of how the notes are spread across the parts and
+        measures
 
-	if(key_signature1 is None  and key_signature2 is not None or
-			key_signature2 is None and key_signature1 is not None):
-            
-	    raise AtonalPassageException("One or more measures does not have a key signature")
+        Kwargs:
+          start and stop (float):  Only compare this span, in quarter lengths from the
+          start of the scores, the whole of both scores by default
 
-        if(key_signature1 is None and key_signature2 is None):
+          bass (bool):  Set to False to compare the pitch classes only, so that a
+          different voicing of the same harmony is not reported
 
-	    raise AtonalPassageException("Neither measure has a key signature")
-        		
-	logging.debug("key signature1.sharps: "+str(key_signature1.sharps))
-	logging.debug("key signature2.sharps: "+str(key_signature2.sharps))
-	return key_signature1.sharps == key_signature2.sharps
+        Returns:
+          list.  HarmonicDifference(start, stop, detail) tuples in order of time, see
+          Timeline.differences
 
 
-    def have_same_ornaments(self, msr1=0, part1=0, msr2=0, part2=0):
-        """Checks if the two scores both have the same ornaments at the specified measures of the specified parts
+        """
+
+        differences = self.timeline(1).differences(self.timeline(2), start, stop, bass)
+        logging.debug("harmonic differences: " + str(len(differences)))
+        return differences
+
+
+    def find_transpositions(self, part1=0, part2=0, min_notes=2):
+        """Finds the measures of score2 that hold the melody of a measure of
+        score1 at another pitch.  The measures are matched on the fingerprints
+        of their intervals, by sorting and searching arrays, so every measure of
+        one part is compared with every measure of the other without comparing
+        their notes.  Measures that also have the same pitches are not reported.
 
         Kwargs:
-          msr1 and msr2 (int):  The measures to compare
-          
-	  part1 and part2 (int): The parts to compare
+          part1 and part2 (int): The parts to compare
 
-        Returns:
-          boolean.   The result of the comparison::
+          min_notes (int):  Skip the measures with fewer pitches than this, which
+          are transpositions of too many others to be of interest
 
-           True -- The scores have the same ornaments
-           False -- The scores do not have the same ornaments
+        Returns:
+          list.  Transposition(measure1, measure2, semitones) tuples in order of
+          measure1 and measure2, where semitones is how far the measure of score2
+          is above the measure of score1
 
         Raises:
-	  PartRangeError: If user passes in a part that is out of range for either score
-	  
-	  MeasureRangeError: If user passes in a measure that is out of range for either score
-
+          PartRangeError: If user passes in a part that is out of range for either score
 
 
         """
 
-	self.__verify_part_and_measure(msr1, part1, msr2, part2)
-        
-        notes1 = self.score1.parts[part1].getElementsByClass('Measure')[msr1].flat.notes
-        notes2 = self.score2.parts[part2].getElementsByClass('Measure')[msr2].flat.notes
-        ornaments1 = []
-	ornaments2 = []
+        self.__verify_part(part1, part2)
 
-        for note in notes1:
-            
-            expressions = note.expressions
-                                    
-            for expression in expressions:
-                
-                classes = expression.classes
-		    
-	        for cls in classes:
-
-		    if(cls in ScoreDiff.ORNAMENTS):
-                    
-                        ornaments1.append(cls)
-                
-	for note in notes2:
-
-	    expressions = note.expressions
-	    
-            for expression in expressions:
-                
-                classes = expression.classes
-
-	        for cls in classes:
-		    
-		    if(cls in ScoreDiff.ORNAMENTS):
-                        
-                        ornaments2.append(cls)
-                        
-	logging.debug("ornaments1: "+ str(ornaments1))
-	logging.debug("ornaments2: " + str(ornaments2))
-	return ornaments1 == ornaments2    
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+        measures1 = numpy.flatnonzero(numpy.diff(table1.starts) >= max(min_notes, 1))
+        measures2 = numpy.flatnonzero(numpy.diff(table2.starts) >= max(min_notes, 1))
 
+        #every measure of part2 with the same intervals as a measure of part1
+        #sits in one run of the sorted fingerprints of part2
+        fingerprints2 = table2.fingerprints['intervals'][measures2]
+        order = numpy.argsort(fingerprints2, kind='mergesort')
+        fingerprints2 = fingerprints2[order]
+        fingerprints1 = table1.fingerprints['intervals'][measures1]
+        lows = numpy.searchsorted(fingerprints2, fingerprints1, 'left')
+        highs = numpy.searchsorted(fingerprints2, fingerprints1, 'right')
 
-    def have_same_pitches(self, msr1=0, part1=0, msr2=0, part2=0):
-        """Checks if the two scores both have the same pitches at the specified measures of the specified parts
-	
-	.. note:: This method will compare pitches in the order that they occur.  
-	   To compare without considering order, use have_same_pitches_ignore_order.
+        counts = highs - lows
+        firsts = numpy.repeat(measures1, counts)
+        runs = numpy.repeat(lows - numpy.concatenate([[0], numpy.cumsum(counts)[:-1]]), counts)
+        seconds = measures2[order[numpy.arange(len(firsts)) + runs]] if len(firsts) else measures2[:0]
 
-        
-	Kwargs:
+        cents = (numpy.round(table2.ps[table2.starts[seconds]] * 100) -
+                 numpy.round(table1.ps[table1.starts[firsts]] * 100)).astype(numpy.int64)
+        moved = cents != 0
+
+        #confirm that the intervals of the pairs are the same, not only their fingerprints
+        for i in numpy.flatnonzero(moved):
+
+            moved[i] = table1.same_measure(table2, 'intervals', firsts[i], seconds[i])
+
+        transpositions = [Transposition(int(first), int(second), int(shift) // 100 if shift % 100 == 0 else shift / 100.0)
+                          for first, second, shift in zip(firsts[moved], seconds[moved], cents[moved])]
+        transpositions.sort()
+
+        logging.debug("transpositions: " + str(len(transpositions)))
+        return transpositions
+
+
+    def similarity(self, msr1=0, part1=0, msr2=0, part2=0, categories=None):
+        """Measures how similar the specified measures of the specified parts are,
+        instead of only checking if they are the same
+
+        Kwargs:
           msr1 and msr2 (int):  The measures to compare
-          
-	  part1 and part2 (int): The parts to compare
 
-        Returns:
-          boolean.   The result of the comparison::
+          part1 and part2 (int): The parts to compare
 
-           True -- The scores have the same pitches
-           False -- The scores do not have the same pitches
+          categories (list):  The categories to measure, all of SIMILARITY_CATEGORIES
+          by default
+
+        Returns:
+          dictionary.  {category:float} where 1.0 means the same and 0.0 means that
+          no value is in its place, see edit_distance
 
         Raises:
-	  PartRangeError: If user passes in a part that is out of range for either score
-	  
-	  MeasureRangeError: If user passes in a measure that is out of range for either score
-       
+          PartRangeError: If user passes in a part that is out of range for either score
+
+          MeasureRangeError: If user passes in a measure that is out of range for either score
+
 
         """
 
-	self.__verify_part_and_measure(msr1, part1, msr2, part2)
+        self.__verify_part_and_measure(msr1, part1, msr2, part2)
 
-        pitches1 = self.score1.parts[part1].getElementsByClass('Measure')[msr1].flat.notes.pitches
-        pitches2 = self.score2.parts[part2].getElementsByClass('Measure')[msr2].flat.notes.pitches
-	
-	logging.debug("pitches1: " + str(pitches1))
-	logging.debug("pitches2: " + str(pitches2))
-        return pitches1 == pitches2
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+        similarities = dict()
 
+        for category in categories or SIMILARITY_CATEGORIES:
 
-    def have_same_pitches_ignore_order(self, msr1=0, part1=0, msr2=0, part2=0):
-        """Checks if the two scores both have the same pitches at the specified measures of the specified parts
+            values1 = table1.values(category, msr1)
+            values2 = table2.values(category, msr2)
+            distance = 0 if table1.same_measure(table2, category, msr1, msr2) else \
+                       edit_distance(list(values1), list(values2))
+            similarities[category] = float(similarity(distance, len(values1), len(values2)))
 
-        .. note:: This method will determine if the same pitches are present without considering the order in which they appear.
+        logging.debug("similarity: " + str(similarities))
+        return similarities
+
+
+    def part_similarity(self, part1=0, part2=0, categories=None):
+        """Measures how similar two parts are, comparing the values of all of their
+        measures as one sequence so that inserted and deleted notes are only
+        counted once, wherever the bar lines fall
 
         Kwargs:
-          msr1 and msr2 (int): The measures to compare
+          part1 and part2 (int): The parts to compare
 
-	  part1 and part2 (int): The parts to compare
+          categories (list):  The categories to measure, all of SIMILARITY_CATEGORIES
+          by default
 
         Returns:
-          boolean.  The result of the comparison::
-
-	    True -- The scores have the same pitches
-	    False -- The scores do not have the same pitches
+          dictionary.  {category:float}, see similarity
 
         Raises:
-	   PartRangeError: If user passes in a part that is out of range for either score
-	   
-	   MeasureRangeError: If user passes in a measure that is out of range for either score
+          PartRangeError: If user passes in a part that is out of range for either score
 
 
+        """
 
-	"""
+        self.__verify_part(part1, part2)
+        similarities = dict()
 
-	self.__verify_part_and_measure(msr1, part1, msr2, part2)
+        for category, (distance, length1, length2) in self.__part_distances(part1, part2, categories).items():
 
-	pitches1 = sorted(self.score1.parts[part1].getElementsByClass('Measure')[msr1].flat.notes.pitches)
-        pitches2 = sorted(self.score2.parts[part2].getElementsByClass('Measure')[msr2].flat.notes.pitches)
-	logging.debug("pitches1: " + str(pitches1))
-	logging.debug("pitches2: " + str(pitches2))
-        return pitches1 == pitches2
-	
+            similarities[category] = float(similarity(distance, length1, length2))
 
-    def have_same_spanners(self, msr1=0, part1=0, msr2=0, part2=0):
-        """Checks if the two scores both have the same spanner 
-	sites at the specified measures of the specified parts [#f1]_
-	
-	Kwargs:
-          msr1 and msr2 (int):  The measures to compare
-          
-	  part1 and part2 (int): The parts to compare
+        return similarities
 
-        Returns:
-          boolean.   The result of the comparison::
 
-           True -- The scores have the same spanners
-           False -- The scores do not have the same spanners
+    def score_similarity(self, categories=None):
+        """Measures how similar the two scores are, comparing part n of score1
+        with part n of score2.  The distances of the parts are added together, so
+        that longer parts count for more, and the values of a part that only one
+        of the scores has are all counted as different
 
-        Raises:
-	   PartRangeError: If user passes in a part that is out of range for either score
-	   
-	   MeasureRangeError: If user passes in a measure that is out of range for either score
+        Kwargs:
+          categories (list):  The categories to measure, all of SIMILARITY_CATEGORIES
+          by default
+
+        Returns:
+          dictionary.  {category:float}, see similarity
 
-       
 
         """
 
-	self.__verify_part_and_measure(msr1, part1, msr2, part2)
-        
-        notes1 = self.score1.parts[part1].getElementsByClass('Measure')[msr1].flat.notes
-        notes2 = self.score2.parts[part2].getElementsByClass('Measure')[msr2].flat.notes
+        categories = categories or SIMILARITY_CATEGORIES
+        totals = dict((category, [0, 0]) for category in categories)
+        count1 = self.measures1.part_count()
+        count2 = self.measures2.part_count()
 
-	spanners1=[]
-	spanners2=[]
+        for part in range(0, min(count1, count2)):
 
-	for note in notes1:
+            for category, (distance, length1, length2) in self.__part_distances(part, part, categories).items():
 
-	    if(note.isChord):
+                totals[category][0] += distance
+                totals[category][1] += max(length1, length2)
 
-	        for pitch in note.pitches:
+        for notes, parts in [(self.notes1, range(count2, count1)), (self.notes2, range(count1, count2))]:
 
-		    spanners1 += pitch.getSpannerSites()
+            for part in parts:
 
-	    else:
+                for category in categories:
 
-	        spanners1 += note.getSpannerSites()
-	
+                    length = len(notes.part(part).sequences(category)[0])
+                    totals[category][0] += length
+                    totals[category][1] += length
 
-	for note in notes2:
-		
-	    if(note.isChord):
+        similarities = dict((category, float(similarity(distance, longest, longest)))
+                            for category, (distance, longest) in totals.items())
+        logging.debug("score similarity: " + str(similarities))
+        return similarities
 
-	        for pitch in note.pitches:
 
-		    spanners2 += pitch.getSpannerSites()
+    def __part_distances(self, part1, part2, categories):
+        """Returns the edit distance between the values of two whole parts for
+        every category, with the lengths of the two sequences
 
-	    else:
+        Returns:
+          dictionary.  {category:(distance, length1, length2)}
 
-	        spanners2 += note.getSpannerSites()
-	
-	logging.debug("spanners1: " + str(spanners1))
-	logging.debug("spanners2: " + str(spanners2))
-        return spanners1 == spanners2
 
+        """
 
-    def have_same_stem_directions(self, msr1=0, part1=0, msr2=0, part2=0):
-        """Checks if the two scores both have the same stem 
-	directions at the specified measures of the specified parts
+        table1 = self.notes1.part(part1)
+        table2 = self.notes2.part(part2)
+        distances = dict()
 
-	.. note:: This method will consider a chord with multiple upward
-	   pointing stems as one upward pointing stem.  This is done to facilitate
-	   the comparison of a passage with chords to simpler passages.  The method
-	   will, however, pick up on a stem direction within a chord that is different 
-	   from the other stem directions in the chord.
+        for category in categories or SIMILARITY_CATEGORIES:
+
+            values1 = table1.sequences(category)[0]
+            values2 = table2.sequences(category)[0]
+            distances[category] = (edit_distance(values1.tolist(), values2.tolist()), len(values1), len(values2))
+
+        return distances
+
+
+    def similarity_matrix(self, part1=0, part2=0, category='pitches'):
+        """Measures the similarity of every measure of a part of score1 with every
+        measure of a part of score2, with distance_matrix
 
         Kwargs:
-          msr1 and msr2 (int):  The measures to compare
-          
-	  part1 and part2 (int): The parts to compare
+          part1 and part2 (int): The parts to compare
 
-        Returns:
-          boolean.   The result of the comparison::
+          category (str):  The category to measure, one of SIMILARITY_CATEGORIES
 
-           True -- The scores have the same stem directions
-           False -- The scores do not have the same stem directions
+        Returns:
+          numpy.ndarray.  Similarities between 0.0 and 1.0, with one row for each measure
+          of part1 and one column for each measure of part2
 
         Raises:
-	  PartRangeError: If user passes in a part that is out of range for either score
-	  
-	  MeasureRangeError: If user passes in a measure that is out of range for either score
+          PartRangeError: If user passes in a part that is out of range for either score
 
-       
 
         """
 
-	self.__verify_part_and_measure(msr1, part1, msr2, part2)
-
-        notes1 = self.score1.parts[part1].getElementsByClass('Measure')[msr1].flat.notes
-        notes2 = self.score2.parts[part2].getElementsByClass('Measure')[msr2].flat.notes
-
-        stems1=[]
-	stems2=[]
-        
-	for note in notes1:
+        self.__verify_part(part1, part2)
 
-	    if(note.isChord):
+        values1, starts1 = self.notes1.part(part1).sequences(category)
+        values2, starts2 = self.notes2.part(part2).sequences(category)
+        distances = distance_matrix(values1, starts1, values2, starts2)
+        return similarity(distances, numpy.diff(starts1)[:, None], numpy.diff(starts2)[None, :])
 
-	        temp = set()
 
-		for pitch in note.pitches:
+    def digest(self, score_number=1, categories=None):
+        """Returns the digest of one of the scores, which can be saved next to the
+        score and compared with the digests of other scores without parsing them again
 
-		    temp.add(note.getStemDirection(pitch))
+        Kwargs:
+          score_number (int):  1 for score1, 2 for score2
 
-		stems1 += temp
+          categories (list):  The categories to include, all of CATEGORIES by default
 
-						
-	    else:
+        Returns:
+          ScoreDigest
 
-	        stems1+=[note.stemDirection]
-	
-        for note in notes2:
-			
-	    if(note.isChord):
 
-	        temp = set()
+        """
 
-		for pitch in note.pitches:
+        if(score_number == 1):
 
-		    temp.add(note.getStemDirection(pitch))
+            return ScoreDigest.build(self.measures1, self.index1, self.notes1, categories)
 
-		stems2 += temp
+        return ScoreDigest.build(self.measures2, self.index2, self.notes2, categories)
 
-			
-            else:
 
-                stems2 += [note.stemDirection]
-	
-	logging.debug("stems1: " + str(stems1))
-	logging.debug("stems2: " + str(stems2))
-        return stems1 == stems2
-      
-   	
-    def have_same_time_signature(self, msr1=0, part1=0, msr2=0, part2=0):
-        """Checks if the two scores both have the same time 
-	signature at the specified measures of the specified parts
+    def diverging_contexts(self, part1=0, part2=0):
+        """Finds the measures where the clef, key signature or time signature
+        maps of the two scores diverge.  The cost is proportional to the number
+        of context changes in both parts, not to the number of measures.
 
         Kwargs:
-          msr1 and msr2 (int):  The measures to compare
-          
-	  part1 and part2 (int): The parts to compare
+          part1 and part2 (int): The parts to compare
 
         Returns:
-          boolean.   The result of the comparison::
-
-           True -- The scores have the same time signature
-           False -- The scores do not have the same time signature
+          dictionary.  {'clef':ranges, 'key':ranges, 'time':ranges} where ranges is
+          a list of (start, stop) measure numbers, stop not included, over which the
+          two parts have different clefs, key signatures or time signatures
 
         Raises:
-	   PartRangeError: If user passes in a part that is out of range for either score
-	   
-	   MeasureRangeError: If user passes in a measure that is out of range for either score
+          PartRangeError: If user passes in a part that is out of range for either score
 
-       
 
         """
 
-	self.__verify_part_and_measure(msr1, part1, msr2, part2)
+        self.__verify_part(part1, part2)
+        divergences = dict()
+
+        for context in self.index1:
+
+            divergences[context] = self.index1[context][part1].diverge(self.index2[context][part2])
+
+        logging.debug("diverging contexts: " + str(divergences))
+        return divergences
 
-        time_signature1 = self.index1['time'][part1][msr1]        
-	time_signature2 = self.index2['time'][part2][msr2]	
-	
-	numerator1 = time_signature1.numerator
-        numerator2 = time_signature2.numerator
-        denominator1 = time_signature1.denominator
-        denominator2 = time_signature2.denominator
-	
-	logging.debug("time signature1: "+str(numerator1) +"/"+str(denominator1))
-	logging.debug("time signature2: "+str(numerator2) +"/"+str(denominator2))
-        return numerator1 == numerator2 and denominator1 == denominator2 
 
     def __verify_part_and_measure(self, msr1, part1, msr2, part2):
         """Checks to make sure the part and measure numbers a user has entered are 
@@ -659,11 +2163,11 @@ class ScoreDiff:
         self.__verify_part(part1, part2)
 
 
-	if (msr1 >= len(self.score1.parts[part1].getElementsByClass('Measure').elements) or msr1 < 0):
+        if (msr1 >= self.measures1.measure_count(part1) or msr1 < 0):
 
 	    raise MeasureRangeError("measure number "+str(msr1) + " does not exist for "+self.name1)
 	
-	if (msr2 >= len(self.score2.parts[part2].getElementsByClass('Measure').elements) or msr2 < 0):
+        if (msr2 >= self.measures2.measure_count(part2) or msr2 < 0):
 		
 	    raise MeasureRangeError("measure number "+str(msr2) + " does not exist for "+self.name2)
 
@@ -680,11 +2184,11 @@ class ScoreDiff:
 
 	"""
 
-        if (part1 >= len(self.score1.parts) or part1 < 0):
+        if (part1 >= self.measures1.part_count() or part1 < 0):
 
             raise PartRangeError("part number " + str(part1) + " does not exist for " + self.name1)
 
-        if (part2 >= len(self.score2.parts) or part2 < 0):
+        if (part2 >= self.measures2.part_count() or part2 < 0):
 
             raise PartRangeError("part number " + str(part2) + " does not exist for " + self.name2)
 
@@ -0,0 +1,184 @@
+"""
+
+.. module:: similarity
+     :synopsis: A module for measuring how much two sequences of notes differ,
+       with edit distances computed on many bits at a time
+
+..   moduleauthor::  Julien Dubeau <jdubeau@dons.usfca.edu>
+
+
+"""
+
+import numpy
+
+
+#The note categories a similarity can be measured for, in the order they are reported
+SIMILARITY_CATEGORIES = ['pitches', 'rhythm', 'accidentals', 'articulations', 'ornaments',
+                         'spanners', 'stems']
+
+#The longest pattern distance_matrix compares with 64 bit arrays
+WORD = 64
+
+
+def edit_distance(sequence1, sequence2):
+    """Returns the number of insertions, deletions and substitutions that turn
+    sequence1 into sequence2, using the bit-parallel algorithm of Myers as
+    described by Hyyro.  Every item of sequence1 is a bit of an integer, so the
+    whole column of the distance table is updated at once for each item of
+    sequence2, whatever the length of sequence1
+
+    Args:
+      sequence1 and sequence2 (list):  The items to compare, such as the values
+      returned by NoteTable.values
+
+    Returns:
+      int
+
+
+    """
+
+    length = len(sequence1)
+
+    if(length == 0):
+
+        return len(sequence2)
+
+    matches = {}
+
+    for position, item in enumerate(sequence1):
+
+        matches[item] = matches.get(item, 0) | (1 << position)
+
+    mask = (1 << length) - 1
+    high = 1 << (length - 1)
+    positive = mask
+    negative = 0
+    distance = length
+
+    for item in sequence2:
+
+        equal = matches.get(item, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        up = negative | ~(horizontal | positive)
+        down = positive & horizontal
+
+        if(up & high):
+
+            distance += 1
+
+        elif(down & high):
+
+            distance -= 1
+
+        #the first row of the table counts the insertions, one per item
+        up = ((up << 1) | 1) & mask
+        down = (down << 1) & mask
+        positive = (down | ~(vertical | up)) & mask
+        negative = up & vertical
+
+    return distance
+
+
+def similarity(distance, length1, length2):
+    """Turns an edit distance into a similarity between 0 and 1
+
+    Args:
+      distance (int or numpy.ndarray):  As returned by edit_distance
+
+      length1 and length2 (int or numpy.ndarray):  The lengths of the sequences
+
+    Returns:
+      float or numpy.ndarray.  1 for the same sequences and 0 when no item is
+      in its place; two empty sequences are the same
+
+
+    """
+
+    longest = numpy.maximum(length1, length2)
+    return 1.0 - numpy.asarray(distance, dtype=numpy.float64) / numpy.maximum(longest, 1)
+
+
+def distance_matrix(values1, starts1, values2, starts2):
+    """Returns the edit distance between every measure of one part and every
+    measure of another.  All the pairs are compared at the same time with 64 bit
+    arrays, one item of the measures of the second part after the other, so the
+    number of steps is the length of the longest of these measures.  Measures of
+    the first part longer than 64 items are compared with edit_distance.
+
+    Args:
+      values1 and values2 (numpy.ndarray):  The values of every measure of each part,
+      one measure after the other, as returned by NoteTable.sequences
+
+      starts1 and starts2 (numpy.ndarray):  The index of the first value of every
+      measure, followed by the number of values
+
+    Returns:
+      numpy.ndarray.  The distances as integers, with one row for each measure of the
+      first part and one column for each measure of the second
+
+
+    """
+
+    values1 = numpy.asarray(values1)
+    values2 = numpy.asarray(values2)
+    lengths1 = numpy.diff(starts1)
+    lengths2 = numpy.diff(starts2)
+    distances = numpy.empty((len(lengths1), len(lengths2)), dtype=numpy.int64)
+    distances[lengths1 == 0] = lengths2
+
+    #number the values, so that the bits of the pattern are found by indexing
+    vocabulary, codes = numpy.unique(numpy.concatenate([values1, values2]), return_inverse=True)
+    codes1 = codes[:len(values1)]
+    codes2 = codes[len(values1):]
+
+    for msr in numpy.flatnonzero(lengths1 > WORD):
+
+        pattern = list(values1[starts1[msr]:starts1[msr + 1]])
+
+        for column in range(0, len(lengths2)):
+
+            distances[msr, column] = edit_distance(pattern, list(values2[starts2[column]:starts2[column + 1]]))
+
+    short = numpy.flatnonzero((lengths1 > 0) & (lengths1 <= WORD))
+
+    if(len(short) == 0 or len(lengths2) == 0):
+
+        return distances
+
+    #the bits of every value in the patterns of the short measures
+    owners = numpy.repeat(numpy.arange(len(lengths1)), lengths1)
+    positions = numpy.arange(len(values1)) - numpy.repeat(starts1[:-1], lengths1)
+    rows = numpy.full(len(lengths1), -1, dtype=numpy.int64)
+    rows[short] = numpy.arange(len(short))
+    selected = rows[owners] >= 0
+    matches = numpy.zeros((len(short), len(vocabulary)), dtype=numpy.uint64)
+    numpy.bitwise_or.at(matches, (rows[owners][selected], codes1[selected]),
+                        numpy.uint64(1) << positions[selected].astype(numpy.uint64))
+
+    lengths = lengths1[short].astype(numpy.uint64)[:, None]
+    mask = numpy.uint64(0xffffffffffffffff) >> (numpy.uint64(WORD) - lengths)
+    high = numpy.uint64(1) << (lengths - numpy.uint64(1))
+    positive = numpy.repeat(mask, len(lengths2), axis=1)
+    negative = numpy.zeros_like(positive)
+    distance = numpy.repeat(lengths1[short][:, None], len(lengths2), axis=1).astype(numpy.int64)
+    one = numpy.uint64(1)
+
+    with numpy.errstate(over='ignore'):
+
+        for step in range(0, lengths2.max()):
+
+            active = step < lengths2
+            equal = matches[:, codes2[numpy.minimum(starts2[:-1] + step, max(len(codes2) - 1, 0))]]
+            vertical = equal | negative
+            horizontal = (((equal & positive) + positive) ^ positive) | equal
+            up = negative | ~(horizontal | positive)
+            down = positive & horizontal
+            distance += active * (((up & high) != 0).astype(numpy.int64) - ((down & high) != 0))
+            up = ((up << one) | one) & mask
+            down = (down << one) & mask
+            positive = (down | ~(vertical | up)) & mask
+            negative = up & vertical
+
+    distances[short] = distance
+    return distances
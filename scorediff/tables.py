@@ -9,6 +9,273 @@
 
 """
 
+import json
+import struct
+import hashlib
+from array import array
+from bisect import bisect_right
+
+
+def value_fingerprint(value):
+    """Returns a 64 bit fingerprint of a signature that is the same in every
+    process and on every platform.  Strings and unicode strings with the same
+    text, and tuples and lists with the same items, have the same fingerprint
+
+    Args:
+      value:  A signature, such as a string, a number, a tuple of those or None
+
+    Returns:
+      int
+
+
+    """
+
+    text = json.dumps(value, default=repr, sort_keys=True)
+    return struct.unpack('<Q', hashlib.sha1(text.encode('utf-8')).digest()[:8])[0]
+
+
+class ContextMap:
+    """The ContextMap class stores the context object (a clef, key signature or
+    time signature) in effect at every measure of a part as a list of change
+    points: the sorted measure numbers where a new object takes effect and the
+    objects themselves.  It can be indexed and iterated like a list with one
+    entry per measure, and lookups are done with a binary search.  The
+    signature of every object and its fingerprint are computed when it is
+    added.  Objects are compared by their fingerprints first, and by their
+    signatures when the fingerprints are the same.
+
+    """
+
+    def __init__(self, signature=None):
+        """Initializes an empty ContextMap object
+
+        Kwargs:
+          signature (function):  Maps a context object to the value that is
+          compared when looking for divergences, the object itself by default
+
+        """
+
+        self.starts = array('l')
+        self.values = []
+        self.signatures = []
+        self.fingerprints = []
+        self.length = 0
+        self.signature = signature
+
+
+    def append(self, value):
+        """Adds the context object in effect at the next measure
+
+        Args:
+          value:  A context object, or None if there is none
+
+        """
+
+        if(not self.values or self.values[-1] is not value):
+
+            signature = self.signature(value) if self.signature else value
+            self.starts.append(self.length)
+            self.values.append(value)
+            self.signatures.append(signature)
+            self.fingerprints.append(value_fingerprint(signature))
+
+        self.length += 1
+
+
+    def changes(self):
+        """Returns the change points of this map
+
+        Returns:
+          list.  (measure, context object) pairs, one per change
+
+        """
+
+        return list(zip(self.starts, self.values))
+
+
+    def fingerprint(self, msr):
+        """Returns the fingerprint of the signature of the context object in
+        effect at measure msr, see value_fingerprint
+
+        Args:
+          msr (int):  The index of the measure
+
+        Returns:
+          int
+
+        """
+
+        return self.fingerprints[self.__change(msr)]
+
+
+    def signature_at(self, msr):
+        """Returns the signature of the context object in effect at measure msr,
+        the value that is compared
+
+        Args:
+          msr (int):  The index of the measure
+
+        """
+
+        return self.signatures[self.__change(msr)]
+
+
+    def same(self, other, msr1, msr2):
+        """Compares the context object in effect at measure msr1 of this map with
+        the one in effect at measure msr2 of other
+
+        Args:
+          other (ContextMap):  The map to compare with
+
+          msr1 and msr2 (int):  The measures to compare
+
+        Returns:
+          boolean
+
+        """
+
+        change1 = self.__change(msr1)
+        change2 = other.__change(msr2)
+
+        if(self.fingerprints[change1] != other.fingerprints[change2]):
+
+            return False
+
+        return self.signatures[change1] == other.signatures[change2]
+
+
+    def diverge(self, other):
+        """Returns the ranges of measures where this map and other hold
+        context objects with different signatures.  The cost is proportional
+        to the number of changes in both maps, not to the number of measures.
+        Only the measures that exist in both maps are compared.
+
+        Args:
+          other (ContextMap):  The map to compare with
+
+        Returns:
+          list.  (start, stop) pairs of measure numbers, stop not included
+
+        """
+
+        stop = min(len(self), len(other))
+        ranges = []
+        i = j = 0
+        start = 0
+
+        while(start < stop):
+
+            while(i + 1 < len(self.starts) and self.starts[i + 1] <= start):
+
+                i += 1
+
+            while(j + 1 < len(other.starts) and other.starts[j + 1] <= start):
+
+                j += 1
+
+            end = stop
+
+            if(i + 1 < len(self.starts)):
+
+                end = min(end, self.starts[i + 1])
+
+            if(j + 1 < len(other.starts)):
+
+                end = min(end, other.starts[j + 1])
+
+            if(self.fingerprints[i] != other.fingerprints[j] or self.signatures[i] != other.signatures[j]):
+
+                if(ranges and ranges[-1][1] == start):
+
+                    ranges[-1] = (ranges[-1][0], end)
+
+                else:
+
+                    ranges.append((start, end))
+
+            start = end
+
+        return ranges
+
+
+    def converted(self, convert):
+        """Returns a copy of this map where every context object is replaced
+        by another, such as a smaller record of the same object.  The change
+        points, signatures and fingerprints are kept, so the replacement must have the
+        same signature
+
+        Args:
+          convert (function):  Maps a context object to its replacement
+
+        Returns:
+          ContextMap
+
+        """
+
+        other = ContextMap(self.signature)
+        other.starts = array('l', self.starts)
+        other.values = [convert(value) for value in self.values]
+        other.signatures = list(self.signatures)
+        other.fingerprints = list(self.fingerprints)
+        other.length = self.length
+        return other
+
+
+    def __getitem__(self, msr):
+        """Returns the context object in effect at measure msr
+
+        """
+
+        return self.values[self.__change(msr)]
+
+
+    def __change(self, msr):
+        """Returns the index of the change point in effect at measure msr
+
+        """
+
+        if(msr < 0):
+
+            msr += self.length
+
+        if(msr < 0 or msr >= self.length):
+
+            raise IndexError("measure number out of range")
+
+        return bisect_right(self.starts, msr) - 1
+
+
+    def __len__(self):
+
+        return self.length
+
+
+    def __iter__(self):
+
+        for i in range(0, len(self.starts)):
+
+            end = self.starts[i + 1] if i + 1 < len(self.starts) else self.length
+
+            for msr in range(self.starts[i], end):
+
+                yield self.values[i]
+
+
+    def __eq__(self, other):
+
+        return list(self) == list(other)
+
+
+    def __ne__(self, other):
+
+        return not self == other
+
+
+    def __repr__(self):
+
+        return repr(list(self))
+
+
 class Tables:
     """The Tables class builds a variety of tables
     for convenient lookup.  The __init__ method needs a music21.stream.Score
@@ -16,15 +283,28 @@ class Tables:
 
     """
 
-    def __init__(self, score):
+    #Each context is stored under its name and is the first element of the
+    #given class at the start of a measure.  Add an entry here to index another context
+    CONTEXTS = [('clef', 'Clef'), ('time', 'TimeSignature'), ('key', 'KeySignature')]
+
+    #The values compared by ScoreDiff for each context
+    SIGNATURES = {'clef': lambda clef: None if clef is None else clef.sign,
+                  'time': lambda time: None if time is None else (time.numerator, time.denominator),
+                  'key': lambda key: None if key is None else key.sharps}
+
+    def __init__(self, score, measures=None):
         """sets this object's score to the score passed in
 
 	Args:
 	  score (music21.stream.Score):  A music21 score object to analyze
+
+        Kwargs:
+          measures (MeasureDirectory):  The measures of score, if they have already been collected
         
 	"""
         	
         self.score = score
+        self.measures = measures
 
 
     def build_clefs(self, part):
@@ -35,30 +315,15 @@ class Tables:
 	  the building to only one part of the score
         
 	Returns:
-	  list.
+	  ContextMap.  It is indexed like a list with one entry per measure
 
         """
-	
-        temp = list()
-	measures = self.score.parts[part].getElementsByClass('Measure')
-	recent_clef = None
-        
-	for measure in measures:
-
-	    if(measure.clef is not None):
 
-                recent_clef = measure.clef
-		temp.append(measure.clef)
-
-            else:
-
-		temp.append(recent_clef)
-
-	return temp
+        return self.build_part(part, ['clef'])['clef']
 
 
     def build_all_clefs(self):
-        """Returns a list of lists of clef objects based on score passed to __init__
+        """Returns a list of ContextMap objects of clefs based on score passed to __init__
 	A list of clefs can be accessed for a given part via list[part_index]
         
 	Returns:
@@ -83,30 +348,15 @@ class Tables:
 	  the building to only one part of the score
 
 	Returns:
-	  list
+	  ContextMap.  It is indexed like a list with one entry per measure
 
 	"""
 
-	temp = list()
-	measures = self.score.parts[part].getElementsByClass('Measure')
-	recent_time = None
-
-	for measure in measures:
-
-	    if(measure.timeSignature is not None):
-
-	        recent_time = measure.timeSignature
-		temp.append(measure.timeSignature)
-
-	    else:
-
-	        temp.append(recent_time)
-
-	return temp
+        return self.build_part(part, ['time'])['time']
 
 
     def build_all_times(self):
-        """Returns a list of lists of timesignature objects based on all
+        """Returns a list of ContextMap objects of timesignatures based on all
 	parts in the score.  Access data for a given part with list[part_index]
         
 	Returns:
@@ -131,30 +381,15 @@ class Tables:
 	  to only part of the score
 
 	Returns:
-	  list
+	  ContextMap.  It is indexed like a list with one entry per measure
 
 	"""
 
-	temp = list()
-	measures = self.score.parts[part].getElementsByClass('Measure')
-	recent_key = None
-
-	for measure in measures:
-
-	    if(measure.keySignature is not None):
-
-	        recent_key = measure.keySignature
-		temp.append(measure.keySignature)
-
-	    else:
-
-	        temp.append(recent_key)
-
-	return temp
+        return self.build_part(part, ['key'])['key']
 
 
     def build_all_keys(self):
-        """Returns a list of lists of keysignature objects based on all
+        """Returns a list of ContextMap objects of keysignatures based on all
 	parts in the score.  Access data for a given part with list[part_index]
 
 	Returns:
@@ -171,6 +406,62 @@ class Tables:
 	return temp
 
 
+    def build_part(self, part, contexts=None):
+        """Returns a dictionary of ContextMap objects, one per context in Tables.CONTEXTS,
+        built in a single pass over the measures of part.  Each map holds the
+        context object in effect at every measure, stored as
+        {'clef':[cleftable], 'key':[keytable], 'time':[timetable]}
+
+        Args:
+          part (int):  The index of the part to build the tables for
+
+        Kwargs:
+          contexts (list):  The names of the contexts to build, all of them by default
+
+        Returns:
+          dictionary.  A dictionary of the form described above
+
+        """
+
+        classes = dict((cls, context) for (context, cls) in Tables.CONTEXTS
+                       if contexts is None or context in contexts)
+        temp = dict((context, ContextMap(Tables.SIGNATURES.get(context)))
+                    for context in classes.values())
+        recent = dict((context, None) for context in classes.values())
+
+        if(self.measures is not None):
+
+            measures = self.measures.measures(part)
+
+        else:
+
+            measures = self.score.parts[part].getElementsByClass('Measure')
+
+        for measure in measures:
+
+            found = set()
+
+            #the elements are sorted by offset, so the context objects come first
+            for element in measure.elements:
+
+                if(element.getOffsetBySite(measure) > 0):
+
+                    break
+
+                for cls in element.classes:
+
+                    if(cls in classes and not classes[cls] in found):
+
+                        recent[classes[cls]] = element
+                        found.add(classes[cls])
+
+            for context in temp:
+
+                temp[context].append(recent[context])
+
+        return temp
+
+
     def build(self):
         """Returns a dictionary of doubly nested lists.  These include all
 	of the data that can be obtained from the other methods in this class,
@@ -181,10 +472,141 @@ class Tables:
 
 	"""
 
-        index = dict(list(list()))
+        index = dict((context, []) for (context, cls) in Tables.CONTEXTS)
+
+        for i in range(0, len(self.score.parts.elements)):
+
+            tables = self.build_part(i)
+
+            for context in tables:
+
+                index[context].append(tables[context])
+
+        return index
+
+
+class ContextIndex:
+    """The ContextIndex class holds the context tables of a score like the
+    dictionary returned by Tables.build, {'clef':[cleftable], 'key':[keytable],
+    'time':[timetable]}, but builds the tables of a part with Tables.build_part
+    the first time one of them is asked for, so that the parts that are never
+    compared are never indexed
+
+    """
+
+    def __init__(self, tables, part_count):
+        """Initializes a ContextIndex object
+
+        Args:
+          tables (Tables):  The Tables object of the score, with its measures
+
+          part_count (int):  The number of parts in the score
+
+        """
+
+        self.tables = tables
+        self.__parts = [None] * part_count
+        self.__contexts = dict((context, ContextParts(self, context)) for (context, cls) in Tables.CONTEXTS)
+
+
+    def part(self, part):
+        """Returns the tables of a part, building them the first time
+
+        Args:
+          part (int):  The index of the part
+
+        Returns:
+          dictionary.  A ContextMap for each context, as returned by Tables.build_part
+
+        """
+
+        tables = self.__parts[part]
+
+        if(tables is None):
+
+            tables = self.tables.build_part(part)
+            self.__parts[part] = tables
+
+        return tables
+
+
+    def indexed_parts(self):
+        """Returns the parts whose tables have been built
+
+        Returns:
+          list
+
+        """
+
+        return [part for part, tables in enumerate(self.__parts) if tables is not None]
+
+
+    def part_count(self):
+
+        return len(self.__parts)
+
+
+    def keys(self):
+
+        return self.__contexts.keys()
+
+
+    def __getitem__(self, context):
+        """Returns the tables of one context, indexed like a list with one
+        ContextMap per part
+
+        """
+
+        return self.__contexts[context]
+
+
+    def __contains__(self, context):
+
+        return context in self.__contexts
+
+
+    def __iter__(self):
+
+        return iter(self.__contexts)
+
+
+    def __len__(self):
+
+        return len(self.__contexts)
+
+
+class ContextParts:
+    """The ContextParts class holds the tables of one context of a ContextIndex,
+    indexed like a list with one ContextMap per part
+
+    """
+
+    def __init__(self, index, context):
+
+        self.index = index
+        self.context = context
+
+
+    def __getitem__(self, part):
+
+        if(part < 0):
+
+            part += len(self)
+
+        if(part < 0 or part >= len(self)):
+
+            raise IndexError("part number out of range")
+
+        return self.index.part(part)[self.context]
+
+
+    def __len__(self):
+
+        return self.index.part_count()
+
+
+    def __iter__(self):
 
-	index.update({'clef':self.build_all_clefs()})
-	index.update({'time':self.build_all_times()})
-	index.update({'key':self.build_all_keys()})
+        for part in range(0, len(self)):
 
-	return index
+            yield self[part]
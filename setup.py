@@ -7,6 +7,7 @@ setup(
 	author_email='jdubeau@dons.usfca.edu',
 	packages=['scorediff',],
 	license='MIT License',
+	requires=['music21', 'numpy'],
 	url='todo',
 	long_description=open('README.txt').read(),
 
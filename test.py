@@ -2,6 +2,11 @@
 
 from scorediff import *
 from os.path import abspath
+import os
+import re
+import tempfile
+import zipfile
+import shutil
 
 path = abspath('scorediff/test_cases')
 
@@ -279,7 +284,7 @@ def test_spanners(score1, score2, measure1 = 0, part1 = 0, measure2=0, part2=0):
 	   False
 
 	   >>> test_spanners('bwv66.6.mxl', 'different_ornaments.mxl')
-	   False
+	   True
 
 	   >>> test_spanners('bwv66.6.mxl', 'different_pitches.mxl')
 	   True
@@ -303,6 +308,59 @@ def test_spanners(score1, score2, measure1 = 0, part1 = 0, measure2=0, part2=0):
 	diff = ScoreDiff(score1, score2, path)
 	return diff.have_same_spanners(measure1, part1, measure2, part2)
 
+def test_wavy_line(reader='music21'):
+
+	"""
+	   >>> test_wavy_line()
+	   False
+
+	   >>> test_wavy_line('stream')
+	   False
+
+
+	"""
+	directory = tempfile.mkdtemp()
+
+	try:
+		#different_ornaments.mxl starts two wavy lines and never stops them, so music21
+		#keeps no TrillExtension; stopping the second one completes the first
+		text = open(os.path.join(path, 'bach', 'different_ornaments.mxl')).read()
+		start = text.rindex('<wavy-line type="start"/>')
+		copy = os.path.join(directory, 'wavy_line.xml')
+		open(copy, 'w').write(text[:start] + '<wavy-line type="stop"/>' + text[start + len('<wavy-line type="start"/>'):])
+		diff = ScoreDiff('bwv66.6.mxl', copy, path, use_cache=False, reader=reader)
+		return diff.have_same_spanners(0, 0, 0, 0)
+
+	finally:
+		shutil.rmtree(directory)
+
+def test_note_marks(names1, names2, ordered=True):
+
+	"""
+	   >>> test_note_marks(['Staccato', 'Accent'], ['Accent', 'Staccato'])
+	   False
+
+	   >>> test_note_marks(['Staccato'], ['Staccato', 'Staccato'])
+	   False
+
+	   >>> test_note_marks(['Slur', 'Crescendo'], ['Crescendo', 'Slur'], False)
+	   True
+
+	   >>> decode_sequence(encode_sequence(['Staccato', 'Accent', 'Staccato'], ARTICULATIONS), ARTICULATIONS)
+	   ['Staccato', 'Accent', 'Staccato']
+
+	   >>> chord_stems(['up', 'down', 'up']) == chord_stems(['down', 'up']), chord_stems(['up', 'up']) == chord_stems(['up'])
+	   (True, True)
+
+	   >>> diff = ScoreDiff('different_phrasing.mxl', 'different_phrasing.mxl', path, use_cache=False)
+	   >>> diff.have_same_spanners(0, 0, 0, 0), diff.diff(['spanners'])
+	   (True, [])
+
+
+	"""
+	vocabulary = ARTICULATIONS if ordered else SPANNERS
+	return encode_sequence(names1, vocabulary, ordered) == encode_sequence(names2, vocabulary, ordered)
+
 def test_articulations(score1, score2, measure1 = 0, part1 = 0, measure2=0, part2=0):
 
 	"""
@@ -333,6 +391,855 @@ def test_articulations(score1, score2, measure1 = 0, part1 = 0, measure2=0, part
 	diff = ScoreDiff(score1, score2, path)
 	return diff.have_same_articulations(measure1, part1, measure2, part2)
 
+def test_diverging_contexts(score1, score2, context, part1=0, part2=0):
+
+	"""
+	   >>> test_diverging_contexts('bwv66.6.mxl', 'different_key.mxl', 'key')
+	   [(0, 10)]
+
+	   >>> test_diverging_contexts('bwv66.6.mxl', 'different_key2.mxl', 'key')
+	   [(1, 10)]
+
+	   >>> test_diverging_contexts('bwv66.6.mxl', 'different_clef3.mxl', 'clef')
+	   [(2, 10)]
+
+	   >>> test_diverging_contexts('bwv66.6.mxl', 'different_time3.mxl', 'time')
+	   [(1, 10)]
+
+	   >>> test_diverging_contexts('bwv66.6.mxl', 'different_pitches.mxl', 'key')
+	   []
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	return diff.diverging_contexts(part1, part2)[context]
+
+def test_diff(score1, score2):
+
+	"""
+	   >>> test_diff('bwv66.6.mxl', 'bwv66.6.mxl')
+	   []
+
+	   >>> test_diff('bwv66.6.mxl', 'different_dynamics.mxl')
+	   []
+
+	   >>> test_diff('bwv66.6.mxl', 'different_key.mxl')
+	   ['key']
+
+	   >>> test_diff('bwv66.6.mxl', 'different_time3.mxl')
+	   ['time']
+
+	   >>> test_diff('bwv66.6.mxl', 'different_stems3.mxl')
+	   ['stems']
+
+	   >>> test_diff('bwv66.6.mxl', 'different_articulations.mxl')
+	   ['articulations']
+
+	   >>> test_diff('bwv66.6.mxl', 'different_accidentals.mxl')
+	   ['accidentals', 'pitches']
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	return sorted(set(difference.category for difference in diff.diff()))
+
+def test_iter_differences(score1, score2, max_results=None, categories=None):
+
+	"""
+	   >>> test_iter_differences('bwv66.6.mxl', 'different_key.mxl', 3)
+	   ([0, 1, 2], 2)
+
+	   >>> test_iter_differences('bwv66.6.mxl', 'different_key.mxl', 3, ['pitches'])
+	   ([], 40)
+
+	   >>> test_iter_differences('bwv66.6.mxl', 'different_time3.mxl', 1)
+	   ([1], 1)
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	progress = []
+	differences = diff.iter_differences(categories, max_results, lambda part, done, total: progress.append(done))
+	return [difference.measure for difference in differences], len(progress)
+
+def test_measure_runs(score1, score2, run):
+
+	"""
+	   >>> test_measure_runs('bwv66.6.mxl', 'different_accidentals.mxl', 3)
+	   (False, True, True)
+
+	   >>> test_measure_runs('bwv66.6.mxl', 'deleted_measure.xml', 4)
+	   (False, True, True)
+
+
+	"""
+	expected = ScoreDiff(score1, score2, path, use_cache=False).diff()
+	diff = ScoreDiff(score1, score2, path, use_cache=False)
+	ScoreDiff.RUN, default = run, ScoreDiff.RUN
+
+	try:
+		#stopping at the first difference leaves the rest of the part unlowered
+		first = list(diff.iter_differences(max_results=1))
+		lowered = diff.notes1.lowered(0)
+		return lowered, first == expected[:1], diff.diff() == expected and diff.notes1.lowered(0)
+
+	finally:
+		ScoreDiff.RUN = default
+
+def test_compare_many(score1, score2, category, part=0):
+
+	"""
+	   >>> test_compare_many('bwv66.6.mxl', 'different_stems3.mxl', 'stems')
+	   [4]
+
+	   >>> test_compare_many('bwv66.6.mxl', 'different_key2.mxl', 'key')
+	   [1, 2, 3, 4, 5, 6, 7, 8, 9]
+
+	   >>> test_compare_many('bwv66.6.mxl', 'different_pitches2.mxl', 'pitches')
+	   [1, 2]
+
+	   >>> test_compare_many('bwv66.6.mxl', 'bwv66.6.mxl', 'accidentals')
+	   []
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	results = diff.compare_many([(msr, part, msr, part) for msr in range(0, 10)], [category])
+	return [msr for msr in range(0, 10) if not results[msr, 0]]
+
+def test_compare_measure(score1, score2, msr=0, part=0):
+
+	"""
+	   >>> test_compare_measure('bwv66.6.mxl', 'different_pitches.mxl')
+	   [('accidentals', [], ['sharp']), ('pitches', ['C#5', 'B4'], ['D#3', 'F2']), ('pitches_ignore_order', ['B4', 'C#5'], ['D#3', 'F2'])]
+
+	   >>> test_compare_measure('bwv66.6.mxl', 'different_stems3.mxl', 4)
+	   [('stems', ['down', 'down', 'up', 'up'], ['up', 'up', 'down', 'down'])]
+
+	   >>> test_compare_measure('bwv66.6.mxl', 'different_key.mxl')
+	   [('key', [3], [5])]
+
+	   >>> test_compare_measure('bwv66.6.mxl', 'bwv66.6.mxl', 5)
+	   []
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	verdicts = diff.compare_measure(msr, part, msr, part, CATEGORIES + ['pitches_ignore_order'])
+	return [(category, verdicts[category].only1, verdicts[category].only2)
+		for category in sorted(verdicts) if not verdicts[category].same]
+
+def test_corpus(reference, pattern, workers, categories=None):
+
+	"""
+	   >>> test_corpus('bwv66.6.mxl', 'different_key*.mxl', 2, ['key'])
+	   [('different_key.mxl', [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]), ('different_key2.mxl', [1, 2, 3, 4, 5, 6, 7, 8, 9]), ('different_key3.mxl', [5, 6, 7, 8, 9])]
+
+	   >>> test_corpus('bwv66.6.mxl', 'different_stems*.mxl', 3) == test_corpus('bwv66.6.mxl', 'different_stems*.mxl', 1)
+	   True
+
+
+	"""
+	variants = find_variants(path + '/bach', pattern)
+	results = CorpusDiff(reference, variants, path, workers, categories=categories).run()
+	return [(variant, [difference.measure for difference in differences]) for variant, differences in results.items()]
+
+def test_corpus_reference(reference):
+
+	"""
+	   >>> test_corpus_reference('bwv66.6.mxl')
+	   ([0, 1, 2, 3], ['missing.mxl'])
+
+
+	"""
+	directory = tempfile.mkdtemp()
+
+	try:
+		copy = os.path.join(directory, 'reference.xml')
+		shutil.copy(find_score(reference), copy)
+
+		#no variant can be compared, but the reference is indexed before any is
+		corpus = CorpusDiff(copy, ['missing.mxl'], path, 1)
+		corpus.run()
+		return ScoreDiff.default_registry().get(copy).index.indexed_parts(), corpus.errors.keys()
+
+	finally:
+		shutil.rmtree(directory)
+
+def test_shards(score1, score2, workers, parts=None):
+
+	"""
+	   >>> test_shards('bwv66.6.mxl', 'different_pitches3.mxl', 2)
+	   (True, [], [])
+
+	   >>> test_shards('bwv66.6.mxl', 'different_key.mxl', 3, [0, 2])
+	   (True, [], [])
+
+	   >>> test_shards('bwv66.6.mxl', 'different_key.mxl', 1, [1, 3])
+	   (True, [1, 3], [1, 3])
+
+	   >>> test_shards('bwv66.6.mxl', 'different_key.mxl', 1, [5])
+	   Traceback (most recent call last):
+	   ...
+	   PartRangeError: 'part number 5 does not exist for bwv66.6.mxl'
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path, use_cache=False)
+	differences = diff.diff(parts=parts, workers=workers)
+	expected = ScoreDiff(score1, score2, path, use_cache=False).diff()
+	return differences == [difference for difference in expected if parts is None or difference.part in parts], \
+	       diff.index1.indexed_parts(), diff.index2.indexed_parts()
+
+def test_fingerprints(score1, score2, category, part=0):
+
+	"""
+	   >>> test_fingerprints('bwv66.6.mxl', 'different_stems3.mxl', 'stems')
+	   [4]
+
+	   >>> test_fingerprints('bwv66.6.mxl', 'different_pitches3.mxl', 'pitches_ignore_order')
+	   [3]
+
+	   >>> test_fingerprints('bwv66.6.mxl', 'different_clef3.mxl', 'clef')
+	   [2, 3, 4, 5, 6, 7, 8, 9]
+
+	   >>> value_fingerprint(u'G') == value_fingerprint('G')
+	   True
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+
+	if(category in diff.index1):
+		fingerprints1 = [diff.index1[category][part].fingerprint(msr) for msr in range(0, 10)]
+		fingerprints2 = [diff.index2[category][part].fingerprint(msr) for msr in range(0, 10)]
+
+	else:
+		fingerprints1 = list(diff.notes1.part(part).fingerprints[category][:10])
+		fingerprints2 = list(diff.notes2.part(part).fingerprints[category][:10])
+
+	return [msr for msr in range(0, 10) if fingerprints1[msr] != fingerprints2[msr]]
+
+def test_fingerprint_collision(score1, score2, category, method, part=0):
+
+	"""
+	   >>> test_fingerprint_collision('bwv66.6.mxl', 'different_stems3.mxl', 'stems', 'have_same_stem_directions')
+	   ([4], [4], [4])
+
+	   >>> test_fingerprint_collision('bwv66.6.mxl', 'different_pitches3.mxl', 'pitches', 'have_same_pitches')
+	   ([3], [3], [3])
+
+	   >>> test_fingerprint_collision('bwv66.6.mxl', 'different_clef3.mxl', 'clef', 'have_same_clef_markings')
+	   ([2, 3, 4, 5, 6, 7, 8, 9], [2, 3, 4, 5, 6, 7, 8, 9], [2, 3, 4, 5, 6, 7, 8, 9])
+
+	   >>> test_fingerprint_collision('bwv66.6.mxl', 'different_key2.mxl', 'key', 'have_same_key_signature')
+	   ([1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 2, 3, 4, 5, 6, 7, 8, 9])
+
+	   >>> test_fingerprint_collision('bwv66.6.mxl', 'different_time3.mxl', 'time', 'have_same_time_signature')
+	   ([1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 2, 3, 4, 5, 6, 7, 8, 9])
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path, use_cache=False)
+
+	#give every measure of both scores the same fingerprint
+	for index, notes in [(diff.index1, diff.notes1), (diff.index2, diff.notes2)]:
+
+		if(category in index):
+			index[category][part].fingerprints = [0] * len(index[category][part].fingerprints)
+
+		else:
+			notes.part(part).fingerprints[category][:] = 0
+
+	same = getattr(diff, method)
+	results = diff.compare_many([(msr, part, msr, part) for msr in range(0, 10)], [category])
+	differences = set(difference.measure for difference in diff.diff([category], [part]) if difference.measure < 10)
+	return ([msr for msr in range(0, 10) if not same(msr, part, msr, part)],
+		[msr for msr in range(0, 10) if not results[msr, 0]], sorted(differences))
+
+def test_align(score1, score2, part=0):
+
+	"""
+	   >>> test_align('bwv66.6.mxl', 'deleted_measure.xml')
+	   [Edit(operation='delete', measure1=3, measure2=None)]
+
+	   >>> test_align('bwv66.6.mxl', 'different_stems3.mxl')
+	   [Edit(operation='change', measure1=4, measure2=4)]
+
+	   >>> test_align('bwv66.6.mxl', 'bwv66.6.mxl')
+	   []
+
+	   >>> [edit.operation for edit in edit_script('abcd', 'abxcd')]
+	   ['match', 'match', 'insert', 'match', 'match']
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	return [edit for edit in diff.align(part, part) if edit.operation != 'match']
+
+def test_aligned_diff(score1, score2):
+
+	"""
+	   >>> test_aligned_diff('bwv66.6.mxl', 'deleted_measure.xml')
+	   [(0, 3, None, 'deleted'), (1, 3, None, 'deleted'), (2, 3, None, 'deleted'), (3, 3, None, 'deleted')]
+
+	   >>> test_aligned_diff('bwv66.6.mxl', 'different_stems3.mxl')
+	   [(0, 4, 4, 'stems')]
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	return [(difference.part, difference.measure1, difference.measure2, difference.category)
+		for difference in diff.aligned_diff()]
+
+def test_transpositions(score1, score2, part1=0, part2=0):
+
+	"""
+	   >>> test_transpositions('bwv66.6.mxl', 'transposed.xml')
+	   [(0, 0, 2), (1, 1, 2), (2, 2, 2), (3, 3, 2), (4, 4, 2), (5, 5, 2), (6, 6, 2), (7, 7, 2), (8, 8, 2), (9, 9, 2)]
+
+	   >>> test_transpositions('bwv66.6.mxl', 'bwv66.6.mxl')
+	   []
+
+	   >>> diff = ScoreDiff('bwv66.6.mxl', 'transposed.xml', path)
+	   >>> diff.have_same_pitches(3, 0, 3, 0), diff.have_same_intervals(3, 0, 3, 0), diff.have_same_contour(3, 0, 3, 0)
+	   (False, True, True)
+
+	   >>> diff.compare_measure(3, 0, 3, 0, ['intervals', 'contour'])['contour']
+	   Verdict(same=True, only1=[], only2=[])
+
+	   >>> diff.diff(['intervals', 'contour'])
+	   []
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	return [tuple(transposition) for transposition in diff.find_transpositions(part1, part2)]
+
+def test_similarity(score1, score2, msr, part=0):
+
+	"""
+	   >>> test_similarity('bwv66.6.mxl', 'different_pitches3.mxl', 3)
+	   [('accidentals', 0.0), ('articulations', 1.0), ('ornaments', 1.0), ('pitches', 0.0), ('rhythm', 1.0), ('spanners', 1.0), ('stems', 1.0)]
+
+	   >>> test_similarity('bwv66.6.mxl', 'different_pitches3.mxl', 2)
+	   [('accidentals', 1.0), ('articulations', 1.0), ('ornaments', 1.0), ('pitches', 1.0), ('rhythm', 1.0), ('spanners', 1.0), ('stems', 1.0)]
+
+	   >>> diff = ScoreDiff('bwv66.6.mxl', 'deleted_measure.xml', path)
+	   >>> sorted(diff.score_similarity(['pitches', 'rhythm']).items())
+	   [('pitches', 0.8727272727272728), ('rhythm', 0.8727272727272728)]
+
+	   >>> diff.similarity_matrix(0, 0).shape
+	   (10, 9)
+
+	   >>> [round(value, 2) for value in diff.similarity_matrix(0, 0)[4, 2:5]]
+	   [0.25, 1.0, 0.25]
+
+	   >>> edit_distance('kitten', 'sitting'), edit_distance([], [1, 2])
+	   (3, 2)
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	return sorted(diff.similarity(msr, part, msr, part).items())
+
+def test_window(score1, score2, start, stop, sounding=False):
+
+	"""
+	   >>> test_window('bwv66.6.mxl', 'different_stems3.mxl', 13, 17)
+	   ['stems']
+
+	   >>> test_window('bwv66.6.mxl', 'different_stems3.mxl', 0, 13)
+	   []
+
+	   >>> test_window('bwv66.6.mxl', 'deleted_measure.xml', 0, 9)
+	   []
+
+	   >>> test_window('bwv66.6.mxl', 'deleted_measure.xml', 9, 13)
+	   ['pitches', 'stems']
+
+	   >>> test_window('bwv66.6.mxl', 'different_time3.mxl', 0, 5)
+	   ['time']
+
+	   >>> test_window('bwv66.6.mxl', 'different_stems3.mxl', 17.5, 18, True)
+	   []
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	verdicts = diff.compare_window(start, stop, sounding=sounding)
+	return sorted(category for category in verdicts if not verdicts[category].same)
+
+def test_harmonic_diff(score1, score2, bass=True):
+
+	"""
+	   >>> test_harmonic_diff('bwv66.6.mxl', 'different_stems3.mxl')
+	   []
+
+	   >>> test_harmonic_diff('bwv66.6.mxl', 'different_pitches3.mxl')
+	   [(9.0, 9.5), (9.5, 10.0), (10.0, 10.5), (10.5, 11.0), (11.0, 12.0), (12.0, 13.0)]
+
+	   >>> test_harmonic_diff('bwv66.6.mxl', 'bwv66.6.mxl', False)
+	   []
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	return [(difference.start, difference.stop) for difference in diff.harmonic_diff(bass=bass)]
+
+def test_digest(score1, score2):
+
+	"""
+	   >>> test_digest('bwv66.6.mxl', 'different_stems3.mxl')
+	   (False, [Change(part=0, measure=4, category='stems')])
+
+	   >>> test_digest('bwv66.6.mxl', 'bwv66.6.mxl')
+	   (True, [])
+
+	   >>> test_digest('bwv66.6.mxl', 'different_time3.mxl')[1] == [(difference.part, difference.measure, difference.category) for difference in ScoreDiff('bwv66.6.mxl', 'different_time3.mxl', path).diff()]
+	   True
+
+
+	"""
+	diff = ScoreDiff(score1, score2, path)
+	digest1 = ScoreDigest.from_json(diff.digest(1).to_json())
+	digest2 = diff.digest(2)
+	return digest1.matches(digest2), digest1.differences(digest2)
+
+def test_digest_sidecar(score):
+
+	"""
+	   >>> test_digest_sidecar('bwv66.6.mxl')
+	   (True, True)
+
+
+	"""
+	directory = tempfile.mkdtemp()
+
+	try:
+		copy = os.path.join(directory, 'score.xml')
+		shutil.copy(find_score(score), copy)
+		digest = ScoreDiff(copy, copy, path, use_cache=False).digest(1)
+		digest.save(copy)
+		saved = ScoreDigest.load(copy).matches(digest)
+
+		#editing the file makes the saved digest stale
+		info = os.stat(copy)
+		os.utime(copy, (info.st_atime, info.st_mtime + 1))
+		return saved, ScoreDigest.load(copy) is None
+
+	finally:
+		shutil.rmtree(directory)
+
+def test_parallel(score1, score2, max_size=None, cached=True):
+
+	"""
+	   >>> test_parallel('bwv66.6.mxl', 'different_key.mxl')
+	   (True, 10)
+
+	   >>> test_parallel('bwv66.6.mxl', 'bwv66.6.mxl')
+	   (True, 0)
+
+	   >>> test_parallel('bwv66.6.mxl', 'different_key.mxl', max_size=10000)
+	   (True, 10)
+
+	   >>> test_parallel('bwv66.6.mxl', 'different_key.mxl', cached=False)
+	   (True, 10)
+
+
+	"""
+	directory = tempfile.mkdtemp()
+
+	try:
+		cache = ScoreCache(directory, max_size) if cached else None
+		diff = ScoreDiff(score1, score2, path, cache=cache, registry=ScoreRegistry(), parallel=True)
+		differences = diff.diff()
+		return differences == ScoreDiff(score1, score2, path, use_cache=False).diff(), len(differences)
+
+	finally:
+		shutil.rmtree(directory)
+
+def old_contexts(score, attribute):
+
+	"""Returns the context object in effect at every measure of every part,
+	found measure by measure the way each context table used to be built
+
+	"""
+	contexts = []
+
+	for part in score.parts:
+		recent = None
+		found = []
+
+		for measure in part.getElementsByClass('Measure'):
+			if(getattr(measure, attribute) is not None):
+				recent = getattr(measure, attribute)
+
+			found.append(recent)
+
+		contexts.append(found)
+
+	return contexts
+
+def test_build_part(score):
+
+	"""
+	   >>> test_build_part('different_clef3.mxl')
+	   (True, True, [('clef', [2, 1, 1, 1]), ('key', [1, 1, 1, 1]), ('time', [1, 1, 1, 1])])
+
+	   >>> test_build_part('different_time3.mxl')
+	   (True, True, [('clef', [1, 1, 1, 1]), ('key', [1, 1, 1, 1]), ('time', [3, 1, 1, 1])])
+
+
+	"""
+	parsed = music21.converter.parse(find_score(score))
+	tables = Tables(parsed)
+	index = tables.build()
+	separate = {'clef': tables.build_all_clefs(), 'key': tables.build_all_keys(), 'time': tables.build_all_times()}
+	attributes = {'clef': 'clef', 'key': 'keySignature', 'time': 'timeSignature'}
+	same = lambda first, second: [[id(value) for value in part] for part in first] == \
+				     [[id(value) for value in part] for part in second]
+	single = all(same(index[context], separate[context]) for context in index)
+	old = all(same(index[context], old_contexts(parsed, attributes[context])) for context in index)
+	return single, old, [(context, [len(changes.starts) for changes in index[context]]) for context in ['clef', 'key', 'time']]
+
+def test_cache_invalidation(score):
+
+	"""
+	   >>> test_cache_invalidation('bwv66.6.mxl')
+	   (True, True, 1, True)
+
+
+	"""
+	directory = tempfile.mkdtemp()
+
+	try:
+		copy = os.path.join(directory, 'score.xml')
+		shutil.copy(find_score(score), copy)
+		cache = ScoreCache(os.path.join(directory, 'cache'))
+		ScoreDiff(copy, copy, path, cache=cache, registry=ScoreRegistry())
+		stored = cache.load(copy) is not None
+
+		#the same contents with a newer modification time are a new version of the file
+		info = os.stat(copy)
+		os.utime(copy, (info.st_atime, info.st_mtime + 1))
+		stale = cache.load(copy) is None
+		ScoreDiff(copy, copy, path, cache=cache, registry=ScoreRegistry())
+		return stored, stale, len(os.listdir(cache.directory)), cache.load(copy) is not None
+
+	finally:
+		shutil.rmtree(directory)
+
+def test_cache_eviction(score):
+
+	"""
+	   >>> test_cache_eviction('bwv66.6.mxl')
+	   (True, False, True, True)
+
+
+	"""
+	directory = tempfile.mkdtemp()
+
+	try:
+		names = [os.path.join(directory, name + '.xml') for name in ['first', 'second', 'third']]
+		parsed = music21.converter.parse(find_score(score))
+		cache = ScoreCache(os.path.join(directory, 'cache'))
+
+		for name in names:
+			shutil.copy(find_score(score), name)
+
+		for name, used in zip(names[:2], [1000, 2000]):
+			cache.store(name, parsed)
+			os.utime(os.path.join(cache.directory, cache.key(name) + ScoreCache.EXTENSION), (used, used))
+
+		#loading the first entry makes the second the least recently used
+		cache.load(names[0])
+		cache.max_size = cache.size() * 5 // 4
+		cache.store(names[2], parsed)
+		return cache.load(names[0]) is not None, cache.load(names[1]) is not None, \
+		       cache.load(names[2]) is not None, cache.size() <= cache.max_size
+
+	finally:
+		shutil.rmtree(directory)
+
+def test_no_cache(score1, score2):
+
+	"""
+	   >>> test_no_cache('bwv66.6.mxl', 'different_key.mxl')
+	   (True, True, 0, 0)
+
+
+	"""
+	directory = tempfile.mkdtemp()
+
+	try:
+		cache = ScoreCache(directory)
+		registry = ScoreRegistry()
+		uncached = ScoreDiff(score1, score2, path, use_cache=False, cache=cache, registry=registry)
+		default = ScoreDiff(score1, score2, path, registry=ScoreRegistry())
+		return uncached.cache is None and uncached.registry is None, default.cache is None, \
+		       len(os.listdir(directory)), registry.hits + registry.misses
+
+	finally:
+		shutil.rmtree(directory)
+
+def test_registry(score1, score2):
+
+	"""
+	   >>> test_registry('bwv66.6.mxl', 'different_key.mxl')
+	   True
+
+	   >>> test_registry('different_key.mxl', 'bwv66.6.mxl')
+	   True
+
+	   >>> import pickle
+	   >>> registry = ScoreRegistry(1000)
+	   >>> registry.add(find_score('bwv66.6.mxl'), ScoreEntry(None, {}, None, []))
+	   >>> copy = pickle.loads(pickle.dumps(registry))
+	   >>> copy.max_size, copy.get(find_score('bwv66.6.mxl')), registry.get(find_score('bwv66.6.mxl')) is not None
+	   (1000, None, True)
+
+
+	"""
+	first = ScoreDiff(score1, score2, path)
+	second = ScoreDiff(score1, score2, path)
+	return first.score1 is second.score1 and first.index2 is second.index2
+
+def test_reader(score1, score2):
+
+	"""
+	   >>> test_reader('bwv66.6.mxl', 'different_accidentals.mxl')
+	   (True, 5)
+
+	   >>> test_reader('bwv66.6.mxl', 'different_ornaments2.mxl')
+	   (True, 1)
+
+	   >>> test_reader('bwv66.6.mxl', 'movement1.mxl')
+	   (True, 323)
+
+	   >>> diff = ScoreDiff('bwv66.6.mxl', 'deleted_measure.xml', path, use_cache=False, reader='stream')
+	   >>> diff.score1 is None, diff.have_same_pitches(9, 0, 8, 0), diff.have_same_time_signature(3, 1, 3, 1)
+	   (True, True, True)
+
+
+	"""
+	categories = CATEGORIES + ['pitches_ignore_order', 'intervals', 'contour', 'rhythm']
+	differences = ScoreDiff(score1, score2, path, use_cache=False).diff(categories)
+	return differences == ScoreDiff(score1, score2, path, use_cache=False, reader='stream').diff(categories), len(differences)
+
+def test_measure_index(score1, score2, start, stop):
+
+	"""
+	   >>> test_measure_index('bwv66.6.mxl', 'different_key.mxl', 3, 7)
+	   ([True, True], 4)
+
+	   >>> test_measure_index('bwv66.6.mxl', 'different_accidentals.mxl', 0, 3)
+	   ([True, True], 2)
+
+	   >>> test_measure_index('scriabin_opus_8_no9.mxl', 'scriabin_opus_8_no3.mxl', 20, 30)
+	   ([True, True], 111)
+
+	   >>> directory = tempfile.mkdtemp()
+	   >>> shutil.copy(os.path.join(path, 'bach', 'bwv66.6.mxl'), directory)
+	   >>> score = os.path.join(directory, 'bwv66.6.mxl')
+	   >>> diff = ScoreDiff(score, score, path, use_cache=False, window=(2, 4))
+	   >>> diff.measures1.measure_count(0), MeasureIndex.load(score).measure_count(0)
+	   (2, 10)
+	   >>> other = os.path.join(directory, 'other.xml')
+	   >>> shutil.copy(score, other)
+	   >>> diff = ScoreDiff(other, other, path, use_cache=False, window=(2, 4), sidecars=False)
+	   >>> diff.measures1.measure_count(0), os.path.exists(MeasureIndex.sidecar(other))
+	   (2, False)
+	   >>> shutil.rmtree(directory)
+
+
+	"""
+	categories = [category for category in CATEGORIES if category != 'spanners']
+	differences = ScoreDiff(score1, score2, path, use_cache=False, window=(start, stop), sidecars=False).diff(categories)
+	matches = []
+
+	for reader in ['music21', 'stream']:
+		expected = [difference._replace(measure=difference.measure - start)
+			    for difference in ScoreDiff(score1, score2, path, use_cache=False, reader=reader).diff(categories)
+			    if start <= difference.measure < stop]
+		matches.append(differences == expected)
+
+	return matches, len(differences)
+
+def test_archive(score):
+
+	"""
+	   >>> test_archive('bwv66.6.mxl')
+	   (True, 'scores/bwv66.6.xml')
+
+	   >>> test_archive('deleted_measure.xml')
+	   (True, 'scores/deleted_measure.xml')
+
+
+	"""
+	directory = tempfile.mkdtemp()
+
+	try:
+		original = find_score(score)
+		archive = os.path.join(directory, 'archive.mxl')
+		name = 'scores/' + os.path.splitext(os.path.basename(original))[0] + '.xml'
+
+		#the root file is not the first file of the archive
+		with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as written:
+			written.writestr('notes.xml', '<notes/>')
+			written.writestr('META-INF/container.xml', '<container><rootfiles><rootfile full-path="' + name +
+					 '" media-type="application/vnd.recordare.musicxml+xml"/></rootfiles></container>')
+			written.write(original, name)
+
+		with zipfile.ZipFile(archive) as opened:
+			found = root_file(opened)
+
+		categories = CATEGORIES + ['rhythm']
+		diff = ScoreDiff(score, archive, path, use_cache=False, reader='stream')
+		return diff.diff(categories) == [], found
+
+	finally:
+		shutil.rmtree(directory)
+
+def test_lean(score1, score2):
+
+	"""
+	   >>> test_lean('bwv66.6.mxl', 'different_accidentals.mxl')
+	   (True, 5, True, True)
+
+	   >>> test_lean('bwv66.6.mxl', 'different_key.mxl')
+	   (True, 10, True, True)
+
+	   >>> registry = ScoreRegistry()
+	   >>> first = ScoreDiff('bwv66.6.mxl', 'different_time3.mxl', path, registry=registry, lean=True)
+	   >>> second = ScoreDiff('bwv66.6.mxl', 'different_time3.mxl', path, registry=registry, lean=True)
+	   >>> first.index2 is second.index2, isinstance(first.index1['clef'][0][0], ClefRecord)
+	   (True, True)
+
+
+	"""
+	categories = CATEGORIES + ['pitches_ignore_order', 'intervals', 'contour', 'rhythm']
+	diff = ScoreDiff(score1, score2, path, use_cache=False, lean=True)
+	differences = diff.diff(categories)
+	released = diff.score1 is None and diff.score2 is None
+	return differences == ScoreDiff(score1, score2, path, use_cache=False).diff(categories), len(differences), \
+	       released, diff.have_same_key_signature(0, 0, 0, 0) == (score2 != 'different_key.mxl')
+
+def edit_measure(score, msr, step):
+
+	"""Sets every pitch of a measure of the first part of an uncompressed score
+	to step, and moves the modification time of the file forward
+
+	"""
+	text = open(score).read()
+	start = [match.start() for match in re.finditer('<measure[ >]', text)][msr]
+	stop = text.index('</measure>', start)
+	open(score, 'w').write(text[:start] + re.sub('<step>.</step>', '<step>' + step + '</step>', text[start:stop]) + text[stop:])
+	info = os.stat(score)
+	os.utime(score, (info.st_atime, info.st_mtime + 1))
+
+def test_incremental(reference, edited, msr, step):
+
+	"""
+	   >>> test_incremental('bwv66.6.mxl', 'bwv66.6.mxl', 3, 'D')
+	   (True, 0, {0: [3], 1: [], 2: [], 3: []}, True, 1, True)
+
+	   >>> test_incremental('bwv66.6.mxl', 'different_key.mxl', 0, 'G')
+	   (True, 10, {0: [0], 1: [], 2: [], 3: []}, True, 1, True)
+
+
+	"""
+	directory = tempfile.mkdtemp()
+
+	try:
+		copy = os.path.join(directory, 'edited.xml')
+		shutil.copy(os.path.join(path, 'bach', edited), copy)
+		incremental = IncrementalDiff(reference, copy, path)
+		first = incremental.differences == ScoreDiff(reference, copy, path, use_cache=False).diff()
+		count = len(incremental.differences)
+		edit_measure(copy, msr, step)
+		changed = incremental.refresh()
+		second = incremental.differences == ScoreDiff(reference, copy, path, use_cache=False).diff()
+		edit_measure(copy, msr + 1, step)
+		updates = incremental.watch(lambda differences, changed: False, 0.01, 5)
+		third = incremental.differences == ScoreDiff(reference, copy, path, use_cache=False).diff()
+		return first, count, changed, second, updates, third
+
+	finally:
+		shutil.rmtree(directory)
+
+def rewrite_measures(score, operation, msr):
+	"""Inserts a copy of a measure before it, deletes it or swaps it with the
+	next one in every part of an uncompressed score, or changes the first clef,
+	key or time signature of the first part, and moves the modification time of
+	the file forward
+
+	"""
+	text = open(score).read()
+
+	def rewrite(part):
+		measures = re.findall('<measure[ >].*?</measure>\\s*', part.group(2), re.S)
+
+		if(operation == 'insert'):
+			measures.insert(msr, measures[msr])
+
+		elif(operation == 'delete'):
+			del measures[msr]
+
+		else:
+			measures[msr], measures[msr + 1] = measures[msr + 1], measures[msr]
+
+		return part.group(1) + ''.join(measures) + part.group(3)
+
+	if(operation in ['insert', 'delete', 'swap']):
+		text = re.sub('(<part [^>]*>\\s*)(.*?)(</part>)', rewrite, text, flags=re.S)
+
+	else:
+		old, new = {'clef': ('<sign>G</sign>', '<sign>C</sign>'), 'key': ('<fifths>', '<fifths>-'),
+			    'time': ('<beats>4</beats>', '<beats>3</beats>')}[operation]
+		text = text.replace(old, new, 1)
+
+	open(score, 'w').write(text)
+	info = os.stat(score)
+	os.utime(score, (info.st_atime, info.st_mtime + 1))
+
+def test_incremental_edits(reference, operation, msr=3):
+
+	"""
+	   >>> test_incremental_edits('bwv66.6.mxl', 'insert')
+	   (True, 58, {0: [4, 5, 6, 7, 8, 9, 10], 1: [4, 5, 6, 7, 8, 9, 10], 2: [4, 5, 6, 7, 8, 9, 10], 3: [4, 5, 6, 7, 8, 9, 10]})
+
+	   >>> test_incremental_edits('bwv66.6.mxl', 'delete')
+	   (True, 58, {0: [3, 4, 5, 6, 7, 8, 9], 1: [3, 4, 5, 6, 7, 8, 9], 2: [3, 4, 5, 6, 7, 8, 9], 3: [3, 4, 5, 6, 7, 8, 9]})
+
+	   >>> test_incremental_edits('bwv66.6.mxl', 'swap')
+	   (True, 16, {0: [3, 4], 1: [3, 4], 2: [3, 4], 3: [3, 4]})
+
+	   >>> test_incremental_edits('bwv66.6.mxl', 'clef')
+	   (True, 10, {0: [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], 1: [], 2: [], 3: []})
+
+	   >>> test_incremental_edits('bwv66.6.mxl', 'key')
+	   (True, 20, {0: [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], 1: [], 2: [], 3: []})
+
+	   >>> test_incremental_edits('bwv66.6.mxl', 'time')
+	   (True, 10, {0: [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], 1: [], 2: [], 3: []})
+
+
+	"""
+	directory = tempfile.mkdtemp()
+
+	try:
+		copy = os.path.join(directory, 'edited.xml')
+		shutil.copy(os.path.join(path, 'bach', reference), copy)
+		incremental = IncrementalDiff(reference, copy, path, use_cache=False)
+		rewrite_measures(copy, operation, msr)
+		changed = incremental.refresh()
+		expected = ScoreDiff(reference, copy, path, use_cache=False).diff()
+		return incremental.differences == expected, len(expected), changed
+
+	finally:
+		shutil.rmtree(directory)
+
 if __name__ == '__main__':
 
 	import doctest